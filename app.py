@@ -1,25 +1,71 @@
 from flask import (
+    Blueprint,
     Flask,
+    current_app,
+    make_response,
     render_template,
     request,
     redirect,
     url_for,
     flash,
-    send_file,
     session,
     jsonify,
+    Response,
+    stream_with_context,
+    abort,
 )
-from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.exc import IntegrityError
-from werkzeug.security import generate_password_hash, check_password_hash
+from models import db, User, Land, Transaction, ConfirmationJob
+from cache import LRUCache
+from pagecache import LRUBackend, RedisBackend, ResponseCache
+from search import search_lands, search_query, setup_land_search
+from listings import (
+    DEFAULT_SORT,
+    SORTS as LISTING_SORTS,
+    decode_cursor,
+    listing_count,
+    listing_filters,
+    listing_page,
+    listing_query,
+    setup_listing_counts,
+)
+from geo import (
+    bbox_filter,
+    haversine_km,
+    land_geometry,
+    nearby_query,
+    nearest_radius,
+    parse_bbox,
+    parse_point,
+    setup_land_geo,
+)
+from querycount import init_query_budget
+from metrics import REGISTRY as metrics_registry, init_metrics, instrument_provider
+from migrations import upgrade
+from database import configure_engine, database_uri, engine_options
+from queryplan import check_query_plans
+from qrcodes import FORMATS as QR_FORMATS, QRCodeCache, qr_cache_key
+from images import ImagePipeline
+from passwords import HasherBusy, PasswordHasher
+from liveupdates import EventHub, setup_land_events
+from versions import deleted_lands, registry_version, setup_land_versions, utc
+from purchases import LandNotFound, PurchaseError, submit_purchase
+from exports import EXPORT_FORMATS, EXPORT_TABLES, Export, find_user, parse_time
+from ethereum import Ethereum, ProcessLocal
+from sqlalchemy import select, text
+from sqlalchemy.orm import joinedload, selectinload
+from werkzeug.http import is_resource_modified
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
-import os, io
-import qrcode
-from web3 import Web3
+from markupsafe import Markup
+import os
 import json
+import hashlib
+import re
+import time
 from os import getenv
 from datetime import datetime, timezone
-import uuid
+import click
 
 """
 Land Registry Blockchain Application
@@ -33,127 +79,312 @@ Features:
 - Land marketplace with buying and selling capabilities
 - QR code generation for land verification
 - Transaction history tracking
+
+The application is built by `create_app()`, e.g. `flask --app app run` or
+`gunicorn 'app:create_app()'`. Creating it does not touch the blockchain:
+Web3, the contract and everything importing web3 are loaded per process on
+first use (see ethereum.py). Tables and indexes are created by
+`flask --app app init-db`.
 """
 
-# App configuration
-app = Flask(__name__)
-app.config["SECRET_KEY"] = getenv("SECRET")
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///landregistry.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["UPLOAD_FOLDER"] = "static/uploads"
-app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max upload size
+bp = Blueprint("main", __name__, cli_group=None)
+
+
+def create_app(config=None):
+    """
+    Create and configure the application.
+
+    Only the Flask app and its in-process caches are built. The database is
+    queried once for the available land indexes; the Web3 handles are
+    created per process on first use.
+
+    Args:
+        config: Optional mapping overriding the configuration read from the
+            environment
+
+    Returns:
+        Flask: The application
+    """
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = getenv("SECRET")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri(
+        getenv("DATABASE_URL", "sqlite:///landregistry.db")
+    )
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["UPLOAD_FOLDER"] = "static/uploads"
+    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max upload size
+
+    # Event indexer configuration
+    app.config["INDEXER_ENABLED"] = getenv("INDEXER_ENABLED", "0") == "1"
+    app.config["INDEXER_START_BLOCK"] = int(getenv("INDEXER_START_BLOCK", "0"))
+    app.config["INDEXER_BATCH_SIZE"] = int(getenv("INDEXER_BATCH_SIZE", "2000"))
+    app.config["INDEXER_CONFIRMATIONS"] = int(getenv("INDEXER_CONFIRMATIONS", "12"))
+    app.config["INDEXER_POLL_INTERVAL"] = float(getenv("INDEXER_POLL_INTERVAL", "5"))
+
+    # Chain reconciliation: land IDs per digest range and ranges read concurrently
+    app.config["RECONCILE_RANGE_SIZE"] = int(getenv("RECONCILE_RANGE_SIZE", "1000"))
+    app.config["RECONCILE_WORKERS"] = int(getenv("RECONCILE_WORKERS", "4"))
+
+    # Confirmation of submitted transactions (see confirmations.py)
+    app.config["CONFIRMATION_WORKER_ENABLED"] = getenv("CONFIRMATION_WORKER_ENABLED", "1") == "1"
+    app.config["CONFIRMATION_POLL_INTERVAL"] = float(getenv("CONFIRMATION_POLL_INTERVAL", "2"))
+    app.config["CONFIRMATION_BLOCKS"] = int(getenv("CONFIRMATION_BLOCKS", "1"))
+    app.config["CONFIRMATION_TIMEOUT"] = int(getenv("CONFIRMATION_TIMEOUT", "1800"))
+    app.config["CONFIRMATION_BATCH_SIZE"] = 100
+
+    # Bulk land import (`flask import-lands`)
+    app.config["IMPORT_BATCH_SIZE"] = int(getenv("IMPORT_BATCH_SIZE", "1000"))
+    app.config["IMPORT_MAX_IN_FLIGHT"] = int(getenv("IMPORT_MAX_IN_FLIGHT", "2000"))
+    app.config["REGISTRAR_PRIVATE_KEY"] = getenv("REGISTRAR_PRIVATE_KEY")
+
+    # Transaction verification configuration
+    app.config["RECEIPT_CACHE_SIZE"] = int(getenv("RECEIPT_CACHE_SIZE", "10000"))
+    app.config["RECEIPT_CONFIRMATIONS"] = int(getenv("RECEIPT_CONFIRMATIONS", "12"))
+    app.config["RECEIPT_PENDING_TTL"] = float(getenv("RECEIPT_PENDING_TTL", "15"))
+    app.config["VERIFY_BATCH_LIMIT"] = int(getenv("VERIFY_BATCH_LIMIT", "500"))
+    # Receipts per JSON-RPC batch; many hosted nodes cap batches at 100
+    app.config["RECEIPT_BATCH_SIZE"] = int(getenv("RECEIPT_BATCH_SIZE", "100"))
+
+    # Compare-and-swap reservations of a land retried after a concurrent write
+    app.config["PURCHASE_MAX_RETRIES"] = int(getenv("PURCHASE_MAX_RETRIES", "3"))
+
+    # Land API pagination
+    app.config["API_LANDS_DEFAULT_LIMIT"] = 100
+    app.config["API_LANDS_MAX_LIMIT"] = 1000
+    app.config["API_LANDS_STREAM_CHUNK"] = 1000
+
+    # Audit exports (see exports.py): rows per chunk, and the bearer token
+    # giving /api/export access to all rows (users only get their own)
+    app.config["EXPORT_CHUNK_SIZE"] = int(getenv("EXPORT_CHUNK_SIZE", "10000"))
+    app.config["EXPORT_TOKEN"] = getenv("EXPORT_TOKEN")
+
+    # Land search and marketplace pagination
+    app.config["SEARCH_PAGE_SIZE"] = 24
+    app.config["MARKETPLACE_PAGE_SIZE"] = 24
+
+    # Password hashing: werkzeug method string (algorithm and cost) and pool size
+    app.config["PASSWORD_HASH_METHOD"] = getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    app.config["PASSWORD_HASH_WORKERS"] = int(getenv("PASSWORD_HASH_WORKERS", "0")) or None
+    app.config["PASSWORD_HASH_MAX_PENDING"] = int(getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+    app.config["PASSWORD_HASH_QUEUE_TIMEOUT"] = 5.0
+
+    # Upload image variants are generated by this many background threads
+    app.config["IMAGE_WORKERS"] = int(getenv("IMAGE_WORKERS", "2"))
+
+    # QR code cache configuration
+    app.config["QR_CACHE_DIR"] = getenv(
+        "QR_CACHE_DIR", os.path.join(app.instance_path, "qr_cache")
+    )
+    app.config["QR_CACHE_SIZE"] = int(getenv("QR_CACHE_SIZE", "2048"))
+    app.config["QR_CACHE_MAX_AGE"] = 24 * 60 * 60
+    app.config["QR_BULK_LIMIT"] = 5000
+
+    # RPC provider: comma-separated endpoints in order of preference, per-call
+    # deadline, retries of idempotent reads and hedging percentile (0 disables)
+    RPC_URLS = getenv("RPC_URLS") or getenv("RPC_URL") or "http://localhost:8545"
+    app.config["RPC_URLS"] = [url.strip() for url in RPC_URLS.split(",") if url.strip()]
+    app.config["RPC_TIMEOUT"] = float(getenv("RPC_TIMEOUT", "10"))
+    app.config["RPC_RETRIES"] = int(getenv("RPC_RETRIES", "2"))
+    app.config["RPC_HEDGE_PERCENTILE"] = float(getenv("RPC_HEDGE_PERCENTILE", "95")) or None
+    app.config["RPC_POOL_SIZE"] = int(getenv("RPC_POOL_SIZE", "20"))
+    app.config["RPC_BREAKER_THRESHOLD"] = 5
+    app.config["RPC_BREAKER_RESET"] = 30.0
+
+    # landRegistry contract
+    app.config["CONTRACT_ADDRESS"] = "0x322D4Ab5baC728982Fb228CC37f527b599817836"
+    app.config["CONTRACT_ABI_PATH"] = "contracts/landRegistry_abi.json"
+
+    # Database engine: pool sizing (server databases) and SQLite lock wait
+    app.config["DB_POOL_SIZE"] = int(getenv("DB_POOL_SIZE", "10"))
+    app.config["DB_MAX_OVERFLOW"] = int(getenv("DB_MAX_OVERFLOW", "20"))
+    app.config["DB_POOL_TIMEOUT"] = 30
+    app.config["DB_POOL_RECYCLE"] = 1800
+    app.config["SQLITE_BUSY_TIMEOUT"] = int(getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+    app.config["SQLITE_MMAP_SIZE"] = int(getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    # Response cache for the land pages; set RESPONSE_CACHE_URL to a Redis URL to
+    # share it between worker processes
+    app.config["RESPONSE_CACHE_ENABLED"] = getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+    app.config["RESPONSE_CACHE_URL"] = getenv("RESPONSE_CACHE_URL")
+    app.config["RESPONSE_CACHE_SIZE"] = int(getenv("RESPONSE_CACHE_SIZE", "2048"))
+    app.config["RESPONSE_CACHE_TTL"] = int(getenv("RESPONSE_CACHE_TTL", "300"))
+
+    # Live marketplace updates over Server-Sent Events (see liveupdates.py):
+    # event table poll interval, heartbeat seconds, browser reconnection delay
+    # (ms), events kept in memory and in the table, and open streams per process
+    app.config["LIVE_UPDATES_POLL_INTERVAL"] = float(getenv("LIVE_UPDATES_POLL_INTERVAL", "1"))
+    app.config["LIVE_UPDATES_HEARTBEAT"] = 15.0
+    app.config["LIVE_UPDATES_RETRY"] = 3000
+    app.config["LIVE_UPDATES_BUFFER_SIZE"] = 1000
+    app.config["LIVE_UPDATES_RETENTION"] = int(getenv("LIVE_UPDATES_RETENTION", "100000"))
+    app.config["LIVE_UPDATES_MAX_STREAMS"] = int(getenv("LIVE_UPDATES_MAX_STREAMS", "1000"))
+
+    # Performance metrics served at /metrics (see metrics.py); requests slower
+    # than SLOW_REQUEST_THRESHOLD seconds are logged with their SQL statements
+    app.config["METRICS_TOKEN"] = getenv("METRICS_TOKEN")
+    app.config["SLOW_REQUEST_THRESHOLD"] = float(getenv("SLOW_REQUEST_THRESHOLD", "1.0")) or None
+
+    # SQL statements allowed per request, enforced in tests to catch N+1 queries
+    app.config["SQL_QUERY_BUDGET_ENFORCE"] = getenv("SQL_QUERY_BUDGET_ENFORCE", "0") == "1"
+    app.config["SQL_QUERY_BUDGET_DEFAULT"] = 20
+    app.config["SQL_QUERY_BUDGETS"] = {
+        "main.marketplace": 3,
+        "main.landDetails": 3,
+        "main.transaction_history": 2,
+        "main.seacrhLands": 3,
+    }
+    if config:
+        app.config.update(config)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+        app.config["SQLALCHEMY_DATABASE_URI"],
+        pool_size=app.config["DB_POOL_SIZE"],
+        max_overflow=app.config["DB_MAX_OVERFLOW"],
+        pool_timeout=app.config["DB_POOL_TIMEOUT"],
+        pool_recycle=app.config["DB_POOL_RECYCLE"],
+        busy_timeout=app.config["SQLITE_BUSY_TIMEOUT"],
+    )
+
+    db.init_app(app)
+    app.register_blueprint(bp)
+
+    # Web3 provider, client and contract; built per process on first use
+    ethereum = Ethereum(
+        app.config["RPC_URLS"],
+        app.config["CONTRACT_ADDRESS"],
+        app.config["CONTRACT_ABI_PATH"],
+        provider_options={
+            "timeout": app.config["RPC_TIMEOUT"],
+            "retries": app.config["RPC_RETRIES"],
+            "hedge_percentile": app.config["RPC_HEDGE_PERCENTILE"],
+            "pool_size": app.config["RPC_POOL_SIZE"],
+            "breaker_threshold": app.config["RPC_BREAKER_THRESHOLD"],
+            "breaker_reset": app.config["RPC_BREAKER_RESET"],
+        },
+        on_provider=[instrument_provider],
+    )
+    app.extensions["ethereum"] = ethereum
+
+    def create_transaction_verifier():
+        from verification import TransactionVerifier
+
+        # Receipts are cached process-wide so repeated verifications skip the RPC node
+        return TransactionVerifier(
+            ethereum.w3,
+            ethereum.contract,
+            LRUCache(app.config["RECEIPT_CACHE_SIZE"]),
+            confirmations=app.config["RECEIPT_CONFIRMATIONS"],
+            pending_ttl=app.config["RECEIPT_PENDING_TTL"],
+            batch_size=app.config["RECEIPT_BATCH_SIZE"],
+        )
+
+    app.extensions["transaction_verifier"] = ProcessLocal(create_transaction_verifier)
 
-# Ensure upload directories exist
-os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
-os.makedirs(os.path.join(app.config["UPLOAD_FOLDER"], "profiles"), exist_ok=True)
-os.makedirs(os.path.join(app.config["UPLOAD_FOLDER"], "lands"), exist_ok=True)
-
-# Initialize database
-db = SQLAlchemy(app)
-
-# Ethereum Configuration
-ALCHEMY_URL = getenv("RPC_URL")  # Get RPC URL from environment variables
-w3 = Web3(Web3.HTTPProvider(ALCHEMY_URL))
-
-# Load smart contract ABI and address
-with open("contracts/landRegistry_abi.json", "r") as f:
-    contract_abi = json.load(f)
-
-contract_address = "0x322D4Ab5baC728982Fb228CC37f527b599817836"
-land_registry_contract = w3.eth.contract(address=contract_address, abi=contract_abi)
-
-
-# Database models
-class User(db.Model):
-    """
-    User model representing registered users in the system.
-
-    Attributes:
-        id: Unique identifier for the user
-        username: User's chosen username
-        email: User's email address
-        password_hash: Hashed password for security
-        blockchain_address: User's Ethereum wallet address
-        profile_image: Path to user's profile image
-        created_at: Timestamp when the user account was created
-    """
-
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(200), nullable=False)
-    blockchain_address = db.Column(db.String(42), unique=True, nullable=False)
-    profile_image = db.Column(db.String(200), default="default_profile.jpg")
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
-
-    def __repr__(self):
-        return f"<User {self.username}>"
-
-
-class Land(db.Model):
-    """
-    Land model representing land parcels registered in the system.
-
-    Attributes:
-        id: Unique identifier for the land record
-        blockchain_id: Corresponding ID in the blockchain
-        owner_id: ID of the user who owns the land
-        title: Title of the land
-        location: Physical location of the land
-        description: Detailed description of the land
-        price: Asking price for the land (if for sale)
-        image: Path to land's image
-        for_sale: Whether the land is currently listed for sale
-        created_at: Timestamp when the land was registered
-    """
-
-    id = db.Column(db.Integer, primary_key=True)
-    blockchain_id = db.Column(db.Integer, unique=True, nullable=False)
-    owner_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    title = db.Column(db.String(100), nullable=False)
-    location = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
-    price = db.Column(db.Float, nullable=False)
-    image = db.Column(db.String(200))
-    for_sale = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
-
-    owner = db.relationship("User", backref=db.backref("lands", lazy=True))
-
-    def __repr__(self):
-        return f"<Land {self.title}>"
-
-
-class Transaction(db.Model):
-    """
-    Transaction model recording land ownership transfers.
-
-    Attributes:
-        id: Unique identifier for the transaction
-        blockchain_tx_hash: Hash of the blockchain transaction
-        land_id: ID of the land being transferred
-        seller_id: ID of the user selling the land
-        buyer_id: ID of the user buying the land
-        price: Price at which the land was sold
-        transaction_date: Timestamp when the transaction occurred
-    """
-
-    id = db.Column(db.Integer, primary_key=True)
-    blockchain_tx_hash = db.Column(db.String(66), unique=True, nullable=False)
-    land_id = db.Column(db.Integer, db.ForeignKey("land.id"), nullable=False)
-    seller_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    buyer_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    transaction_date = db.Column(
-        db.DateTime, default=lambda: datetime.now(timezone.utc)
+    # Password hashes are computed in a bounded process pool, off the request threads
+    app.extensions["password_hasher"] = PasswordHasher(
+        app.config["PASSWORD_HASH_METHOD"],
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+        queue_timeout=app.config["PASSWORD_HASH_QUEUE_TIMEOUT"],
     )
 
-    land = db.relationship("Land", backref=db.backref("transactions", lazy=True))
-    seller = db.relationship("User", foreign_keys=[seller_id])
-    buyer = db.relationship("User", foreign_keys=[buyer_id])
+    # Resized WebP/JPEG variants of uploaded images, stored by content hash
+    app.extensions["image_pipeline"] = ImagePipeline(
+        app.config["UPLOAD_FOLDER"], workers=app.config["IMAGE_WORKERS"]
+    )
 
-    def __repr__(self):
-        return f"<Transaction {self.blockchain_tx_hash[:10]}>"
+    # Rendered QR codes, cached by a hash of their URL and render parameters
+    app.extensions["qr_cache"] = QRCodeCache(
+        app.config["QR_CACHE_DIR"], app.config["QR_CACHE_SIZE"]
+    )
+
+    # Rendered land page fragments, keyed on registry and per-land versions
+    app.extensions["response_cache"] = ResponseCache(
+        (
+            RedisBackend(app.config["RESPONSE_CACHE_URL"])
+            if app.config["RESPONSE_CACHE_URL"]
+            else LRUBackend(app.config["RESPONSE_CACHE_SIZE"])
+        ),
+        ttl=app.config["RESPONSE_CACHE_TTL"],
+        enabled=app.config["RESPONSE_CACHE_ENABLED"],
+    )
+
+    def database_engine():
+        with app.app_context():
+            return db.engine
+
+    # Fan-out of the recorded land changes to the live update streams
+    app.extensions["event_hub"] = ProcessLocal(
+        lambda: EventHub(
+            database_engine,
+            poll_interval=app.config["LIVE_UPDATES_POLL_INTERVAL"],
+            buffer_size=app.config["LIVE_UPDATES_BUFFER_SIZE"],
+            backfill_limit=app.config["LIVE_UPDATES_BUFFER_SIZE"],
+            retention=app.config["LIVE_UPDATES_RETENTION"],
+        )
+    )
+
+    with app.app_context():
+        configure_engine(
+            db.engine,
+            busy_timeout=app.config["SQLITE_BUSY_TIMEOUT"],
+            mmap_size=app.config["SQLITE_MMAP_SIZE"],
+        )
+        init_query_budget(app, db.engine)
+        init_metrics(app, db.engine)
+        app.extensions["land_indexes"] = detect_land_indexes(db.engine)
+        # Forked workers must not share the connection opened above
+        db.engine.dispose()
+    return app
+
+
+# Per-application services, resolved through the current app
+w3 = LocalProxy(lambda: current_app.extensions["ethereum"].w3)
+rpc_provider = LocalProxy(lambda: current_app.extensions["ethereum"].provider)
+transaction_verifier = LocalProxy(
+    lambda: current_app.extensions["transaction_verifier"].get()
+)
+password_hasher = LocalProxy(lambda: current_app.extensions["password_hasher"])
+image_pipeline = LocalProxy(lambda: current_app.extensions["image_pipeline"])
+qr_cache = LocalProxy(lambda: current_app.extensions["qr_cache"])
+response_cache = LocalProxy(lambda: current_app.extensions["response_cache"])
+event_hub = LocalProxy(lambda: current_app.extensions["event_hub"].get())
+
+# Tables of the optional SQLite land indexes created by `flask init-db`
+LAND_INDEX_TABLES = {
+    "search": "land_fts",
+    "geo": "land_rtree",
+    "counts": "land_counts",
+    "events": "land_event",
+    "versions": "land_registry_version",
+}
+
+
+def detect_land_indexes(engine):
+    """
+    Check which optional land indexes exist in the database.
+
+    Args:
+        engine: SQLAlchemy engine of the application database
+
+    Returns:
+        dict: "search" (FTS5), "geo" (R*Tree), "counts" (listing counter),
+            "events" (live update triggers) and "versions" (row versions)
+            availability flags
+    """
+    if engine.dialect.name != "sqlite":
+        return dict.fromkeys(LAND_INDEX_TABLES, False)
+    with engine.connect() as conn:
+        tables = set(
+            conn.scalars(text("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        )
+    return {name: table in tables for name, table in LAND_INDEX_TABLES.items()}
+
+
+def land_indexes():
+    """Return the land index flags of the current app (see detect_land_indexes)."""
+    return current_app.extensions["land_indexes"]
+
+
+TX_HASH_PATTERN = re.compile(r"0x[0-9a-fA-F]{64}")
 
 
 # Helper functions
@@ -171,6 +402,21 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def normalize_tx_hash(tx_hash):
+    """
+    Validate a transaction hash posted by the browser.
+
+    Args:
+        tx_hash: Submitted hash, possibly None
+
+    Returns:
+        str: Lower-cased hash, or None if it is missing or malformed
+    """
+    if tx_hash and TX_HASH_PATTERN.fullmatch(tx_hash):
+        return tx_hash.lower()
+    return None
+
+
 def save_file(file, folder):
     """
     Save an uploaded file with a unique name in the specified folder.
@@ -181,12 +427,16 @@ def save_file(file, folder):
 
     Returns:
         str: Path to the saved file relative to the uploads directory, or None if save failed
+            (including uploads that are not readable images)
     """
     if file and allowed_file(file.filename):
-        # Generate unique filename using UUID to prevent overwriting
-        filename = str(uuid.uuid4()) + "." + file.filename.rsplit(".", 1)[1].lower()
-        file_path = os.path.join(app.config["UPLOAD_FOLDER"], folder, filename)
-        file.save(file_path)
+        # Name the file after its content hash so re-uploads are deduplicated;
+        # resized variants are generated in the background
+        filename = image_pipeline.save(
+            file, folder, file.filename.rsplit(".", 1)[1].lower()
+        )
+        if filename is None:
+            return None
         # Return the path relative to the uploads directory for consistency
         if folder == "profiles":
             return filename  # Just return filename for profile images to maintain consistency
@@ -195,14 +445,159 @@ def save_file(file, folder):
     return None
 
 
+def current_registry_version():
+    """
+    Return the registry's high-water mark (see versions.py).
+
+    Returns:
+        RegistryVersion: Last version and change time, or None if the
+            database has no row versions
+    """
+    if not land_indexes()["versions"]:
+        return None
+    return registry_version(db.session)
+
+
+def fragment_version(registry):
+    """
+    Return the registry version to key cached list page fragments on.
+
+    The database's high-water mark is advanced by every writer, in any
+    process. Without row versions, the response cache's own registry version
+    is used if its backend is shared between processes.
+
+    Args:
+        registry: Result of `current_registry_version`
+
+    Returns:
+        int: Version, or None if the fragment must not be cached
+    """
+    if registry is not None:
+        return registry.version
+    if response_cache.shared:
+        return response_cache.registry_version()
+    return None
+
+
+def response_validators(parts, last_modified):
+    """
+    Build the validators of a response derived from row versions.
+
+    Args:
+        parts: JSON-serialisable values identifying the representation,
+            including the versions of the rows it is built from
+        last_modified: Time of the last change of these rows (UTC)
+
+    Returns:
+        tuple: (strong ETag, Last-Modified), or None if the response must
+            not be revalidated because it shows flashed messages
+    """
+    # Flashed messages are shown once; a page with them must not be reused
+    if "_flashes" in session:
+        return None
+    etag = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+    return etag, utc(last_modified)
+
+
+def not_modified(validators):
+    """
+    Answer a conditional GET before the response body is built.
+
+    Args:
+        validators: Result of `response_validators`; None or False when the
+            response has no validators
+
+    Returns:
+        Response: 304 Not Modified if the client's copy is current, else None
+    """
+    if not validators:
+        return None
+    etag, last_modified = validators
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(Response(status=304), validators)
+
+
+def with_validators(response, validators):
+    """Set the ETag and Last-Modified headers; the client must revalidate."""
+    if validators:
+        etag, last_modified = validators
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@bp.app_template_global()
+def upload_variants(path):
+    """
+    Build srcset values for an uploaded image.
+
+    Args:
+        path: Image path relative to the uploads directory
+
+    Returns:
+        dict: WebP and JPEG srcset strings plus a JPEG fallback src, or None
+            if the image has no variants (yet)
+    """
+    variants = image_pipeline.variants(path)
+    if variants is None:
+        return None
+
+    def srcset(files):
+        return ", ".join(
+            f"{url_for('static', filename='uploads/' + name)} {width}w"
+            for name, width in files
+        )
+
+    return {
+        "webp": srcset(variants["webp"]),
+        "jpeg": srcset(variants["jpg"]),
+        # Medium, or the full image if it is no wider than the thumbnail
+        "src": url_for("static", filename="uploads/" + variants["jpg"][:2][-1][0]),
+    }
+
+
+def verification_result(transaction, chain_result):
+    """
+    Combine a stored transaction with its on-chain verification.
+
+    The transaction is verified when its receipt succeeded and the decoded
+    LandTransferred event refers to the same land.
+
+    Args:
+        transaction: Transaction record from the database
+        chain_result: Result of TransactionVerifier for its hash
+
+    Returns:
+        dict: JSON-serialisable verification result
+    """
+    event = chain_result.get("event")
+    return {
+        "verified": chain_result["status"] == "confirmed"
+        and event is not None
+        and event["land_id"] == transaction.land.blockchain_id,
+        "transaction": {
+            "hash": transaction.blockchain_tx_hash,
+            "land_id": transaction.land_id,
+            "seller": transaction.seller.username,
+            "buyer": transaction.buyer.username,
+            "price": transaction.price,
+            "date": transaction.transaction_date.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "blockchain": chain_result,
+    }
+
+
 # Routes
-@app.route("/")
+@bp.route("/")
 def index():
     """Homepage route"""
     return render_template("index.html")
 
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     """
     User registration route.
@@ -219,15 +614,21 @@ def register():
         # Form validation
         if User.query.filter_by(username=username).first():
             flash("Username already exists", "danger")
-            return redirect(url_for("register"))
+            return redirect(url_for("main.register"))
 
         if User.query.filter_by(email=email).first():
             flash("Email already registered", "danger")
-            return redirect(url_for("register"))
+            return redirect(url_for("main.register"))
 
         if password != confirm_password:
             flash("Passwords do not match", "danger")
-            return redirect(url_for("register"))
+            return redirect(url_for("main.register"))
+
+        try:
+            password_hash = password_hasher.hash(password)
+        except HasherBusy:
+            flash("The server is busy, please try again in a moment", "warning")
+            return redirect(url_for("main.register"))
 
         # Generate blockchain wallet
         wallet = (
@@ -241,7 +642,7 @@ def register():
         new_user = User(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password),
+            password_hash=password_hash,
             blockchain_address=wallet.address,
             profile_image=profile_image,
         )
@@ -251,16 +652,16 @@ def register():
             db.session.commit()
 
             flash("Registration successful! You can now log in.", "success")
-            return redirect(url_for("login"))
+            return redirect(url_for("main.login"))
         except Exception as e:
             db.session.rollback()
             flash(f"An error occurred: {str(e)}", "danger")
-            return redirect(url_for("register"))
+            return redirect(url_for("main.register"))
 
     return render_template("register.html")
 
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     """
     User login route.
@@ -274,29 +675,46 @@ def login():
 
         user = User.query.filter_by(username=username).first()
 
-        if user and check_password_hash(user.password_hash, password):
+        try:
+            valid = user is not None and password_hasher.verify(
+                user.password_hash, password
+            )
+        except HasherBusy:
+            flash("The server is busy, please try again in a moment", "warning")
+            return render_template("login.html"), 503
+
+        # Upgrade hashes made with an older algorithm or cost; best effort,
+        # the next login retries if the hasher is busy now
+        if valid and password_hasher.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = password_hasher.hash(password)
+                db.session.commit()
+            except HasherBusy:
+                current_app.logger.info("Skipped rehash for user %s: hasher busy", user.id)
+
+        if valid:
             # Store user data in session
             session["user_id"] = user.id
             session["username"] = user.username
             session["blockchain_address"] = user.blockchain_address
 
             flash("Login successful!", "success")
-            return redirect(url_for("dashboard"))
+            return redirect(url_for("main.dashboard"))
         else:
             flash("Invalid username or password", "danger")
 
     return render_template("login.html")
 
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
     """Log user out by clearing session data"""
     session.clear()
     flash("You have been logged out", "info")
-    return redirect(url_for("index"))
+    return redirect(url_for("main.index"))
 
 
-@app.route("/dashboard")
+@bp.route("/dashboard")
 def dashboard():
     """
     User dashboard showing owned lands.
@@ -305,12 +723,12 @@ def dashboard():
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     user = User.query.filter_by(id=session["user_id"]).first()
     if not user:
         flash("User not found", "danger")
-        return redirect(url_for("logout"))
+        return redirect(url_for("main.logout"))
 
     # Get lands owned by the user
     user_lands = Land.query.filter_by(owner_id=user.id).all()
@@ -318,7 +736,7 @@ def dashboard():
     return render_template("dashboard.html", user=user, lands=user_lands)
 
 
-@app.route("/profile", methods=["GET", "POST"])
+@bp.route("/profile", methods=["GET", "POST"])
 def profile():
     """
     User profile management route.
@@ -330,7 +748,7 @@ def profile():
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     user = User.query.get(session["user_id"])
 
@@ -343,14 +761,16 @@ def profile():
                     # Store just the filename for profile images
                     user.profile_image = saved_path
                     db.session.commit()
+                    # Land detail pages show the owner's picture
+                    response_cache.bump([land.id for land in user.lands])
                     flash("Profile image updated successfully", "success")
 
-        return redirect(url_for("profile"))
+        return redirect(url_for("main.profile"))
 
     return render_template("profile.html", user=user)
 
 
-@app.route("/update_wallet_address", methods=["POST"])
+@bp.route("/update_wallet_address", methods=["POST"])
 def update_wallet_address():
     """
     Update user's blockchain wallet address.
@@ -382,7 +802,7 @@ def update_wallet_address():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-@app.route("/registerLand", methods=["GET", "POST"])
+@bp.route("/registerLand", methods=["GET", "POST"])
 def registerLand():
     """
     Land registration route.
@@ -394,7 +814,7 @@ def registerLand():
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     if request.method == "POST":
         title = request.form["title"]
@@ -402,8 +822,26 @@ def registerLand():
         description = request.form["description"]
         price = float(request.form["price"])
         for_sale = "for_sale" in request.form
-        blockchain_tx_hash = request.form.get("blockchain_tx_hash")
-        blockchain_id = request.form.get("blockchain_id")
+        # The land ID posted by the browser is ignored: the confirmation worker
+        # reads it from the transaction receipt
+        blockchain_tx_hash = normalize_tx_hash(request.form.get("blockchain_tx_hash"))
+        form_data = {
+            "title": title,
+            "location": location,
+            "latitude": request.form.get("latitude", ""),
+            "longitude": request.form.get("longitude", ""),
+            "boundary": request.form.get("boundary", ""),
+            "description": description,
+            "price": price,
+            "for_sale": for_sale,
+        }
+
+        # Optional coordinates, checked before the user pays for the transaction
+        try:
+            geometry = land_geometry(request.form)
+        except ValueError as e:
+            flash(f"Invalid coordinates: {str(e)}", "danger")
+            return render_template("registerLand.html", form_data=form_data)
 
         # Save land image
         land_image = "default_land.png"
@@ -414,68 +852,147 @@ def registerLand():
                 if saved_path:
                     land_image = saved_path
 
-        # If we have a blockchain transaction hash and ID, save the land to database
-        if blockchain_tx_hash and blockchain_id:
+        # If we have a blockchain transaction hash, save the land as pending
+        if blockchain_tx_hash:
             try:
-                # Create local record
+                job = ConfirmationJob(
+                    kind="register",
+                    tx_hash=blockchain_tx_hash,
+                    user_id=session["user_id"],
+                    payload=json.dumps({"for_sale": for_sale}),
+                )
+                db.session.add(job)
+                db.session.flush()
+
+                # Unlisted until the registration is confirmed
                 new_land = Land(
-                    blockchain_id=int(blockchain_id),
+                    blockchain_id=job.placeholder_blockchain_id,
                     owner_id=session["user_id"],
                     title=title,
                     location=location,
                     description=description,
                     price=price,
                     image=land_image,
-                    for_sale=for_sale,
+                    for_sale=False,
+                    status="pending",
+                    **geometry,
                 )
-
                 db.session.add(new_land)
+                db.session.flush()
+                job.land_id = new_land.id
                 db.session.commit()
+                response_cache.bump([new_land.id])
 
-                flash("Land registered successfully on the blockchain!", "success")
-                return redirect(url_for("dashboard"))
-            except IntegrityError as e:
+                flash(
+                    "Land submitted! It will be listed once the blockchain transaction is confirmed.",
+                    "success",
+                )
+                return redirect(url_for("main.dashboard"))
+            except IntegrityError:
                 db.session.rollback()
-                if "UNIQUE constraint failed: land.blockchain_id" in str(e):
-                    raise ValueError("Blockchain ID already exists in the database.")
-                # flash(f"An error occurred: {str(e)}", "danger")
-                # return redirect(url_for("registerLand"))
-                else:
-                    raise
+                flash("This blockchain transaction has already been submitted", "danger")
+                return redirect(url_for("main.registerLand"))
         else:
             # This is the initial form submission without blockchain confirmation
             # Just render the template with the form data for the frontend to handle the transaction
-            return render_template(
-                "registerLand.html",
-                form_data={
-                    "title": title,
-                    "location": location,
-                    "description": description,
-                    "price": price,
-                    "for_sale": for_sale,
-                    "image": land_image if land_image != "default_land.png" else None,
-                },
-            )
+            form_data["image"] = land_image if land_image != "default_land.png" else None
+            return render_template("registerLand.html", form_data=form_data)
 
     return render_template("registerLand.html")
 
 
-@app.route("/marketplace")
+@bp.route("/marketplace")
 def marketplace():
     """
-    Land marketplace route displaying all lands for sale.
+    Land marketplace route displaying one page of the lands for sale.
+
+    Query Parameters:
+        sort: newest (default), price_asc or price_desc
+        min_price: Lowest price
+        max_price: Highest price
+        location: Words the location must contain
+        cursor: Position after the previous page
+
+    Returns:
+        The page, or 304 if the client's copy (ETag/Last-Modified) is current
 
     Requires authentication.
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
+
+    sort = request.args.get("sort", DEFAULT_SORT)
+    if sort not in LISTING_SORTS:
+        sort = DEFAULT_SORT
+    min_price = request.args.get("min_price", type=float)
+    max_price = request.args.get("max_price", type=float)
+    location = request.args.get("location", "").strip()
+    cursor = request.args.get("cursor") or None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort)
+        except ValueError:
+            cursor = after = None
+    else:
+        after = None
+
+    params = {
+        "sort": sort,
+        "min_price": min_price,
+        "max_price": max_price,
+        "location": location or None,
+    }
+
+    registry = current_registry_version()
+    validators = registry and response_validators(
+        ["marketplace", registry.version, *params.values(), cursor], registry.updated_at
+    )
+    response = not_modified(validators)
+    if response is not None:
+        return response
 
-    lands_for_sale = Land.query.filter_by(for_sale=True).all()
-    return render_template("marketplace.html", lands=lands_for_sale)
+    def render_lands():
+        filters = listing_filters(
+            min_price, max_price, location, use_fts=land_indexes()["search"]
+        )
+        lands, next_cursor = listing_page(
+            filters,
+            sort=sort,
+            cursor=after,
+            per_page=current_app.config["MARKETPLACE_PAGE_SIZE"],
+        )
+        count, exact = listing_count(filters, use_counter=land_indexes()["counts"])
+        return render_template(
+            "marketplaceLands.html",
+            lands=lands,
+            count=count,
+            count_exact=exact,
+            params=params,
+            cursor=cursor,
+            next_cursor=next_cursor,
+        )
+
+    version = fragment_version(registry)
+    lands_html = response_cache.get_or_set(
+        "marketplace",
+        None if version is None else [version, *params.values(), cursor],
+        render_lands,
+    )
+    live_updates = land_indexes()["events"]
+    page = render_template(
+        "marketplace.html",
+        lands_html=Markup(lands_html),
+        params=params,
+        sorts=LISTING_SORTS,
+        live_updates=live_updates,
+        # Events up to here may already be on the page; replaying them is harmless
+        last_event_id=event_hub.last_id if live_updates else None,
+    )
+    return with_validators(make_response(page), validators)
 
 
-@app.route("/land/<int:land_id>")
+@bp.route("/land/<int:land_id>")
 def landDetails(land_id):
     """
     Display detailed information about a specific land.
@@ -483,17 +1000,73 @@ def landDetails(land_id):
     Args:
         land_id: ID of the land to display
 
+    Returns:
+        The page, or 304 if the client's copy (ETag/Last-Modified) is current
+
     Requires authentication.
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
+
+    def load_land():
+        # Load the owner and the transaction history with their users up front
+        return (
+            Land.query.options(
+                joinedload(Land.owner),
+                selectinload(Land.transactions).options(
+                    joinedload(Transaction.seller), joinedload(Transaction.buyer)
+                ),
+            )
+            .filter_by(id=land_id)
+            .first_or_404()
+        )
 
-    land = Land.query.get_or_404(land_id)
-    return render_template("landDetails.html", land=land)
+    # The page also shows the owner's profile image, which has no row version
+    current = db.session.execute(
+        select(Land.owner_id, Land.version, Land.updated_at, User.profile_image)
+        .join(User, User.id == Land.owner_id)
+        .where(Land.id == land_id)
+    ).first()
+    if current is None:
+        abort(404)
+    validators = land_indexes()["versions"] and response_validators(
+        ["land", land_id, current.version, current.profile_image, session["user_id"]],
+        current.updated_at,
+    )
+    response = not_modified(validators)
+    if response is not None:
+        return response
+
+    # The page differs for the owner (listing controls) and other users (buy form)
+    viewer = "owner" if current.owner_id == session["user_id"] else "visitor"
+    # Without row versions only a shared cache sees the writes of other processes
+    cacheable = land_indexes()["versions"] or response_cache.shared
+    content_html = response_cache.get_or_set(
+        "landDetails",
+        [
+            land_id,
+            response_cache.land_version(land_id),
+            current.version,
+            current.profile_image,
+            viewer,
+        ]
+        if cacheable
+        else None,
+        lambda: render_template("landDetailsContent.html", land=load_land()),
+    )
+    live_updates = land_indexes()["events"]
+    page = render_template(
+        "landDetails.html",
+        content_html=Markup(content_html),
+        land_id=land_id,
+        live_updates=live_updates,
+        last_event_id=event_hub.last_id if live_updates else None,
+    )
+    return with_validators(make_response(page), validators)
 
 
-@app.route("/landQR/<int:land_id>")
+@bp.route("/landQR/<int:land_id>")
 def landQR(land_id):
     """
     Generate QR code for land verification.
@@ -501,41 +1074,85 @@ def landQR(land_id):
     Args:
         land_id: ID of the land to generate QR code for
 
+    Query Parameters:
+        format: "png" (default) or "svg"
+
     Returns:
-        PNG image of QR code
+        QR code image, or 304 if the client's cached copy (ETag) is current
 
     Requires authentication.
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     land = Land.query.get_or_404(land_id)
+    fmt = request.args.get("format", "png")
+    if fmt not in QR_FORMATS:
+        abort(400)
 
     # Create a QR code that links to your verification URL
-    verification_url = url_for("landDetails", land_id=land.id, _external=True)
-
-    # Generate QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+    verification_url = url_for("main.landDetails", land_id=land.id, _external=True)
+
+    # The ETag is the content hash, so revalidation needs no rendering
+    etag = qr_cache_key(verification_url, fmt)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        etag, data = qr_cache.get(verification_url, fmt)
+        response = Response(data, mimetype=QR_FORMATS[fmt])
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = (
+        f"private, max-age={current_app.config['QR_CACHE_MAX_AGE']}"
     )
-    qr.add_data(verification_url)
-    qr.make(fit=True)
+    return response
+
+
+@bp.route("/api/landQR/export", methods=["POST"])
+def export_land_qr_codes():
+    """
+    API endpoint to download the QR codes of many lands as a ZIP archive.
+
+    Request JSON:
+        land_ids: IDs of the lands to include
+        format: "png" (default) or "svg"
+
+    Returns:
+        Streamed ZIP archive with one land-<id> file per existing land
 
-    img = qr.make_image(fill_color="black", back_color="white")
+    Requires authentication.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
 
-    # Save image to memory buffer
-    img_bytes = io.BytesIO()
-    img.save(img_bytes, format="PNG")
-    img_bytes.seek(0)
+    data = request.get_json(silent=True) or {}
+    land_ids = data.get("land_ids")
+    fmt = data.get("format", "png")
+    if not isinstance(land_ids, list) or not all(isinstance(i, int) for i in land_ids):
+        return jsonify({"error": "Expected a list of land IDs"}), 400
+    if fmt not in QR_FORMATS:
+        return jsonify({"error": "Unsupported format"}), 400
+    if len(land_ids) > current_app.config["QR_BULK_LIMIT"]:
+        return (
+            jsonify({"error": f"At most {current_app.config['QR_BULK_LIMIT']} lands per export"}),
+            400,
+        )
+
+    existing = db.session.scalars(select(Land.id).where(Land.id.in_(land_ids))).all()
+    named_urls = [
+        (f"land-{land_id}", url_for("main.landDetails", land_id=land_id, _external=True))
+        for land_id in sorted(existing)
+    ]
 
-    return send_file(img_bytes, mimetype="image/png")
+    return Response(
+        qr_cache.stream_zip(named_urls, fmt),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=land-qr-codes.zip"},
+    )
 
 
-@app.route("/buyLand/<int:land_id>", methods=["POST"])
+@bp.route("/buyLand/<int:land_id>", methods=["POST"])
 def buyLand(land_id):
     """
     Process land purchase transaction.
@@ -547,54 +1164,50 @@ def buyLand(land_id):
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
-    land = Land.query.get_or_404(land_id)
     buyer_id = session["user_id"]
 
-    # Validate purchase conditions
-    if land.owner_id == buyer_id:
-        flash("You already own this land", "warning")
-        return redirect(url_for("landDetails", land_id=land_id))
-
-    if not land.for_sale:
-        flash("This land is not for sale", "warning")
-        return redirect(url_for("landDetails", land_id=land_id))
-
     # Get blockchain transaction hash from form
-    blockchain_tx_hash = request.form.get("blockchain_tx_hash")
-
-    if blockchain_tx_hash:
-        try:
-            # Record the transaction
-            transaction = Transaction(
-                blockchain_tx_hash=blockchain_tx_hash,
-                land_id=land.id,
-                seller_id=land.owner_id,
-                buyer_id=buyer_id,
-                price=land.price,
-            )
-
-            # Transfer ownership
-            land.owner_id = buyer_id
-            land.for_sale = False
-
-            db.session.add(transaction)
-            db.session.commit()
-
-            flash("Land purchased successfully!", "success")
-            return redirect(url_for("dashboard"))
-        except Exception as e:
-            db.session.rollback()
-            flash(f"An error occurred: {str(e)}", "danger")
-            return redirect(url_for("landDetails", land_id=land_id))
-    else:
+    blockchain_tx_hash = normalize_tx_hash(request.form.get("blockchain_tx_hash"))
+    if not blockchain_tx_hash:
         # No blockchain transaction hash - return to land details
         flash("Blockchain transaction required to complete purchase", "warning")
-        return redirect(url_for("landDetails", land_id=land_id))
+        return redirect(url_for("main.landDetails", land_id=land_id))
+
+    try:
+        # Ownership moves once the transaction is confirmed
+        result = submit_purchase(
+            land_id,
+            buyer_id,
+            blockchain_tx_hash,
+            max_retries=current_app.config["PURCHASE_MAX_RETRIES"],
+        )
+    except LandNotFound:
+        abort(404)
+    except PurchaseError as e:
+        flash(e.message, e.category)
+        return redirect(url_for("main.landDetails", land_id=land_id))
+    except Exception as e:
+        db.session.rollback()
+        flash(f"An error occurred: {str(e)}", "danger")
+        return redirect(url_for("main.landDetails", land_id=land_id))
+
+    if not result.replayed:
+        response_cache.bump([land_id])
+        event_hub.notify()
+        flash(
+            "Purchase submitted! Ownership transfers once the blockchain transaction is confirmed.",
+            "success",
+        )
+    elif result.status == "pending":
+        flash("This purchase was already submitted and awaits confirmation.", "info")
+    else:
+        flash("This purchase is complete.", "success")
+    return redirect(url_for("main.dashboard"))
 
 
-@app.route("/transactions")
+@bp.route("/transactions")
 def transaction_history():
     """
     Display user's transaction history.
@@ -605,23 +1218,27 @@ def transaction_history():
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
+
+    transactions = db.session.scalars(user_transactions_query(session["user_id"])).all()
+    return render_template("transactions.html", transactions=transactions)
 
-    user_id = session["user_id"]
 
-    # Get transactions where user is either buyer or seller
-    transactions = (
-        Transaction.query.filter(
-            (Transaction.buyer_id == user_id) | (Transaction.seller_id == user_id)
+def user_transactions_query(user_id):
+    """Select the transactions a user bought or sold in, newest first."""
+    return (
+        select(Transaction)
+        .options(
+            joinedload(Transaction.land),
+            joinedload(Transaction.seller),
+            joinedload(Transaction.buyer),
         )
+        .where((Transaction.buyer_id == user_id) | (Transaction.seller_id == user_id))
         .order_by(Transaction.transaction_date.desc())
-        .all()
     )
 
-    return render_template("transactions.html", transactions=transactions)
-
 
-@app.route("/toggle_sale_status/<int:land_id>", methods=["POST"])
+@bp.route("/toggle_sale_status/<int:land_id>", methods=["POST"])
 def toggle_sale_status(land_id):
     """
     Toggle the for_sale status of a land.
@@ -633,19 +1250,25 @@ def toggle_sale_status(land_id):
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     land = Land.query.get_or_404(land_id)
 
     # Ensure the user owns this land
     if land.owner_id != session["user_id"]:
         flash("You do not have permission to modify this land", "danger")
-        return redirect(url_for("landDetails", land_id=land_id))
+        return redirect(url_for("main.landDetails", land_id=land_id))
+
+    if land.status == "pending":
+        flash("This land has a blockchain transaction awaiting confirmation", "warning")
+        return redirect(url_for("main.landDetails", land_id=land_id))
 
     try:
         # Toggle for_sale status
         land.for_sale = not land.for_sale
         db.session.commit()
+        response_cache.bump([land.id])
+        event_hub.notify()
 
         status = "listed for sale" if land.for_sale else "unlisted from sale"
         flash(f"Land successfully {status}", "success")
@@ -653,10 +1276,10 @@ def toggle_sale_status(land_id):
         db.session.rollback()
         flash(f"An error occurred: {str(e)}", "danger")
 
-    return redirect(url_for("landDetails", land_id=land_id))
+    return redirect(url_for("main.landDetails", land_id=land_id))
 
 
-@app.route("/editLand/<int:land_id>", methods=["GET", "POST"])
+@bp.route("/editLand/<int:land_id>", methods=["GET", "POST"])
 def editLand(land_id):
     """
     Edit land details.
@@ -671,26 +1294,33 @@ def editLand(land_id):
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     land = Land.query.get_or_404(land_id)
 
     # Ensure the user owns this land
     if land.owner_id != session["user_id"]:
         flash("You do not have permission to edit this land", "danger")
-        return redirect(url_for("landDetails", land_id=land_id))
+        return redirect(url_for("main.landDetails", land_id=land_id))
+
+    if land.status == "pending":
+        flash("This land has a blockchain transaction awaiting confirmation", "warning")
+        return redirect(url_for("main.landDetails", land_id=land_id))
 
     if request.method == "POST":
-        blockchain_tx_hash = request.form.get("blockchain_tx_hash")
+        blockchain_tx_hash = normalize_tx_hash(request.form.get("blockchain_tx_hash"))
 
-        # Only update if we have blockchain confirmation
+        # Only update once the blockchain transaction is confirmed
         if blockchain_tx_hash:
             try:
-                land.title = request.form["title"]
-                land.location = request.form["location"]
-                land.description = request.form["description"]
-                land.price = float(request.form["price"])
-                land.for_sale = "for_sale" in request.form
+                changes = {
+                    "title": request.form["title"],
+                    "location": request.form["location"],
+                    "description": request.form["description"],
+                    "price": float(request.form["price"]),
+                    "for_sale": "for_sale" in request.form,
+                    **land_geometry(request.form),
+                }
 
                 # Update land image if provided
                 if "land_image" in request.files:
@@ -698,23 +1328,165 @@ def editLand(land_id):
                     if file.filename:
                         saved_path = save_file(file, "lands")
                         if saved_path:
-                            land.image = saved_path
-
+                            changes["image"] = saved_path
+
+                land.status = "pending"
+                db.session.add(
+                    ConfirmationJob(
+                        kind="edit",
+                        tx_hash=blockchain_tx_hash,
+                        user_id=session["user_id"],
+                        land_id=land.id,
+                        payload=json.dumps(changes),
+                    )
+                )
                 db.session.commit()
+                response_cache.bump([land.id])
+                event_hub.notify()
 
-                flash("Land details updated successfully on the blockchain", "success")
-                return redirect(url_for("landDetails", land_id=land_id))
+                flash(
+                    "Land update submitted! The changes apply once the blockchain transaction is confirmed.",
+                    "success",
+                )
+                return redirect(url_for("main.landDetails", land_id=land_id))
+            except IntegrityError:
+                db.session.rollback()
+                flash("This blockchain transaction has already been submitted", "danger")
+            except ValueError as e:
+                db.session.rollback()
+                flash(f"Invalid land details: {str(e)}", "danger")
             except Exception as e:
                 db.session.rollback()
                 flash(f"An error occurred: {str(e)}", "danger")
         else:
             # Form submission without blockchain transaction - return the form with values
+            try:
+                land_geometry(request.form)
+            except ValueError as e:
+                flash(f"Invalid coordinates: {str(e)}", "danger")
+                return render_template("editLand.html", land=land)
             return render_template("editLand.html", land=land, form_submission=True)
 
     return render_template("editLand.html", land=land)
 
 
-@app.route("/api/verify_transaction/<transaction_hash>")
+@bp.route("/api/rpc_stats")
+def rpc_stats():
+    """
+    API endpoint with the health of the configured RPC endpoints.
+
+    Returns:
+        JSON response with request/error counts, latency percentiles and
+        circuit breaker state per endpoint
+
+    Requires authentication.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify({"endpoints": rpc_provider.stats()})
+
+
+@bp.route("/metrics")
+def metrics():
+    """
+    Prometheus endpoint with the request, SQL, RPC, template and generation
+    metrics of this process.
+
+    Returns:
+        Metrics in the Prometheus text format
+
+    Requires the METRICS_TOKEN bearer token when one is configured.
+    """
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return Response(
+        metrics_registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@bp.route("/api/cache_stats")
+def cache_stats():
+    """
+    API endpoint with the hit/miss counters of the response cache.
+
+    Returns:
+        JSON response with the counters of this process per cached page
+
+    Requires authentication.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify({"pages": response_cache.stats()})
+
+
+@bp.route("/api/events")
+def live_events():
+    """
+    Server-Sent Events stream of the changes of the lands (see liveupdates.py).
+
+    Query Parameters:
+        land: Only send the events of this land ID
+        last_event_id: Resume after this event, e.g. the one a page was
+            rendered at; the Last-Event-ID header of a reconnecting browser
+            takes precedence
+
+    Returns:
+        text/event-stream response; heartbeats (comments) are sent when there
+        were no events to send and carry the ID to resume from
+
+    Requires authentication.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not land_indexes()["events"]:
+        return jsonify({"error": "Live updates are not available"}), 404
+
+    hub = event_hub._get_current_object()
+    if hub.subscribers >= current_app.config["LIVE_UPDATES_MAX_STREAMS"]:
+        response = jsonify({"error": "Too many live update streams"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+        "last_event_id"
+    )
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    land_id = request.args.get("land", type=int)
+    heartbeat = current_app.config["LIVE_UPDATES_HEARTBEAT"]
+    retry = current_app.config["LIVE_UPDATES_RETRY"]
+
+    # No request context is kept: the stream only reads the shared hub
+    def generate():
+        yield f"retry: {retry}\n\n".encode()
+        for cursor, events in hub.stream(last_event_id, heartbeat):
+            frames = [
+                event.frame
+                for event in events
+                if land_id is None or event.land_id in (None, land_id)
+            ]
+            if frames:
+                yield b"".join(frames)
+            elif cursor is None:
+                yield b": heartbeat\n\n"
+            else:
+                # Moves the browser's Last-Event-ID past the skipped events
+                yield f": heartbeat\nid: {cursor}\n\n".encode()
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@bp.route("/api/verify_transaction/<transaction_hash>")
 def verify_transaction(transaction_hash):
     """
     API endpoint to verify transaction authenticity.
@@ -723,7 +1495,7 @@ def verify_transaction(transaction_hash):
         transaction_hash: Hash of the blockchain transaction to verify
 
     Returns:
-        JSON response with transaction details
+        JSON response with transaction details and the on-chain receipt check
 
     Requires authentication.
     """
@@ -731,101 +1503,884 @@ def verify_transaction(transaction_hash):
         return jsonify({"error": "Unauthorized"}), 401
 
     transaction = Transaction.query.filter_by(
-        blockchain_tx_hash=transaction_hash
+        blockchain_tx_hash=transaction_hash.lower()
     ).first()
 
     if not transaction:
         return jsonify({"error": "Transaction not found"}), 404
 
-    # In a real application, we would verify this against the blockchain
-    # Here we'll simply return the stored information
+    try:
+        chain_result = transaction_verifier.verify(transaction.blockchain_tx_hash)
+    except Exception as e:
+        return jsonify({"error": f"Blockchain lookup failed: {str(e)}"}), 502
 
-    result = {
-        "verified": True,
-        "transaction": {
-            "hash": transaction.blockchain_tx_hash,
-            "land_id": transaction.land_id,
-            "seller": transaction.seller.username,
-            "buyer": transaction.buyer.username,
-            "price": transaction.price,
-            "date": transaction.transaction_date.strftime("%Y-%m-%d %H:%M:%S"),
-        },
+    return jsonify(verification_result(transaction, chain_result))
+
+
+@bp.route("/api/verify_transactions", methods=["POST"])
+def verify_transactions():
+    """
+    API endpoint to verify many transactions in one blockchain round trip.
+
+    Request JSON:
+        hashes: List of blockchain transaction hashes
+
+    Returns:
+        JSON object mapping each hash to its verification result, or to an
+        error if the hash is not a recorded transaction
+
+    Requires authentication.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    hashes = data.get("hashes")
+    if not isinstance(hashes, list) or not all(isinstance(h, str) for h in hashes):
+        return jsonify({"error": "Expected a list of transaction hashes"}), 400
+    if len(hashes) > current_app.config["VERIFY_BATCH_LIMIT"]:
+        return (
+            jsonify(
+                {
+                    "error": f"At most {current_app.config['VERIFY_BATCH_LIMIT']} hashes per request"
+                }
+            ),
+            400,
+        )
+
+    # Stored hashes are lower-case (normalize_tx_hash); input may be checksum-cased
+    transactions = {
+        tx.blockchain_tx_hash.lower(): tx
+        for tx in Transaction.query.options(
+            joinedload(Transaction.land),
+            joinedload(Transaction.seller),
+            joinedload(Transaction.buyer),
+        )
+        .filter(Transaction.blockchain_tx_hash.in_({h.lower() for h in hashes}))
+        .all()
     }
 
-    return jsonify(result)
+    try:
+        chain_results = transaction_verifier.verify_many(list(transactions))
+    except Exception as e:
+        return jsonify({"error": f"Blockchain lookup failed: {str(e)}"}), 502
+
+    results = {}
+    for tx_hash in hashes:
+        transaction = transactions.get(tx_hash.lower())
+        if transaction is None:
+            results[tx_hash] = {"error": "Transaction not found"}
+        elif chain_results[tx_hash.lower()]["status"] == "error":
+            results[tx_hash] = {
+                "error": f"Blockchain lookup failed: {chain_results[tx_hash.lower()]['error']}"
+            }
+        else:
+            results[tx_hash] = verification_result(
+                transaction, chain_results[tx_hash.lower()]
+            )
+
+    return jsonify({"results": results})
 
 
-@app.route("/seacrhLands")
+@bp.route("/seacrhLands")
 def seacrhLands():
     """
     Search lands by title, location, or description.
 
     Query Parameters:
         query: Search terms
+        page: Page number of the results
 
     Requires authentication.
     """
     if "user_id" not in session:
         flash("Please log in first", "warning")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     query = request.args.get("query", "")
+    page = max(request.args.get("page", 1, type=int), 1)
+
+    def render_results():
+        # Ranked full-text search over lands for sale; lists all of them if no query
+        lands, has_next = search_lands(
+            query,
+            page=page,
+            per_page=current_app.config["SEARCH_PAGE_SIZE"],
+            use_fts=land_indexes()["search"],
+        )
+        return render_template(
+            "searchResultsLands.html",
+            lands=lands,
+            query=query,
+            page=page,
+            has_next=has_next,
+        )
 
-    if query:
-        # Search for lands matching the query that are for sale
-        lands = Land.query.filter(
-            (
-                Land.title.contains(query)
-                | Land.location.contains(query)
-                | Land.description.contains(query)
-            )
-            & (Land.for_sale == True)
-        ).all()
+    version = fragment_version(current_registry_version())
+    results_html = response_cache.get_or_set(
+        "search", None if version is None else [version, query, page], render_results
+    )
+    return render_template(
+        "searchResults.html", query=query, results_html=Markup(results_html)
+    )
+
+
+def land_api_filters(args):
+    """
+    Build SQL filters for the land API from query parameters.
+
+    Args:
+        args: Request query parameters (for_sale, owner_id, min_price,
+            max_price, bbox)
+
+    Returns:
+        list: SQLAlchemy filter expressions
+
+    Raises:
+        ValueError: If a parameter cannot be parsed
+    """
+    filters = []
+    if "for_sale" in args:
+        value = args["for_sale"].lower()
+        if value not in ("true", "false", "1", "0"):
+            raise ValueError("for_sale must be true or false")
+        filters.append(Land.for_sale == (value in ("true", "1")))
+    if "owner_id" in args:
+        filters.append(Land.owner_id == int(args["owner_id"]))
+    if "min_price" in args:
+        filters.append(Land.price >= float(args["min_price"]))
+    if "max_price" in args:
+        filters.append(Land.price <= float(args["max_price"]))
+    if "bbox" in args:
+        filters.append(bbox_filter(parse_bbox(args["bbox"]), use_rtree=land_indexes()["geo"]))
+    return filters
+
+
+# Columns exposed by the land API
+LAND_API_COLUMNS = (
+    Land.id,
+    Land.blockchain_id,
+    Land.title,
+    Land.location,
+    Land.latitude,
+    Land.longitude,
+    Land.boundary,
+    Land.price,
+    Land.owner_id,
+    Land.for_sale,
+    Land.image,
+    Land.version,
+    Land.updated_at,
+)
+
+
+def land_api_query(filters, after, limit, key=Land.id, until=None):
+    """
+    Build the statement of one keyset page of the land API.
+
+    Args:
+        filters: SQLAlchemy filter expressions
+        after: Only return lands with a key greater than this cursor
+        limit: Maximum number of rows
+        key: Land.id, or Land.version for delta sync
+        until: Only return lands with a key up to this value
+
+    Returns:
+        Select: Columns exposed by the land API, ordered by the key
+    """
+    query = select(*LAND_API_COLUMNS).where(key > after, *filters)
+    if until is not None:
+        query = query.where(key <= until)
+    return query.order_by(key).limit(limit)
+
+
+def land_api_page(filters, after, limit, key=Land.id, until=None):
+    """
+    Fetch one keyset page of lands as plain rows, ordered by ID or version.
+
+    Args:
+        filters: SQLAlchemy filter expressions
+        after: Only return lands with a key greater than this cursor
+        limit: Maximum number of rows
+        key: Land.id, or Land.version for delta sync
+        until: Only return lands with a key up to this value
+
+    Returns:
+        list: Row tuples of the columns exposed by the land API
+    """
+    return db.session.execute(land_api_query(filters, after, limit, key, until)).all()
+
+
+def land_api_dict(row, image_prefix):
+    """Serialize a land API row; `image_prefix` is the external uploads URL."""
+    variants = image_pipeline.variants(row.image)
+    return {
+        "id": row.id,
+        "blockchain_id": row.blockchain_id,
+        "title": row.title,
+        "location": row.location,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "price": row.price,
+        "owner_id": row.owner_id,
+        "for_sale": row.for_sale,
+        "version": row.version,
+        "updated_at": utc(row.updated_at).isoformat() if row.updated_at else None,
+        "image": f"{image_prefix}{row.image}",
+        # WebP thumb/medium/full renditions with their widths, once generated
+        "image_variants": (
+            [
+                {"url": image_prefix + name, "width": width}
+                for name, width in variants["webp"]
+            ]
+            if variants
+            else None
+        ),
+    }
+
+
+def land_api_feature(row, image_prefix, **properties):
+    """
+    Serialize a land API row as a GeoJSON Feature.
+
+    The geometry is the land's boundary, or its point if it has none.
+    """
+    if row.boundary:
+        geometry = json.loads(row.boundary)
+    elif row.latitude is not None and row.longitude is not None:
+        geometry = {"type": "Point", "coordinates": [row.longitude, row.latitude]}
     else:
-        # If no query, show all lands for sale
-        lands = Land.query.filter_by(for_sale=True).all()
+        geometry = None
+    return {
+        "type": "Feature",
+        "id": row.id,
+        "geometry": geometry,
+        "properties": {**land_api_dict(row, image_prefix), **properties},
+    }
+
 
-    return render_template("searchResults.html", lands=lands, query=query)
+def geojson_stream(features):
+    """Stream GeoJSON Features as one FeatureCollection, in constant memory."""
+    yield '{"type": "FeatureCollection", "features": ['
+    separator = ""
+    for feature in features:
+        yield separator + json.dumps(feature)
+        separator = ","
+    yield "]}\n"
 
 
-@app.route("/api/lands", methods=["GET"])
+@bp.route("/api/lands", methods=["GET"])
 def api_get_lands():
     """
-    API endpoint to get all lands.
+    API endpoint to list lands with keyset pagination.
+
+    Query Parameters:
+        limit: Page size (default 100, max 1000)
+        after: Cursor, the last land ID of the previous page
+        since: Delta sync: only the lands written after this registry
+            version, ordered by version; the `next` cursor is passed as
+            `since` again
+        for_sale: Only lands with this sale status (true/false)
+        owner_id: Only lands owned by this user
+        min_price, max_price: Price range
+        bbox: Only lands within min_lon,min_lat,max_lon,max_lat
+        format: "ndjson" to stream every matching land, one JSON object per
+            line, or "geojson" to stream them as a FeatureCollection, in
+            constant memory
 
     Returns:
-        JSON list of all lands
+        JSON object with the page of lands, the `next` cursor (null on the
+        last page) and the registry `version`; with `since`, also the IDs
+        of the lands `deleted` in that range. NDJSON/GeoJSON streams report
+        deleted lands as {"id", "deleted": true} records at the end. The
+        registry version is also sent as the X-Registry-Version header; 304
+        if the client's copy (ETag/Last-Modified) is current.
+
+    A full mirror is kept by paging without `since` once, then syncing with
+    `since` set to the `version` of the last synced page. Lands that stop
+    matching the filters are not reported, so mirrors should not filter.
 
     Requires authentication.
     """
     if "user_id" not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
-    lands = Land.query.all()
-    result = []
-
-    for land in lands:
-        result.append(
-            {
-                "id": land.id,
-                "blockchain_id": land.blockchain_id,
-                "title": land.title,
-                "location": land.location,
-                "price": land.price,
-                "owner_id": land.owner_id,
-                "for_sale": land.for_sale,
-                "image": url_for(
-                    "static", filename=f"uploads/{land.image}", _external=True
-                ),
-            }
+    try:
+        filters = land_api_filters(request.args)
+        after = int(request.args.get("after", 0))
+        since = int(request.args["since"]) if "since" in request.args else None
+        limit = int(request.args.get("limit", current_app.config["API_LANDS_DEFAULT_LIMIT"]))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+
+    registry = current_registry_version()
+    if since is not None:
+        if registry is None:
+            return jsonify({"error": "Delta sync is not available"}), 400
+        if "after" in request.args:
+            return jsonify({"error": "after cannot be combined with since"}), 400
+        # Versions written after this request are left to the next sync
+        key, after, until = Land.version, since, registry.version
+    else:
+        key, until = Land.id, None
+
+    # Build the uploads URL once instead of calling url_for per land
+    image_prefix = url_for("static", filename="uploads/", _external=True)
+
+    validators = registry and response_validators(
+        ["lands", registry.version, image_prefix, sorted(request.args.items(multi=True))],
+        registry.updated_at,
+    )
+    response = not_modified(validators)
+    if response is None:
+        response = land_api_response(
+            filters, key, after, until, limit, since, registry, image_prefix
+        )
+    if registry is not None:
+        response.headers["X-Registry-Version"] = str(registry.version)
+    return with_validators(response, validators)
+
+
+def land_api_response(filters, key, after, until, limit, since, registry, image_prefix):
+    """Build the page or stream of `api_get_lands` (see its docstring)."""
+    if request.args.get("format") in ("ndjson", "geojson"):
+        chunk_size = current_app.config["API_LANDS_STREAM_CHUNK"]
+
+        def generate(cursor):
+            while True:
+                rows = land_api_page(filters, cursor, chunk_size, key, until)
+                yield from rows
+                if len(rows) < chunk_size:
+                    break
+                cursor = getattr(rows[-1], key.key)
+
+        def deleted():
+            if since is None:
+                return []
+            return deleted_lands(db.session, since, registry.version)
+
+        if request.args["format"] == "geojson":
+
+            def features():
+                for row in generate(after):
+                    yield land_api_feature(row, image_prefix)
+                for land_id in deleted():
+                    yield {
+                        "type": "Feature",
+                        "id": land_id,
+                        "geometry": None,
+                        "properties": {"id": land_id, "deleted": True},
+                    }
+
+            return Response(
+                stream_with_context(geojson_stream(features())),
+                mimetype="application/geo+json",
+            )
+
+        def lines():
+            for row in generate(after):
+                yield json.dumps(land_api_dict(row, image_prefix)) + "\n"
+            for land_id in deleted():
+                yield json.dumps({"id": land_id, "deleted": True}) + "\n"
+
+        return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
+
+    limit = max(1, min(limit, current_app.config["API_LANDS_MAX_LIMIT"]))
+    rows = land_api_page(filters, after, limit, key, until)
+    next_cursor = getattr(rows[-1], key.key) if len(rows) == limit else None
+
+    page = {
+        "lands": [land_api_dict(row, image_prefix) for row in rows],
+        "next": next_cursor,
+        "version": registry.version if registry is not None else None,
+    }
+    if since is not None:
+        # Deletions in the same version range as the lands of this page
+        page["deleted"] = deleted_lands(
+            db.session, since, registry.version if next_cursor is None else next_cursor
+        )
+    return jsonify(page)
+
+
+@bp.route("/api/lands/nearby", methods=["GET"])
+def api_nearby_lands():
+    """
+    API endpoint to list located lands by distance from a point.
+
+    Query Parameters:
+        lat, lon: Point in degrees
+        radius: Only lands within this many kilometres
+        k: Only the k nearest lands (max API_LANDS_MAX_LIMIT)
+        page: Page number (default 1)
+        limit: Page size (default 100, max 1000)
+        for_sale, owner_id, min_price, max_price, bbox: As for /api/lands
+        format: "geojson" to stream every matching land, nearest first, as
+            a FeatureCollection
+
+    At least one of radius and k is required.
+
+    Returns:
+        JSON object with the page of lands, each with its `distance_km`, and
+        `has_next`, or a GeoJSON stream
+
+    Requires authentication.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        lat, lon = parse_point(request.args["lat"], request.args["lon"])
+        radius = float(request.args["radius"]) if "radius" in request.args else None
+        k = int(request.args["k"]) if "k" in request.args else None
+        page = max(int(request.args.get("page", 1)), 1)
+        limit = int(request.args.get("limit", current_app.config["API_LANDS_DEFAULT_LIMIT"]))
+        filters = land_api_filters(request.args)
+    except KeyError as e:
+        return jsonify({"error": f"Missing query parameter: {e.args[0]}"}), 400
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+    if radius is None and k is None:
+        return jsonify({"error": "Either radius or k is required"}), 400
+    if (radius is not None and radius <= 0) or (k is not None and k < 1):
+        return jsonify({"error": "radius and k must be positive"}), 400
+    if k is not None:
+        k = min(k, current_app.config["API_LANDS_MAX_LIMIT"])
+        # The k nearest lands are within the radius of the k-th nearest one
+        k_radius = nearest_radius(filters, lat, lon, k, use_rtree=land_indexes()["geo"])
+        if k_radius is not None:
+            radius = k_radius if radius is None else min(radius, k_radius)
+
+    query = nearby_query(
+        LAND_API_COLUMNS, filters, lat, lon, radius, use_rtree=land_indexes()["geo"]
+    )
+    image_prefix = url_for("static", filename="uploads/", _external=True)
+
+    def distance(row):
+        return round(haversine_km(lat, lon, row.latitude, row.longitude), 3)
+
+    if request.args.get("format") == "geojson":
+        if k is not None:
+            query = query.limit(k)
+        rows = db.session.execute(
+            query.execution_options(yield_per=current_app.config["API_LANDS_STREAM_CHUNK"])
+        )
+        features = (
+            land_api_feature(row, image_prefix, distance_km=distance(row)) for row in rows
+        )
+        return Response(
+            stream_with_context(geojson_stream(features)),
+            mimetype="application/geo+json",
+        )
+
+    limit = max(1, min(limit, current_app.config["API_LANDS_MAX_LIMIT"]))
+    offset = (page - 1) * limit
+    fetch = limit + 1
+    if k is not None:
+        fetch = max(0, min(fetch, k - offset))
+    rows = db.session.execute(query.offset(offset).limit(fetch)).all()
+
+    return jsonify(
+        {
+            "lands": [
+                {**land_api_dict(row, image_prefix), "distance_km": distance(row)}
+                for row in rows[:limit]
+            ],
+            "page": page,
+            "has_next": len(rows) > limit,
+        }
+    )
+
+
+@bp.route("/api/export/<any(lands, transactions):table>", methods=["GET"])
+def api_export(table):
+    """
+    Stream all lands or transactions for auditing.
+
+    Args:
+        table: "lands" or "transactions"
+
+    Query Parameters:
+        format: "csv" (default), "parquet" or "arrow"
+        start, end: Date range (ISO date or date and time, UTC) of the
+            creation of the lands or the date of the transactions; a plain
+            end date is included
+        owner: Only the lands owned by, or the transactions of, this user
+            (ID, username or wallet address)
+
+    Returns:
+        The export as a file download, streamed in constant memory
+
+    Requires authentication. Logged-in users only export their own lands
+    and transactions. Exporting all rows needs the EXPORT_TOKEN bearer
+    token; without a configured token, only the CLI exports all rows.
+    """
+    token = current_app.config["EXPORT_TOKEN"]
+    auditor = bool(token) and request.headers.get("Authorization") == f"Bearer {token}"
+    if not auditor and "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    try:
+        start = parse_time(request.args.get("start"))
+        end = parse_time(request.args.get("end"), end=True)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+    user_id = None if auditor else session["user_id"]
+    if request.args.get("owner"):
+        owner_id = find_user(db.session, request.args["owner"])
+        if owner_id is None:
+            return jsonify({"error": "Unknown owner"}), 400
+        if not auditor and owner_id != user_id:
+            return jsonify({"error": "Forbidden"}), 403
+        user_id = owner_id
+    try:
+        export = Export(
+            table,
+            fmt,
+            start=start,
+            end=end,
+            user_id=user_id,
+            chunk_size=current_app.config["EXPORT_CHUNK_SIZE"],
+        )
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return Response(
+        stream_with_context(export.chunks(db.engine)),
+        mimetype=export.mimetype,
+        headers={"Content-Disposition": f"attachment; filename={export.filename}"},
+    )
+
+
+def create_indexer(start_block=None):
+    """
+    Build an EventIndexer for the landRegistry contract from app config.
+
+    Args:
+        start_block: Optional override for the first block to scan
+
+    Returns:
+        EventIndexer: Indexer bound to the app's Web3 contract
+    """
+    from indexer import EventIndexer
+
+    ethereum = current_app.extensions["ethereum"]
+    return EventIndexer(
+        ethereum.w3,
+        ethereum.contract,
+        start_block=(
+            current_app.config["INDEXER_START_BLOCK"] if start_block is None else start_block
+        ),
+        batch_size=current_app.config["INDEXER_BATCH_SIZE"],
+        confirmations=current_app.config["INDEXER_CONFIRMATIONS"],
+    )
+
+
+@bp.cli.command("index-chain")
+@click.option("--from-block", type=int, default=None, help="First block to scan")
+@click.option("--follow", is_flag=True, help="Keep tailing new blocks")
+def index_chain(from_block, follow):
+    """Sync contract events into the database."""
+    indexer = create_indexer(from_block)
+    if follow:
+        indexer.run(
+            poll_interval=current_app.config["INDEXER_POLL_INTERVAL"],
+            on_change=lambda stats: response_cache.invalidate_all(),
+        )
+    else:
+        stats = indexer.sync_once()
+        if stats["lands"] or stats["transactions"]:
+            response_cache.invalidate_all()
+        click.echo(stats)
+
+
+def create_confirmation_worker():
+    """Build a ConfirmationWorker for the landRegistry contract from app config."""
+    from confirmations import ConfirmationWorker
+
+    ethereum = current_app.extensions["ethereum"]
+    return ConfirmationWorker(
+        ethereum.w3,
+        ethereum.contract,
+        batch_size=current_app.config["CONFIRMATION_BATCH_SIZE"],
+        confirmations=current_app.config["CONFIRMATION_BLOCKS"],
+        timeout=current_app.config["CONFIRMATION_TIMEOUT"],
+    )
+
+
+@bp.cli.command("confirm-transactions")
+@click.option("--follow", is_flag=True, help="Keep polling for new transactions")
+def confirm_transactions(follow):
+    """Finalize or roll back pending lands and transactions from receipts."""
+    worker = create_confirmation_worker()
+    if follow:
+        worker.run(
+            poll_interval=current_app.config["CONFIRMATION_POLL_INTERVAL"],
+            on_change=response_cache.bump,
+        )
+    else:
+        stats = worker.process_once()
+        land_ids = stats.pop("land_ids")
+        if land_ids:
+            response_cache.bump(land_ids)
+        click.echo(stats)
+
+
+@bp.cli.command("reconcile")
+@click.option("--full", is_flag=True, help="Re-check ranges with unchanged digests")
+@click.option("--repair", is_flag=True, help="Overwrite drifted lands from the chain")
+@click.option(
+    "--delete-missing",
+    is_flag=True,
+    help="With --repair, delete lands the contract has removed, with their transactions",
+)
+@click.option("--output", type=click.File("w"), default="-", help="Report file")
+def reconcile(full, repair, delete_missing, output):
+    """Compare the land table with the contract and report drift as JSON."""
+    from reconcile import Reconciler
+
+    ethereum = current_app.extensions["ethereum"]
+    reconciler = Reconciler(
+        ethereum.w3,
+        ethereum.contract,
+        range_size=current_app.config["RECONCILE_RANGE_SIZE"],
+        workers=current_app.config["RECONCILE_WORKERS"],
+    )
+    report = reconciler.run(full=full, repair=repair, delete_missing=delete_missing)
+    if repair and report["repaired"]["lands"]:
+        response_cache.invalidate_all()
+    json.dump(report, output, indent=2)
+    output.write("\n")
+    if report["diffs"] and (not repair or report["repaired"]["kept"]):
+        raise SystemExit(1)
+
+
+@bp.cli.command("import-lands")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--owner", help="Username, e-mail or address owning rows without an owner")
+@click.option(
+    "--register-on-chain",
+    is_flag=True,
+    help="Register rows without a blockchain_id from REGISTRAR_PRIVATE_KEY",
+)
+@click.option("--batch-size", type=int, default=None, help="Rows per batch")
+@click.option("--max-in-flight", type=int, default=None, help="Maximum unmined transactions")
+@click.option("--dry-run", is_flag=True, help="Only validate the file")
+def import_lands(path, owner, register_on_chain, batch_size, max_in_flight, dry_run):
+    """Import land parcels from a CSV or GeoJSON file."""
+    from landimport import ChainRegistrar, LandImporter
+
+    registrar = None
+    if register_on_chain:
+        if not current_app.config["REGISTRAR_PRIVATE_KEY"]:
+            raise click.ClickException("REGISTRAR_PRIVATE_KEY is not set")
+        ethereum = current_app.extensions["ethereum"]
+        registrar = ChainRegistrar(
+            ethereum.w3, ethereum.contract, current_app.config["REGISTRAR_PRIVATE_KEY"]
+        )
+    importer = LandImporter(
+        batch_size=batch_size or current_app.config["IMPORT_BATCH_SIZE"],
+        default_owner=owner,
+        registrar=registrar,
+        max_in_flight=max_in_flight or current_app.config["IMPORT_MAX_IN_FLIGHT"],
+        dry_run=dry_run,
+    )
+    try:
+        stats = importer.run(path)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    errors = sorted(stats.pop("errors"))
+    if stats["imported"]:
+        response_cache.invalidate_all()
+    click.echo(stats)
+    for number, message in errors[:20]:
+        click.echo(f"row {number}: {message}", err=True)
+    if len(errors) > 20:
+        click.echo(f"... and {len(errors) - 20} more errors", err=True)
+    if errors:
+        raise SystemExit(1)
+
+
+@bp.cli.command("export")
+@click.argument("table", type=click.Choice(EXPORT_TABLES))
+@click.option("--format", "fmt", type=click.Choice(list(EXPORT_FORMATS)), default="csv")
+@click.option("--output", "-o", default="-", help="File to write, standard output by default")
+@click.option("--start", help="First creation/transaction date (ISO, UTC)")
+@click.option("--end", help="Last creation/transaction date (ISO, UTC), included")
+@click.option("--owner", help="Only the lands or transactions of this user")
+@click.option("--chunk-size", type=int, default=None, help="Rows per chunk")
+def export_table(table, fmt, output, start, end, owner, chunk_size):
+    """Export all lands or transactions as CSV, Parquet or Arrow."""
+    try:
+        start, end = parse_time(start), parse_time(end, end=True)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    user_id = None
+    if owner:
+        user_id = find_user(db.session, owner)
+        if user_id is None:
+            raise click.ClickException(f"Unknown owner: {owner}")
+    try:
+        export = Export(
+            table,
+            fmt,
+            start=start,
+            end=end,
+            user_id=user_id,
+            chunk_size=chunk_size or current_app.config["EXPORT_CHUNK_SIZE"],
         )
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    started = time.perf_counter()
+    with click.open_file(output, "wb") as f:
+        for chunk in export.chunks(db.engine):
+            f.write(chunk)
+    elapsed = time.perf_counter() - started
+    click.echo(f"Exported {export.rows} {table} in {elapsed:.1f}s", err=True)
+
+
+@bp.cli.command("db-upgrade")
+def db_upgrade():
+    """Apply pending schema migrations to the database."""
+    applied = upgrade(db.engine)
+    click.echo(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+
 
-    return jsonify(result)
+def route_queries():
+    """
+    Build the statements of the hot routes with the functions they run.
 
+    Must be called in an application context: some builders look up the
+    available indexes or count index entries to pick a plan.
 
-# Initialize database
-with app.app_context():
+    Returns:
+        dict: Mapping of route name to SQLAlchemy statement
+    """
+    indexes = land_indexes()
+    return {
+        "marketplace": listing_query(listing_filters(use_fts=indexes["search"])),
+        "marketplace_price": listing_query(
+            listing_filters(min_price=1.0, max_price=100.0, use_fts=indexes["search"]),
+            sort="price_asc",
+            cursor=[10.0, 1],
+        ),
+        "marketplace_location": listing_query(
+            listing_filters(location="Nairobi", use_fts=indexes["search"]), sort="price_desc"
+        ),
+        "dashboard": Land.query.filter_by(owner_id=1).statement,
+        "seacrhLands": search_query("Nairobi plot", use_fts=indexes["search"]),
+        "seacrhLands_all": search_query("", page=2),
+        "landDetails": select(Transaction).where(Transaction.land_id.in_([1])),
+        "transaction_history": user_transactions_query(1),
+        "api_get_lands": land_api_query(land_api_filters({}), 0, 100),
+        "api_get_lands_bbox": land_api_query(
+            land_api_filters({"for_sale": "true", "bbox": "36.7,-1.4,36.9,-1.2"}), 0, 100
+        ),
+        "api_get_lands_since": land_api_query([], 1000, 100, Land.version, 2000),
+        "api_nearby_lands": nearby_query(
+            LAND_API_COLUMNS, [], -1.29, 36.82, 5.0, use_rtree=indexes["geo"]
+        ).limit(101),
+    }
+
+
+@bp.cli.command("check-query-plans")
+def check_query_plans_command():
+    """Fail if a hot route query scans a whole table."""
+    if db.engine.dialect.name != "sqlite":
+        raise click.ClickException("Query plans are only checked on SQLite")
+    failed = False
+    for name, (plan, scans) in check_query_plans(db.engine, route_queries()).items():
+        click.echo(f"{name}: {'FULL SCAN' if scans else 'ok'}")
+        for step in plan:
+            click.echo(f"    {step}")
+        failed = failed or bool(scans)
+    if failed:
+        raise SystemExit(1)
+
+
+@bp.cli.command("export-qr")
+@click.argument("output", type=click.File("wb"))
+@click.option("--base-url", default="http://127.0.0.1:5000", help="Site URL encoded in the codes")
+@click.option("--format", "fmt", type=click.Choice(sorted(QR_FORMATS)), default="png")
+def export_qr(output, base_url, fmt):
+    """Write the QR codes of all lands to a ZIP archive."""
+    with current_app.test_request_context(base_url=base_url):
+        # Streamed from a server-side cursor on PostgreSQL
+        land_ids = db.session.scalars(
+            select(Land.id).order_by(Land.id).execution_options(yield_per=1000)
+        )
+        named_urls = (
+            (f"land-{land_id}", url_for("main.landDetails", land_id=land_id, _external=True))
+            for land_id in land_ids
+        )
+        for chunk in qr_cache.stream_zip(named_urls, fmt):
+            output.write(chunk)
+
+
+@bp.cli.command("process-images")
+def process_images():
+    """Generate missing variants for all uploaded images."""
+    for folder in ("lands", "profiles"):
+        count = image_pipeline.backfill(folder)
+        click.echo(f"{folder}: processed {count} images")
+
+
+def init_database():
+    """Create missing tables, apply migrations, build the land indexes and triggers."""
     db.create_all()
+    applied = upgrade(db.engine)
+    setup_land_search(db.engine)
+    setup_land_geo(db.engine)
+    setup_listing_counts(db.engine)
+    setup_land_events(db.engine)
+    setup_land_versions(db.engine)
+    current_app.extensions["land_indexes"] = detect_land_indexes(db.engine)
+    return applied
+
+
+@bp.cli.command("init-db")
+def init_db():
+    """Create the database schema, the land indexes and the live update triggers."""
+    applied = init_database()
+    click.echo(f"Database initialized, applied migrations: {applied or 'none'}")
+
 
 if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        init_database()
+    # Avoid a second indexer in the parent process of the debug reloader
+    if app.config["INDEXER_ENABLED"] and os.environ.get("WERKZEUG_RUN_MAIN"):
+        from indexer import start_indexer_thread
+
+        with app.app_context():
+            indexer = create_indexer()
+            invalidate = response_cache.invalidate_all
+            hub = event_hub._get_current_object()
+
+        def indexed(stats):
+            invalidate()
+            hub.notify()
+
+        start_indexer_thread(
+            app, indexer, app.config["INDEXER_POLL_INTERVAL"], on_change=indexed
+        )
+    if app.config["CONFIRMATION_WORKER_ENABLED"] and os.environ.get("WERKZEUG_RUN_MAIN"):
+        from confirmations import start_confirmation_thread
+
+        with app.app_context():
+            worker = create_confirmation_worker()
+            bump = response_cache.bump
+            hub = event_hub._get_current_object()
+
+        def confirmed(land_ids):
+            bump(land_ids)
+            hub.notify()
+
+        start_confirmation_thread(
+            app, worker, app.config["CONFIRMATION_POLL_INTERVAL"], on_change=confirmed
+        )
     app.run(debug=True)
@@ -0,0 +1,74 @@
+import argparse
+import json
+import sys
+
+"""
+Benchmark Comparison
+--------------------
+Compares two results of benchmarks/routes.py route by route, for each driver
+(client, http) present in both.
+
+Prints the p50/p95/p99 latency and throughput of both runs with the relative
+change. With --max-regression, exits with status 1 when the p95 latency of a
+route grew by more than the given percentage, or a route had errors.
+
+Usage:
+    python benchmarks/compare.py baseline.json candidate.json [--max-regression 10]
+"""
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two route benchmark results")
+    parser.add_argument("baseline", type=argparse.FileType())
+    parser.add_argument("candidate", type=argparse.FileType())
+    parser.add_argument(
+        "--max-regression", type=float, help="Allowed p95 latency increase in percent"
+    )
+    args = parser.parse_args()
+    baseline = json.load(args.baseline)
+    candidate = json.load(args.candidate)
+
+    print(f"baseline:  {baseline.get('commit')} ({baseline['threads']} threads)")
+    print(f"candidate: {candidate.get('commit')} ({candidate['threads']} threads)")
+    if baseline["database"] != candidate["database"]:
+        print(f"warning: different datasets {baseline['database']} / {candidate['database']}")
+
+    failures = []
+    for mode, routes in candidate["runs"].items():
+        if mode not in baseline["runs"]:
+            continue
+        print(f"\n{mode:<22}" + "".join(f"{metric:>28}" for metric in METRICS))
+        for route, after in routes.items():
+            before = baseline["runs"][mode].get(route)
+            if before is None:
+                continue
+            cells = []
+            for metric in METRICS:
+                delta = change(before[metric], after[metric])
+                delta = "" if delta is None else f" ({delta:+.1f}%)"
+                cells.append(f"{before[metric]} -> {after[metric]}{delta}")
+            print(f"  {route:<20}" + "".join(f"{cell:>28}" for cell in cells))
+
+            if args.max_regression is not None:
+                delta = change(before["p95_ms"], after["p95_ms"])
+                if delta is not None and delta > args.max_regression:
+                    failures.append(f"{mode} {route}: p95 latency {delta:+.1f}%")
+                if after["errors"]:
+                    failures.append(f"{mode} {route}: {after['errors']} errors")
+
+    print(f"\npeak RSS: {baseline['peak_rss_mb']} MB -> {candidate['peak_rss_mb']} MB")
+    if failures:
+        print("\nRegressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "contracts"))
+
+from compile import ABI_PATH, SOLC_VERSION, SOURCE, compile_contract
+from registryclient import RegistryClient
+
+"""
+Contract Benchmark
+------------------
+Measures the landRegistry contract on a local test chain (eth-tester with
+the py-evm backend), without a node:
+
+- gas: gas used by buyLand when the seller owns 1, 10, 100, ... lands. The
+  land bought is the seller's last one, the worst case of a linear search
+  of the owner's lands.
+- reads: eth_call round trips and time taken by RegistryClient to read every
+  land, every owner's lands and every transaction.
+
+Pass --baseline with another version of landRegistry.sol to measure it the
+same way. The client reads it through the current ABI, as the application
+would, so it falls back to one call per land on contracts without the batch
+view functions.
+
+Usage:
+    pip install py-solc-x "web3[tester]"
+    git show <commit>:contracts/landRegistry.sol > /tmp/landRegistry_old.sol
+    python benchmarks/contract.py [--baseline /tmp/landRegistry_old.sol] \\
+        [--portfolios 1 10 100 500] [--transactions 100] [--output result.json]
+"""
+
+
+def test_chain():
+    """Return a Web3 instance on a fresh in-process chain counting its requests."""
+    from eth_tester.exceptions import TransactionFailed
+    from web3 import Web3
+    from web3.providers.eth_tester import EthereumTesterProvider
+
+    class CountingProvider(EthereumTesterProvider):
+        def __init__(self):
+            super().__init__()
+            self.counts = {}
+
+        def make_request(self, method, params):
+            self.counts[method] = self.counts.get(method, 0) + 1
+            try:
+                return super().make_request(method, params)
+            except TransactionFailed as e:
+                # Answer like a node, for which web3 raises ContractLogicError
+                return {
+                    "jsonrpc": "2.0",
+                    "id": self.counts[method],
+                    "error": {"code": 3, "message": str(e), "data": "0x"},
+                }
+
+    return Web3(CountingProvider())
+
+
+def deploy(w3, abi, bytecode):
+    """Deploy a compiled contract from the first test account."""
+    factory = w3.eth.contract(abi=abi, bytecode=bytecode)
+    tx_hash = factory.constructor().transact({"from": w3.eth.accounts[0]})
+    return w3.eth.wait_for_transaction_receipt(tx_hash)["contractAddress"]
+
+
+def transact(w3, function, sender, value=0):
+    tx_hash = function.transact({"from": sender, "value": value})
+    return w3.eth.wait_for_transaction_receipt(tx_hash)
+
+
+def register(w3, contract, owner, count, price=1):
+    """Register `count` lands for sale and return their IDs."""
+    land_ids = []
+    for _ in range(count):
+        receipt = transact(
+            w3,
+            contract.functions.registerLand("Plot", "Nairobi", "Benchmark land", price, True),
+            owner,
+        )
+        event = contract.events.LandRegistered().process_receipt(receipt)[0]
+        land_ids.append(event["args"]["landId"])
+    return land_ids
+
+
+def measure(source, portfolios, transactions, solc_version, solc_binary=None):
+    """
+    Deploy one version of the contract and run the gas and read measurements.
+
+    Returns:
+        dict: Gas per portfolio size and round trips/time per read
+    """
+    with open(ABI_PATH) as f:
+        current_abi = json.load(f)
+    w3 = test_chain()
+    abi, bytecode = compile_contract(source, solc_version, solc_binary)
+    address = deploy(w3, abi, bytecode)
+    contract = w3.eth.contract(address=address, abi=current_abi)
+    accounts = w3.eth.accounts
+    buyer = accounts[-1]
+    if len(portfolios) > len(accounts) - 2:
+        raise SystemExit(f"At most {len(accounts) - 2} portfolio sizes are supported")
+
+    gas = {}
+    for seller, size in zip(accounts[1:], portfolios):
+        land_ids = register(w3, contract, seller, size)
+        receipt = transact(w3, contract.functions.buyLand(land_ids[-1]), buyer, value=1)
+        gas[str(size)] = receipt["gasUsed"]
+
+    # Sales to read back, bought from the first seller
+    for land_id in register(w3, contract, accounts[1], transactions):
+        transact(w3, contract.functions.buyLand(land_id), buyer, value=1)
+
+    client = RegistryClient(w3, contract)
+    provider = w3.provider
+    # Land IDs are assigned sequentially from 1
+    land_count = sum(portfolios) + transactions
+
+    def timed(read):
+        provider.counts.clear()
+        start = time.perf_counter()
+        result = read()
+        return result, {
+            "eth_calls": provider.counts.get("eth_call", 0),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    batch_reads = client.batch_reads
+    lands, lands_stats = timed(lambda: client.get_lands(range(1, land_count + 1)))
+    owners = {struct[1] for struct in lands.values()}
+    _, owners_stats = timed(lambda: client.lands_by_owner(owners))
+    sales, transactions_stats = timed(lambda: client.get_transactions())
+    return {
+        "batch_reads": batch_reads,
+        "buy_land_gas": gas,
+        "reads": {
+            "lands": {"items": len(lands), **lands_stats},
+            "lands_by_owner": {"items": len(owners), **owners_stats},
+            "transactions": {"items": len(sales), **transactions_stats},
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="landRegistry gas and round trip benchmark")
+    parser.add_argument("--baseline", help="Another landRegistry.sol to measure")
+    parser.add_argument("--portfolios", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--transactions", type=int, default=100, help="Sales to read back")
+    parser.add_argument("--solc-version", default=SOLC_VERSION)
+    parser.add_argument(
+        "--solc", default=os.getenv("SOLC_BINARY"), help="Local solc executable"
+    )
+    parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    args = parser.parse_args()
+
+    sources = {"current": SOURCE}
+    if args.baseline:
+        sources["baseline"] = args.baseline
+    runs = {
+        name: measure(
+            path, args.portfolios, args.transactions, args.solc_version, args.solc
+        )
+        for name, path in sources.items()
+    }
+
+    json.dump(
+        {
+            "python": platform.python_version(),
+            "solc": args.solc or args.solc_version,
+            "runs": runs,
+        },
+        args.output,
+        indent=2,
+    )
+    args.output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
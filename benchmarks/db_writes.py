@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import configure_engine, database_uri, engine_options
+from models import db, User, Land, Transaction
+
+"""
+Database Write Concurrency Benchmark
+------------------------------------
+Measures committed writes per second when many threads register and buy
+lands at the same time, as concurrent registerLand and buyLand requests do.
+
+Each run drops and recreates the tables of the target database, so only
+point --url at a scratch database. Without --url, a temporary SQLite file is
+benchmarked twice: with SQLite's default settings and with the WAL pragmas
+the application uses.
+
+Usage:
+    python benchmarks/db_writes.py [--threads 8] [--seconds 5]
+    python benchmarks/db_writes.py --url postgresql://localhost/landregistry_bench
+"""
+
+USERS = 100
+
+
+def make_engine(url, tuned):
+    if not tuned:
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    configure_engine(engine)
+    return engine
+
+
+def setup(engine):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {
+                    "username": f"user{i}",
+                    "email": f"user{i}@example.com",
+                    "password_hash": "x",
+                    "blockchain_address": f"0x{i:040x}",
+                }
+                for i in range(1, USERS + 1)
+            ],
+        )
+
+
+def run(engine, threads, seconds):
+    """Register lands and buy them from `threads` threads for `seconds`."""
+    ids = itertools.count(1)
+    deadline = time.perf_counter() + seconds
+
+    def client(worker):
+        commits = locked = 0
+        while time.perf_counter() < deadline:
+            n = next(ids)
+            buyer = n % USERS + 1
+            try:
+                with engine.begin() as conn:
+                    if n % 2:
+                        # registerLand
+                        conn.execute(
+                            insert(Land).values(
+                                blockchain_id=n,
+                                owner_id=worker % USERS + 1,
+                                title=f"Parcel {n}",
+                                location="Nairobi",
+                                description="Benchmark parcel",
+                                price=1.0,
+                                for_sale=True,
+                            )
+                        )
+                    else:
+                        # buyLand: record the transfer and move ownership
+                        land = conn.execute(
+                            select(Land.id, Land.owner_id, Land.price)
+                            .where(Land.for_sale.is_(True), Land.owner_id != buyer)
+                            .limit(1)
+                        ).first()
+                        if land is None:
+                            continue
+                        conn.execute(
+                            insert(Transaction).values(
+                                blockchain_tx_hash=f"0x{n:064x}",
+                                land_id=land.id,
+                                seller_id=land.owner_id,
+                                buyer_id=buyer,
+                                price=land.price,
+                            )
+                        )
+                        conn.execute(
+                            update(Land)
+                            .where(Land.id == land.id)
+                            .values(owner_id=buyer, for_sale=False)
+                        )
+                commits += 1
+            except OperationalError:
+                # "database is locked" and other lock timeouts
+                locked += 1
+        return commits, locked
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(client, range(threads)))
+    elapsed = time.perf_counter() - start
+    commits = sum(c for c, _ in results)
+    return {
+        "commits_per_sec": round(commits / elapsed, 1),
+        "commits": commits,
+        "lock_errors": sum(e for _, e in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database write concurrency benchmark")
+    parser.add_argument("--url", help="Scratch database URL (default: temporary SQLite)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.url:
+        runs = [(database_uri(args.url), True)]
+    else:
+        directory = tempfile.mkdtemp()
+        runs = [
+            (f"sqlite:///{os.path.join(directory, 'default.db')}", False),
+            (f"sqlite:///{os.path.join(directory, 'tuned.db')}", True),
+        ]
+
+    for url, tuned in runs:
+        engine = make_engine(url, tuned)
+        setup(engine)
+        result = run(engine, args.threads, args.seconds)
+        engine.dispose()
+        print(
+            json.dumps(
+                {
+                    "database": engine.dialect.name,
+                    "settings": "tuned" if tuned else "default",
+                    "threads": args.threads,
+                    **result,
+                }
+            ),
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher
+
+"""
+Password Hashing Benchmark
+--------------------------
+Reports how many logins per second one CPU core can verify for each password
+hash setting, and the throughput of the PasswordHasher process pool.
+
+Usage:
+    python benchmarks/password_hashing.py [--seconds 3] [--method METHOD ...]
+"""
+
+DEFAULT_METHODS = [
+    "scrypt:32768:8:1",
+    "scrypt:16384:8:1",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:260000",
+]
+
+
+def per_core_rate(password_hash, seconds):
+    """Verifications per second on the calling thread."""
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        check_password_hash(password_hash, "correct horse")
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def pool_rate(method, password_hash, seconds, workers):
+    """Verifications per second through PasswordHasher from many threads."""
+    hasher = PasswordHasher(method, workers=workers, max_pending=workers * 4)
+    hasher.verify(password_hash, "correct horse")  # start the processes
+    deadline = time.perf_counter() + seconds
+
+    def client(_):
+        count = 0
+        while time.perf_counter() < deadline:
+            hasher.verify(password_hash, "correct horse")
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers * 2) as threads:
+        total = sum(threads.map(client, range(workers * 2)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing benchmark")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--method", action="append", dest="methods")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    results = []
+    for method in args.methods or DEFAULT_METHODS:
+        password_hash = generate_password_hash("correct horse", method)
+        results.append(
+            {
+                "method": method,
+                "logins_per_sec_per_core": round(
+                    per_core_rate(password_hash, args.seconds), 1
+                ),
+                "pool_workers": args.workers,
+                "pool_logins_per_sec": round(
+                    pool_rate(method, password_hash, args.seconds, args.workers), 1
+                ),
+            }
+        )
+        print(json.dumps(results[-1]), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes import git_commit, peak_rss_mb, percentile
+
+"""
+Purchase Contention Benchmark
+-----------------------------
+Measures buyLand under contention: many buyers racing for the same few
+"hot" listings of a database seeded by benchmarks/seed.py.
+
+Every buyer thread has its own user and test client and keeps posting
+purchases of a random hot land with a fresh transaction hash. A share of
+the accepted purchases is posted a second time with the same hash, as a
+browser retry would, and must be accepted again without a new transaction.
+A settler thread plays the confirmation worker: it confirms the pending
+purchases, moves the land to its buyer and lists it again, so the hot lands
+keep being sold for the whole run.
+
+At the end the transactions of the hot lands are checked for double sales:
+a land never has two pending purchases, and every sale is made by the buyer
+of the previous one. The result is one JSON document with attempts and
+sales per second, latency, rejections and the consistency checks. Pass
+--root to benchmark another checkout, e.g. a git worktree of an older
+commit.
+
+Usage:
+    python benchmarks/seed.py --db /tmp/bench.db --scale small
+    python benchmarks/purchases.py --db /tmp/bench.db [--threads 16] [--lands 1] \\
+        [--duration 10] [--root /tmp/baseline] [--output result.json]
+"""
+
+
+def load_app(root, db_path, workdir):
+    """Import the application of a checkout configured for the benchmark database."""
+    sys.path.insert(0, root)
+    from stubchain import StubProvider
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET", "benchmark")
+    os.environ["RPC_URLS"] = "http://stub.invalid"
+    os.environ["QR_CACHE_DIR"] = os.path.join(workdir, "qr")
+    os.environ["SLOW_REQUEST_THRESHOLD"] = "0"
+    os.environ["CONFIRMATION_WORKER_ENABLED"] = "0"
+    from app import create_app
+
+    app = create_app()
+    app.extensions["ethereum"].provider_factory = StubProvider
+    return app
+
+
+def prepare(db_path, land_count):
+    """
+    Put the hot lands up for sale.
+
+    Returns:
+        tuple: (owner of each hot land, IDs of the users that may buy, last
+            transaction ID before the run)
+    """
+    conn = sqlite3.connect(db_path)
+    owners = dict(
+        conn.execute("SELECT id, owner_id FROM land ORDER BY id LIMIT ?", (land_count,))
+    )
+    marks = ",".join("?" * len(owners))
+    conn.execute(
+        f"UPDATE land SET for_sale = 1, status = 'confirmed' WHERE id IN ({marks})", list(owners)
+    )
+    buyers = [
+        user_id
+        for user_id, in conn.execute("SELECT id FROM user ORDER BY id")
+        if user_id not in owners.values()
+    ]
+    last_transaction = conn.execute('SELECT COALESCE(MAX(id), 0) FROM "transaction"').fetchone()[0]
+    conn.commit()
+    conn.close()
+    return owners, buyers, last_transaction
+
+
+class Settler(threading.Thread):
+    """
+    Confirms the pending purchases of the hot lands and lists them again.
+
+    Args:
+        db_path: Benchmark database
+        interval: Seconds between two rounds
+    """
+
+    def __init__(self, db_path, interval):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.settled = 0
+        # Lands seen with more than one pending purchase at once
+        self.overlapping = 0
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        while not self.stopped.wait(self.interval):
+            self.settle(conn)
+        self.settle(conn)
+        conn.close()
+
+    def settle(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        jobs = conn.execute(
+            """
+            SELECT id, land_id, user_id, transaction_id FROM confirmation_job
+            WHERE kind = 'buy' AND status = 'pending' ORDER BY id
+            """
+        ).fetchall()
+        seen = set()
+        for job_id, land_id, user_id, transaction_id in jobs:
+            if land_id in seen:
+                self.overlapping += 1
+            seen.add(land_id)
+            conn.execute(
+                "UPDATE land SET owner_id = ?, for_sale = 1, status = 'confirmed' WHERE id = ?",
+                (user_id, land_id),
+            )
+            conn.execute(
+                """UPDATE "transaction" SET status = 'confirmed' WHERE id = ?""",
+                (transaction_id,),
+            )
+            conn.execute(
+                "UPDATE confirmation_job SET status = 'confirmed' WHERE id = ?", (job_id,)
+            )
+        conn.execute("COMMIT")
+        self.settled += len(jobs)
+
+
+def check_sales(db_path, owners, after):
+    """
+    Count the sales of the hot lands that break the ownership chain.
+
+    Args:
+        db_path: Benchmark database
+        owners: Owner of each hot land before the run
+        after: Last transaction ID before the run
+
+    Returns:
+        dict: Number of sales and of double sales
+    """
+    conn = sqlite3.connect(db_path)
+    owners = dict(owners)
+    sales = double_sales = 0
+    marks = ",".join("?" * len(owners))
+    for land_id, seller_id, buyer_id in conn.execute(
+        f"""
+        SELECT land_id, seller_id, buyer_id FROM "transaction"
+        WHERE land_id IN ({marks}) AND id > ? ORDER BY id
+        """,
+        (*owners, after),
+    ):
+        sales += 1
+        if seller_id != owners[land_id]:
+            double_sales += 1
+        owners[land_id] = buyer_id
+    conn.close()
+    return {"sales": sales, "double_sales": double_sales}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purchase contention benchmark")
+    parser.add_argument("--db", required=True, help="Database seeded by benchmarks/seed.py")
+    parser.add_argument("--root", default=ROOT, help="Checkout of the application to benchmark")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent buyers")
+    parser.add_argument("--lands", type=int, default=1, help="Hot listings the buyers race for")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run")
+    parser.add_argument("--settle-interval", type=float, default=0.005)
+    parser.add_argument("--replay-rate", type=float, default=0.2,
+                        help="Share of accepted purchases posted again with the same hash")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="landregistry-bench-")
+    db_path = os.path.join(workdir, "landregistry.db")
+    shutil.copy(args.db, db_path)
+    try:
+        initial_owners, buyers, last_transaction = prepare(db_path, args.lands)
+        hot = list(initial_owners)
+
+        app = load_app(os.path.abspath(args.root), db_path, workdir)
+        serializer = app.session_interface.get_signing_serializer(app)
+        settler = Settler(db_path, args.settle_interval)
+        deadline = time.perf_counter() + args.duration
+
+        def buyer(index):
+            rng = random.Random(args.seed * 1000 + index)
+            user_id = buyers[index % len(buyers)]
+            client = app.test_client()
+            client.set_cookie(
+                app.config["SESSION_COOKIE_NAME"], serializer.dumps({"user_id": user_id})
+            )
+            stats = {"latencies": [], "accepted": 0, "rejected": 0, "errors": 0,
+                     "replays": 0, "replays_rejected": 0}
+
+            def post(land_id, tx_hash):
+                start = time.perf_counter()
+                try:
+                    response = client.post(
+                        f"/buyLand/{land_id}", data={"blockchain_tx_hash": tx_hash}
+                    )
+                    response.close()
+                except Exception:
+                    response = None
+                stats["latencies"].append(time.perf_counter() - start)
+                if response is None or response.status_code != 302:
+                    stats["errors"] += 1
+                    return None
+                return response.headers["Location"].endswith("/dashboard")
+
+            while time.perf_counter() < deadline:
+                land_id = rng.choice(hot)
+                tx_hash = f"0x{rng.getrandbits(256):064x}"
+                accepted = post(land_id, tx_hash)
+                if accepted is None:
+                    continue
+                if not accepted:
+                    stats["rejected"] += 1
+                    continue
+                stats["accepted"] += 1
+                if rng.random() < args.replay_rate:
+                    stats["replays"] += 1
+                    stats["replays_rejected"] += post(land_id, tx_hash) is False
+            return stats
+
+        settler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(buyer, range(args.threads)))
+        elapsed = time.perf_counter() - start
+        settler.stopped.set()
+        settler.join()
+
+        total = lambda key: sum(stats[key] for stats in results)
+        latencies = sorted(l for stats in results for l in stats["latencies"])
+        ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+        sales = check_sales(db_path, initial_owners, last_transaction)
+        attempts = total("accepted") + total("rejected") + total("errors")
+        result = {
+            "commit": git_commit(args.root),
+            "root": os.path.abspath(args.root),
+            "python": platform.python_version(),
+            "threads": args.threads,
+            "hot_lands": len(hot),
+            "duration_s": round(elapsed, 3),
+            "attempts": attempts,
+            "accepted": total("accepted"),
+            "rejected": total("rejected"),
+            "errors": total("errors"),
+            "attempts_per_s": round(attempts / elapsed, 1),
+            "sales_per_s": round(sales["sales"] / elapsed, 1),
+            "p50_ms": ms(percentile(latencies, 50)),
+            "p95_ms": ms(percentile(latencies, 95)),
+            "p99_ms": ms(percentile(latencies, 99)),
+            "replays": total("replays"),
+            "replays_rejected": total("replays_rejected"),
+            "sales": sales["sales"],
+            "settled": settler.settled,
+            "double_sales": sales["double_sales"],
+            "overlapping_pending": settler.overlapping,
+            # Every accepted new purchase must have exactly one transaction
+            "unrecorded_or_duplicate": total("accepted") - sales["sales"],
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    json.dump(result, args.output, indent=2)
+    args.output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stubchain import StubProvider
+from seed import LAND_BBOX, LOCATIONS
+
+"""
+Route Benchmark
+---------------
+Measures the latency and throughput of the main routes against a database
+seeded by benchmarks/seed.py, without an Ethereum node (Web3 is served by
+benchmarks/stubchain.py).
+
+Two drivers are available:
+
+- client: every thread sends requests through its own Flask test client,
+  measuring the application without a network stack.
+- http: the app is served by a threaded WSGI server on localhost and every
+  thread sends real HTTP requests.
+
+Each route gets the same number of requests, spread over the threads. The
+result is one JSON document with p50/p95/p99 latency, throughput and errors
+per driver and route and the peak RSS of the process; benchmarks/compare.py
+compares two of them. The database is copied before the run because buyLand writes to it.
+
+Usage:
+    python benchmarks/seed.py --db /tmp/bench.db --scale small
+    python benchmarks/routes.py --db /tmp/bench.db [--mode client|http|both] [--threads 8] \\
+        [--requests 200] [--output result.json]
+"""
+
+ROUTES = (
+    "marketplace",
+    "seacrhLands",
+    "api_get_lands",
+    "api_nearby_lands",
+    "transaction_history",
+    "landQR",
+    "dashboard",
+    "buyLand",
+)
+SEARCH_WORDS = ("green", "farm", "nairobi", "borehole", "river", "estate", "kisumu")
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, round(q / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit(root=ROOT):
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_app(db_path, workdir):
+    """Import the application configured for the benchmark database."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET", "benchmark")
+    os.environ["RPC_URLS"] = "http://stub.invalid"
+    os.environ["QR_CACHE_DIR"] = os.path.join(workdir, "qr")
+    os.environ["SLOW_REQUEST_THRESHOLD"] = "0"
+    os.environ["CONFIRMATION_WORKER_ENABLED"] = "0"
+    from app import create_app
+
+    app = create_app()
+    app.extensions["ethereum"].provider_factory = StubProvider
+    return app
+
+
+class RequestPlan:
+    """
+    Builds the requests of each route from the seeded data.
+
+    Args:
+        db_path: Seeded SQLite database
+        seed: Random seed of the generated requests
+    """
+
+    def __init__(self, db_path, seed=0):
+        conn = sqlite3.connect(db_path)
+        self.user_count = conn.execute("SELECT MAX(id) FROM user").fetchone()[0]
+        self.land_count = conn.execute("SELECT MAX(id) FROM land").fetchone()[0]
+        self.transaction_count = conn.execute(
+            'SELECT COUNT(*) FROM "transaction"'
+        ).fetchone()[0]
+        # Lands to buy, each at most once
+        self.for_sale = deque(
+            conn.execute("SELECT id, owner_id FROM land WHERE for_sale = 1 ORDER BY id")
+        )
+        conn.close()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _user(self, exclude=None):
+        while True:
+            user_id = self.rng.randint(1, self.user_count)
+            if user_id != exclude:
+                return user_id
+
+    def next(self, route):
+        """
+        Return the next request of a route.
+
+        Returns:
+            tuple: (user ID, method, path, form data, expected status codes)
+        """
+        with self.lock:
+            if route == "marketplace":
+                sort = self.rng.choice(("newest", "price_asc", "price_desc"))
+                path = f"/marketplace?sort={sort}"
+                if self.rng.random() < 0.5:
+                    low = self.rng.randint(0, 400)
+                    path += f"&min_price={low}&max_price={low + 100}"
+                if self.rng.random() < 0.3:
+                    path += f"&location={self.rng.choice(LOCATIONS)}"
+                return self._user(), "GET", path, None, (200,)
+            if route == "seacrhLands":
+                word = self.rng.choice(SEARCH_WORDS)
+                page = self.rng.randint(1, 3)
+                path = f"/seacrhLands?query={word}&page={page}"
+                return self._user(), "GET", path, None, (200,)
+            if route == "api_get_lands":
+                after = self.rng.randint(0, self.land_count)
+                path = f"/api/lands?for_sale=true&after={after}&limit=100"
+                return self._user(), "GET", path, None, (200,)
+            if route == "api_nearby_lands":
+                lat = self.rng.uniform(LAND_BBOX[1], LAND_BBOX[3])
+                lon = self.rng.uniform(LAND_BBOX[0], LAND_BBOX[2])
+                if self.rng.random() < 0.5:
+                    path = f"/api/lands/nearby?lat={lat:.5f}&lon={lon:.5f}&k=20"
+                else:
+                    path = f"/api/lands/nearby?lat={lat:.5f}&lon={lon:.5f}&radius=10&for_sale=true"
+                return self._user(), "GET", path, None, (200,)
+            if route == "transaction_history":
+                return self._user(), "GET", "/transactions", None, (200,)
+            if route == "landQR":
+                path = f"/landQR/{self.rng.randint(1, self.land_count)}"
+                return self._user(), "GET", path, None, (200,)
+            if route == "dashboard":
+                return self._user(), "GET", "/dashboard", None, (200,)
+            if route == "buyLand":
+                land_id, owner_id = self.for_sale.popleft()
+                tx_hash = f"0x{self.rng.getrandbits(256):064x}"
+                data = {"blockchain_tx_hash": tx_hash}
+                return self._user(owner_id), "POST", f"/buyLand/{land_id}", data, (302,)
+        raise ValueError(f"Unknown route {route}")
+
+
+def client_driver(app, session_cookie):
+    """Return a per-thread function sending one request via the test client."""
+    clients = threading.local()
+
+    def send(user_id, method, path, data):
+        client = getattr(clients, "client", None)
+        if client is None:
+            client = clients.client = app.test_client()
+        client.set_cookie(app.config["SESSION_COOKIE_NAME"], session_cookie(user_id))
+        response = client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+    return send, lambda: None
+
+
+def http_driver(app, session_cookie):
+    """Serve the app on localhost and return a function sending HTTP requests."""
+    import requests
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    sessions = threading.local()
+
+    def send(user_id, method, path, data):
+        http = getattr(sessions, "http", None)
+        if http is None:
+            http = sessions.http = requests.Session()
+        response = http.request(
+            method,
+            base_url + path,
+            data=data,
+            cookies={app.config["SESSION_COOKIE_NAME"]: session_cookie(user_id)},
+            allow_redirects=False,
+        )
+        return response.status_code
+
+    return send, server.shutdown
+
+
+def run_route(send, plan, route, requests, threads, warmup):
+    """Send `requests` requests of one route from `threads` threads."""
+    for _ in range(warmup):
+        user_id, method, path, data, _ = plan.next(route)
+        send(user_id, method, path, data)
+
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+
+    def worker(_):
+        latencies, errors = [], 0
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    return latencies, errors
+            user_id, method, path, data, expected = plan.next(route)
+            start = time.perf_counter()
+            try:
+                status = send(user_id, method, path, data)
+            except Exception:
+                status = None
+            latencies.append(time.perf_counter() - start)
+            errors += status not in expected
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(l for worker_latencies, _ in results for l in worker_latencies)
+    ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route latency and throughput benchmark")
+    parser.add_argument("--db", required=True, help="Database seeded by benchmarks/seed.py")
+    parser.add_argument("--mode", choices=("client", "http", "both"), default="both")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per route")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="landregistry-bench-")
+    db_path = os.path.join(workdir, "landregistry.db")
+    shutil.copy(args.db, db_path)
+    plan = RequestPlan(db_path, args.seed)
+
+    app = load_app(db_path, workdir)
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookies = {}
+
+    def session_cookie(user_id):
+        if user_id not in cookies:
+            cookies[user_id] = serializer.dumps({"user_id": user_id})
+        return cookies[user_id]
+
+    modes = ("client", "http") if args.mode == "both" else (args.mode,)
+    rss_before = peak_rss_mb()
+    runs = {}
+    try:
+        for mode in modes:
+            driver = http_driver if mode == "http" else client_driver
+            send, stop = driver(app, session_cookie)
+            try:
+                runs[mode] = {
+                    route: run_route(
+                        send, plan, route, args.requests, args.threads, args.warmup
+                    )
+                    for route in args.routes
+                }
+            finally:
+                stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    json.dump(
+        {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "threads": args.threads,
+            "requests_per_route": args.requests,
+            "seed": args.seed,
+            "database": {
+                "users": plan.user_count,
+                "lands": plan.land_count,
+                "transactions": plan.transaction_count,
+            },
+            "startup_rss_mb": rss_before,
+            "peak_rss_mb": peak_rss_mb(),
+            "runs": runs,
+        },
+        args.output,
+        indent=2,
+    )
+    args.output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
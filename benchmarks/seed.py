@@ -0,0 +1,238 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, insert
+from werkzeug.security import generate_password_hash
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import database_uri
+from migrations import upgrade
+from models import db, User, Land, Transaction
+from geo import setup_land_geo
+from listings import setup_listing_counts
+from liveupdates import setup_land_events
+from versions import setup_land_versions
+from search import setup_land_search
+
+"""
+Synthetic Registry Generator
+----------------------------
+Seeds a database with users, lands and transactions for the benchmarks.
+
+The data is generated from a fixed random seed, so the same arguments always
+produce the same database. Rows are written with multi-row INSERTs in large
+chunks while the secondary indexes are dropped; the indexes, the full-text
+search index, the R*Tree index, the listing counter, the live update
+triggers and the version sequence are built once at the end. Lands get coordinates spread over Kenya.
+
+Every user can log in with the password "benchmark". The target database is
+recreated, so only point --db/--url at a scratch database.
+
+Usage:
+    python benchmarks/seed.py --db /tmp/bench.db --scale small
+    python benchmarks/seed.py --db /tmp/bench.db --users 100000 --lands 1000000 \\
+        --transactions 10000000
+"""
+
+SCALES = {
+    "small": {"users": 1000, "lands": 10000, "transactions": 50000},
+    "medium": {"users": 10000, "lands": 100000, "transactions": 1000000},
+    "large": {"users": 100000, "lands": 1000000, "transactions": 10000000},
+}
+PASSWORD = "benchmark"
+CHUNK_SIZE = 50000
+
+ADJECTIVES = ["Green", "Sunny", "Quiet", "Fertile", "Coastal", "Highland", "River", "Golden"]
+NOUNS = ["Acres", "Plot", "Farm", "Meadow", "Estate", "Ranch", "Parcel", "Orchard"]
+LOCATIONS = [
+    "Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika", "Malindi",
+    "Nyeri", "Machakos", "Kericho", "Naivasha", "Kitale", "Garissa", "Lamu",
+]
+WORDS = [
+    "fenced", "borehole", "road", "access", "title", "deed", "flat", "fertile",
+    "electricity", "water", "view", "soil", "quiet", "school", "market", "town",
+]
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+# min_lon, min_lat, max_lon, max_lat of the generated land coordinates
+LAND_BBOX = (33.9, -4.7, 41.9, 5.0)
+
+
+def _chunked(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def users(count, rng):
+    password_hash = generate_password_hash(PASSWORD)
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "password_hash": password_hash,
+            "blockchain_address": f"0x{i:040x}",
+            "profile_image": "default_profile.jpg",
+            "created_at": EPOCH + timedelta(minutes=i),
+        }
+
+
+def lands(count, user_count, rng):
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "blockchain_id": i,
+            "owner_id": rng.randint(1, user_count),
+            "title": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+            "location": rng.choice(LOCATIONS),
+            "latitude": round(rng.uniform(LAND_BBOX[1], LAND_BBOX[3]), 6),
+            "longitude": round(rng.uniform(LAND_BBOX[0], LAND_BBOX[2]), 6),
+            "description": " ".join(rng.choices(WORDS, k=8)),
+            "price": round(rng.uniform(0.5, 500), 2),
+            "image": "default_land.png",
+            "for_sale": rng.random() < 0.3,
+            "status": "confirmed",
+            "created_at": EPOCH + timedelta(seconds=i * 60),
+            "version": i,
+            "updated_at": EPOCH + timedelta(seconds=i * 60),
+        }
+
+
+def transactions(count, user_count, land_count, rng):
+    for i in range(1, count + 1):
+        seller_id = rng.randint(1, user_count)
+        buyer_id = rng.randint(1, user_count - 1)
+        yield {
+            "id": i,
+            "blockchain_tx_hash": f"0x{i:064x}",
+            "land_id": rng.randint(1, land_count),
+            "seller_id": seller_id,
+            "buyer_id": buyer_id + (buyer_id >= seller_id),
+            "price": round(rng.uniform(0.5, 500), 2),
+            "status": "confirmed",
+            "transaction_date": EPOCH + timedelta(seconds=i * 5),
+        }
+
+
+def seed(engine, user_count, land_count, transaction_count, seed_value=0):
+    """
+    Recreate the schema and fill it with synthetic rows.
+
+    Args:
+        engine: SQLAlchemy engine of the scratch database
+        user_count: Number of users (at least 2)
+        land_count: Number of lands
+        transaction_count: Number of transactions
+        seed_value: Random seed
+
+    Returns:
+        dict: Rows written and seconds spent per table
+    """
+    rng = random.Random(seed_value)
+    db.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS land_fts")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS land_rtree")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS land_counts")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS land_event")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS land_registry_version")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS land_tombstone")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_version")
+    db.metadata.create_all(engine)
+    upgrade(engine)
+
+    indexes = [
+        index
+        for table in (User, Land, Transaction)
+        for index in table.__table__.indexes
+    ]
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        for index in indexes:
+            index.drop(conn)
+
+    timings = {}
+    for model, rows in (
+        (User, users(user_count, rng)),
+        (Land, lands(land_count, user_count, rng)),
+        (Transaction, transactions(transaction_count, user_count, land_count, rng)),
+    ):
+        start = time.perf_counter()
+        written = 0
+        for chunk in _chunked(rows):
+            with engine.begin() as conn:
+                conn.execute(insert(model), chunk)
+            written += len(chunk)
+        timings[model.__tablename__] = {
+            "rows": written,
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for index in indexes:
+            index.create(conn)
+    setup_land_search(engine)
+    setup_land_geo(engine)
+    setup_listing_counts(engine)
+    setup_land_events(engine)
+    setup_land_versions(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    timings["indexes"] = {"seconds": round(time.perf_counter() - start, 2)}
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a benchmark database")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--db", help="SQLite file to create")
+    target.add_argument("--url", help="Scratch database URL")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--lands", type=int)
+    parser.add_argument("--transactions", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    volumes = dict(SCALES[args.scale])
+    for name in volumes:
+        if getattr(args, name) is not None:
+            volumes[name] = getattr(args, name)
+    if volumes["users"] < 2:
+        parser.error("at least 2 users are needed")
+
+    url = database_uri(args.url) if args.url else f"sqlite:///{os.path.abspath(args.db)}"
+    engine = create_engine(url)
+    start = time.perf_counter()
+    timings = seed(
+        engine, volumes["users"], volumes["lands"], volumes["transactions"], args.seed
+    )
+    engine.dispose()
+    print(
+        json.dumps(
+            {
+                "database": engine.dialect.name,
+                "seed": args.seed,
+                **volumes,
+                "tables": timings,
+                "seconds": round(time.perf_counter() - start, 2),
+            }
+        ),
+        flush=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
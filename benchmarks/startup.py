@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+"""
+Startup Benchmark
+-----------------
+Measures how long a new worker process takes to become ready: importing the
+application module, creating the app and serving its first requests. Every
+run starts a fresh interpreter, so nothing is shared between runs.
+
+The application can be measured from another checkout (--root), which lets
+two commits be compared on the same database:
+
+Usage:
+    python benchmarks/seed.py --db /tmp/bench.db --scale small
+    git worktree add /tmp/baseline <commit>
+    python benchmarks/startup.py --db /tmp/bench.db --root /tmp/baseline --output before.json
+    python benchmarks/startup.py --db /tmp/bench.db --output after.json
+"""
+
+PHASES = ("interpreter_s", "import_s", "create_app_s", "first_page_s", "first_db_page_s")
+
+# Runs in the child process, with the checkout as working directory
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, ".")
+import app as module
+imported = time.perf_counter()
+application = module.create_app() if hasattr(module, "create_app") else module.app
+created = time.perf_counter()
+client = application.test_client()
+assert client.get("/login").status_code == 200
+first_page = time.perf_counter()
+with client.session_transaction() as session:
+    session["user_id"] = 1
+assert client.get("/marketplace").status_code == 200
+first_db_page = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "create_app_s": created - imported,
+    "first_page_s": first_page - created,
+    "first_db_page_s": first_db_page - first_page,
+    "web3_imported": "web3" in sys.modules,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    / (1024 * 1024 if sys.platform == "darwin" else 1024),
+}))
+"""
+
+
+def run_child(code, cwd, env):
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if result.returncode:
+        raise RuntimeError(f"Benchmark process failed:\n{result.stderr}")
+    return result.stdout
+
+
+def measure(root, db_path, workdir):
+    """
+    Start the application once in a new interpreter.
+
+    Returns:
+        dict: Seconds per phase, peak RSS and whether web3 was imported
+    """
+    env = dict(
+        os.environ,
+        SECRET="benchmark",
+        DATABASE_URL=f"sqlite:///{db_path}",
+        # Unroutable address: startup must not wait for the node
+        RPC_URLS="http://10.255.255.1:8545",
+        QR_CACHE_DIR=os.path.join(workdir, "qr"),
+        SLOW_REQUEST_THRESHOLD="0",
+        CONFIRMATION_WORKER_ENABLED="0",
+        INDEXER_ENABLED="0",
+    )
+    start = time.perf_counter()
+    run_child("pass", root, env)
+    interpreter = time.perf_counter() - start
+    result = json.loads(run_child(CHILD, root, env).strip().splitlines()[-1])
+    result["interpreter_s"] = interpreter
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Application startup benchmark")
+    parser.add_argument("--db", required=True, help="Database seeded by benchmarks/seed.py")
+    parser.add_argument("--root", default=ROOT, help="Checkout of the application")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.root)
+    workdir = tempfile.mkdtemp(prefix="landregistry-startup-")
+    runs = []
+    try:
+        for _ in range(args.runs):
+            # A fresh copy per run, older checkouts change the schema on import
+            db_path = os.path.join(workdir, "landregistry.db")
+            shutil.copy(args.db, db_path)
+            runs.append(measure(root, db_path, workdir))
+            os.remove(db_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commit = subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True
+    ).stdout.strip()
+    summary = {
+        phase: {
+            "median_ms": round(statistics.median(run[phase] for run in runs) * 1000, 1),
+            "min_ms": round(min(run[phase] for run in runs) * 1000, 1),
+        }
+        for phase in PHASES
+    }
+    ready = [sum(run[phase] for phase in PHASES[1:]) for run in runs]
+    json.dump(
+        {
+            "commit": commit or None,
+            "python": platform.python_version(),
+            "runs": args.runs,
+            "phases": summary,
+            "ready_median_ms": round(statistics.median(ready) * 1000, 1),
+            "rss_mb": round(statistics.median(run["rss_mb"] for run in runs), 1),
+            "web3_imported": any(run["web3_imported"] for run in runs),
+        },
+        args.output,
+        indent=2,
+    )
+    args.output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
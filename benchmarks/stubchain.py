@@ -0,0 +1,50 @@
+from web3.providers.base import JSONBaseProvider
+import itertools
+
+"""
+Offline Web3 Provider
+---------------------
+Answers the JSON-RPC requests the application makes with canned results, so
+the benchmarks run without an Ethereum node. Transactions are never mined:
+receipts are reported as not found, like for a transaction still pending.
+"""
+
+RESULTS = {
+    "eth_chainId": "0x539",
+    "net_version": "1337",
+    "eth_blockNumber": "0x1",
+    "eth_gasPrice": "0x3b9aca00",
+    "eth_getTransactionCount": "0x0",
+    "eth_estimateGas": "0x30d40",
+    "eth_getTransactionReceipt": None,
+    "eth_getLogs": [],
+    "eth_call": "0x",
+}
+
+
+class StubProvider(JSONBaseProvider):
+    """Provider answering from RESULTS; unknown methods return an RPC error."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+        self._ids = itertools.count(1)
+
+    def _response(self, method):
+        self.requests += 1
+        if method not in RESULTS:
+            return {
+                "jsonrpc": "2.0",
+                "id": next(self._ids),
+                "error": {"code": -32601, "message": f"{method} is not stubbed"},
+            }
+        return {"jsonrpc": "2.0", "id": next(self._ids), "result": RESULTS[method]}
+
+    def make_request(self, method, params):
+        return self._response(method)
+
+    def make_batch_request(self, requests):
+        return [self._response(method) for method, _ in requests]
+
+    def is_connected(self, show_traceback=False):
+        return True
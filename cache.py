@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import threading
+import time
+
+"""
+In-Process Caches
+-----------------
+Cache primitives shared by the application (receipt verification, QR codes,
+...).
+"""
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with optional per-entry expiry.
+
+    Args:
+        maxsize: Maximum number of entries kept before evicting the least
+            recently used one
+        clock: Time source, overridable for tests
+    """
+
+    def __init__(self, maxsize=10000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store `value`, expiring after `ttl` seconds (never if None)."""
+        expires_at = None if ttl is None else self.clock() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,95 @@
+from web3 import Web3
+from web3.contract.contract import ContractFunction
+
+"""
+Blockchain Helpers
+------------------
+Small utilities shared by the modules that read from the landRegistry
+contract through Web3.
+"""
+
+
+def to_ether(wei):
+    """
+    Convert an on-chain wei amount to the ether float stored in the database.
+
+    Args:
+        wei: Amount in wei
+
+    Returns:
+        float: Amount in ether
+    """
+    return float(Web3.from_wei(wei, "ether"))
+
+
+def call_many(w3, requests, batch_size=100):
+    """
+    Execute many read-only requests, grouping them into JSON-RPC batches
+    when the provider supports it.
+
+    Each request is a zero-argument callable returning either a Web3 method
+    call (``lambda: w3.eth.get_block(n)``) or a contract function
+    (``lambda: contract.functions.lands(n)``). Providers without batch
+    support (e.g. the in-process tester) fall back to one call per request.
+
+    Args:
+        w3: Web3 instance to send the requests through
+        requests: List of request callables
+        batch_size: Maximum number of requests per JSON-RPC batch
+
+    Returns:
+        list: Results in the same order as the requests
+    """
+    results = []
+    for start in range(0, len(requests), batch_size):
+        chunk = requests[start : start + batch_size]
+        try:
+            with w3.batch_requests() as batch:
+                for build in chunk:
+                    batch.add(build())
+                results.extend(batch.execute())
+        except (TypeError, NotImplementedError):
+            # Web3TypeError subclasses TypeError: provider cannot batch
+            for build in chunk:
+                request = build()
+                if isinstance(request, ContractFunction):
+                    request = request.call()
+                results.append(request)
+    return results
+
+
+def rpc_batch(w3, requests, batch_size=100):
+    """
+    Send raw JSON-RPC requests in batches and return the unformatted responses.
+
+    Unlike `call_many`, an error or a null result in one request does not fail
+    the whole batch, which makes it suitable for lookups such as
+    eth_getTransactionReceipt where some hashes may be unknown.
+
+    Args:
+        w3: Web3 instance whose provider receives the requests
+        requests: List of (method, params) tuples
+        batch_size: Maximum number of requests per JSON-RPC batch, or None to
+            send everything in a single round trip
+
+    Returns:
+        list: One response dict (with "result" or "error") per request, in order
+    """
+    provider = w3.provider
+    batch_size = batch_size or max(len(requests), 1)
+    responses = []
+    for start in range(0, len(requests), batch_size):
+        chunk = requests[start : start + batch_size]
+        if hasattr(provider, "make_batch_request"):
+            batch = provider.make_batch_request(chunk)
+            if isinstance(batch, dict):
+                # The node rejected the batch as a whole
+                batch = [batch] * len(chunk)
+            else:
+                batch = sorted(batch, key=lambda response: response.get("id", 0))
+            responses.extend(batch)
+        else:
+            responses.extend(
+                provider.make_request(method, params) for method, params in chunk
+            )
+    return responses
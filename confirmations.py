@@ -0,0 +1,428 @@
+from sqlalchemy import select, update
+from hexbytes import HexBytes
+from web3 import Web3
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+import threading
+
+from chain import rpc_batch, to_ether
+from indexer import EVENT_NAMES
+from models import db, User, Land, Transaction, ConfirmationJob
+from registryclient import RegistryClient
+
+"""
+Transaction Confirmation Worker
+-------------------------------
+Resolves the blockchain transactions submitted through the web routes.
+
+registerLand, buyLand and editLand no longer trust the transaction hash (or
+land ID) posted by the browser. They store a ConfirmationJob and leave the
+affected rows in a "pending" state:
+
+- register: a Land row with a negative placeholder blockchain ID, unlisted
+  until the LandRegistered event of the receipt reveals the real ID. The
+  land stored on chain under that ID must have the title, location,
+  description and price of the row.
+- buy: a pending Transaction, with the land taken off sale; ownership moves
+  once the receipt contains the matching LandTransferred event.
+- edit: the new values are kept in the job and applied on confirmation. The
+  receipt must have a LandPriceChanged or LandStatusChanged event of the
+  land, and these events must carry the new price and sale status.
+
+The worker polls the receipts of all pending jobs with batched JSON-RPC
+calls, decodes the contract's event logs and finalizes the rows, or rolls
+them back when the transaction reverted, does not match the request or was
+not mined within `timeout` seconds. Every job is committed on its own: a job
+whose check raises (an RPC failure, a malformed log) is retried on the next
+passes without holding back the others, and failed after `timeout` seconds.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _to_int(value):
+    return value if isinstance(value, int) else int(value, 16)
+
+
+def _utc(value):
+    # SQLite returns naive datetimes for the UTC timestamps it stores
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class ConfirmationError(Exception):
+    """Raised when a mined transaction does not confirm its job."""
+
+
+class ConfirmationWorker:
+    """
+    Finalizes or rolls back pending rows from transaction receipts.
+
+    Args:
+        w3: Web3 instance used to query the chain
+        contract: landRegistry contract object
+        batch_size: Maximum number of receipts per JSON-RPC batch
+        max_jobs: Maximum number of jobs checked per pass
+        confirmations: Blocks a receipt must be buried under (1 = mined)
+        timeout: Seconds after which a transaction without receipt fails
+    """
+
+    def __init__(
+        self, w3, contract, batch_size=100, max_jobs=1000, confirmations=1, timeout=1800
+    ):
+        self.w3 = w3
+        self.contract = contract
+        self.batch_size = batch_size
+        self.max_jobs = max_jobs
+        self.confirmations = confirmations
+        self.timeout = timeout
+        self.client = RegistryClient(w3, contract, rpc_batch_size=batch_size)
+        self._events = {}
+        for event_name in EVENT_NAMES:
+            event = getattr(contract.events, event_name)
+            self._events[event.topic] = event()
+
+    # Chain access
+    def _receipts(self, tx_hashes):
+        """Return the chain head and the raw receipt (or None) per hash."""
+        responses = rpc_batch(
+            self.w3,
+            [("eth_blockNumber", [])]
+            + [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes],
+            batch_size=self.batch_size,
+        )
+        if "error" in responses[0]:
+            raise ValueError(f"RPC error while fetching the chain head: {responses[0]['error']}")
+        receipts = {}
+        for tx_hash, response in zip(tx_hashes, responses[1:]):
+            if "error" in response:
+                logger.warning("Receipt of %s unavailable: %s", tx_hash, response["error"])
+                continue
+            receipts[tx_hash] = response["result"]
+        return _to_int(responses[0]["result"]), receipts
+
+    def _decode_events(self, receipt):
+        """Return the landRegistry events of a raw receipt as (name, args)."""
+        events = []
+        for log in receipt.get("logs", []):
+            topics = [HexBytes(topic) for topic in log["topics"]]
+            if (
+                log["address"].lower() != self.contract.address.lower()
+                or not topics
+                or Web3.to_hex(topics[0]) not in self._events
+            ):
+                continue
+            decoded = self._events[Web3.to_hex(topics[0])].process_log(
+                {
+                    "address": Web3.to_checksum_address(log["address"]),
+                    "topics": topics,
+                    "data": HexBytes(log["data"]),
+                    "blockNumber": _to_int(log["blockNumber"]),
+                    "blockHash": HexBytes(log["blockHash"]),
+                    "transactionHash": HexBytes(log["transactionHash"]),
+                    "transactionIndex": _to_int(log["transactionIndex"]),
+                    "logIndex": _to_int(log["logIndex"]),
+                }
+            )
+            events.append((decoded["event"], dict(decoded["args"])))
+        return events
+
+    # Finalizing: each check raises ConfirmationError or returns the function
+    # applying the confirmed job, so nothing is written for a rejected job
+    def _check_register(self, job, receipt, address):
+        registered = [
+            args
+            for name, args in self._decode_events(receipt)
+            if name == "LandRegistered" and args["owner"].lower() == address
+        ]
+        if not registered:
+            raise ConfirmationError("No LandRegistered event for the submitting account")
+        blockchain_id = registered[0]["landId"]
+        land = db.session.get(Land, job.land_id) if job.land_id else None
+        for_sale = json.loads(job.payload)["for_sale"]
+        if land is not None:
+            # The event only names the land: compare what was stored on chain
+            _, owner, title, location, description, price, on_sale, _ = self.client.get_lands(
+                [blockchain_id]
+            )[blockchain_id]
+            stored = (title, location, description, to_ether(price), on_sale)
+            expected = (land.title, land.location, land.description, land.price, for_sale)
+            if owner.lower() != address or stored != expected:
+                raise ConfirmationError(
+                    f"Land {blockchain_id} registered on chain does not match the submitted land"
+                )
+
+        def apply(land_ids):
+            job.blockchain_id = blockchain_id
+            if land is None:
+                return
+            existing = db.session.scalar(
+                select(Land).where(Land.blockchain_id == blockchain_id, Land.id != land.id)
+            )
+            land_ids.add(land.id)
+            if existing is not None:
+                # The event indexer stored the land first: keep its row
+                existing.image = land.image
+                existing.for_sale = for_sale
+                db.session.delete(land)
+                job.land_id = existing.id
+                land_ids.add(existing.id)
+                return
+            land.blockchain_id = blockchain_id
+            land.for_sale = for_sale
+            land.status = "confirmed"
+
+        return apply
+
+    def _check_buy(self, job, receipt, address):
+        land = db.session.get(Land, job.land_id) if job.land_id else None
+        transaction = (
+            db.session.get(Transaction, job.transaction_id) if job.transaction_id else None
+        )
+        if land is None or transaction is None:
+            raise ConfirmationError("The land or transaction no longer exists")
+        transfers = [
+            args
+            for name, args in self._decode_events(receipt)
+            if name == "LandTransferred"
+            and args["landId"] == land.blockchain_id
+            and args["to"].lower() == address
+        ]
+        if not transfers:
+            raise ConfirmationError("No LandTransferred event of this land to the buyer")
+
+        def apply(land_ids):
+            land.owner_id = job.user_id
+            land.for_sale = False
+            land.status = "confirmed"
+            transaction.price = to_ether(transfers[0]["price"])
+            transaction.status = "confirmed"
+            land_ids.add(land.id)
+
+        return apply
+
+    def _check_edit(self, job, receipt, address):
+        # Title, location, description and image are only stored off chain;
+        # price and sale status must match the events of the transaction, and
+        # an edit of the off-chain columns alone still needs one of them as
+        # proof that the owner signed a transaction for this land
+        land = db.session.get(Land, job.land_id) if job.land_id else None
+        if land is None:
+            raise ConfirmationError("The land no longer exists")
+        if (receipt.get("to") or "").lower() != self.contract.address.lower():
+            raise ConfirmationError("Transaction was not sent to the land registry")
+        if (receipt.get("from") or "").lower() != address:
+            raise ConfirmationError("Transaction was not sent by the land owner")
+        changes = json.loads(job.payload)
+        emitted = {}
+        for name, args in self._decode_events(receipt):
+            if args.get("landId") != land.blockchain_id:
+                continue
+            if name == "LandPriceChanged":
+                emitted["price"] = to_ether(args["newPrice"])
+            elif name == "LandStatusChanged":
+                emitted["for_sale"] = args["forSale"]
+        if not emitted:
+            raise ConfirmationError("The transaction does not change this land")
+        for column, current in (("price", land.price), ("for_sale", land.for_sale)):
+            if column not in changes:
+                continue
+            # An unchanged value needs no event, but one that is emitted must match
+            if changes[column] == current and column not in emitted:
+                continue
+            if emitted.get(column) != changes[column]:
+                raise ConfirmationError(
+                    f"The transaction does not set the {column} of the land to "
+                    f"{changes[column]!r}"
+                )
+
+        def apply(land_ids):
+            for column, value in changes.items():
+                setattr(land, column, value)
+            land.status = "confirmed"
+            land_ids.add(land.id)
+
+        return apply
+
+    def _roll_back(self, job, land_ids):
+        land = db.session.get(Land, job.land_id) if job.land_id else None
+        if job.kind == "buy" and job.transaction_id:
+            transaction = db.session.get(Transaction, job.transaction_id)
+            if transaction is not None:
+                db.session.delete(transaction)
+            job.transaction_id = None
+        if land is None:
+            return
+        land_ids.add(land.id)
+        if job.kind == "register":
+            db.session.delete(land)
+            job.land_id = None
+            return
+        if job.kind == "buy":
+            # Reserved lands are taken off sale: list it again
+            land.for_sale = True
+        land.status = "confirmed"
+
+    def _claim(self, job, status, error=None):
+        """Move a job out of "pending"; False if another worker got there first."""
+        result = db.session.execute(
+            update(ConfirmationJob)
+            .where(ConfirmationJob.id == job.id, ConfirmationJob.status == "pending")
+            .values(status=status, error=error, updated_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def _process_job(self, job, head, receipts, addresses, expired, land_ids):
+        """
+        Resolve one job from its receipt.
+
+        Returns:
+            str: "confirmed", "failed" or "waiting"
+        """
+        if job.tx_hash not in receipts:
+            # The node returned an error for this receipt
+            return "waiting"
+        receipt = receipts[job.tx_hash]
+        if receipt is None:
+            if _utc(job.created_at) >= expired:
+                return "waiting"
+            if self._claim(job, "failed", "Transaction not found on chain"):
+                self._roll_back(job, land_ids)
+                return "failed"
+            return "waiting"
+        if head - _to_int(receipt["blockNumber"]) + 1 < self.confirmations:
+            return "waiting"
+
+        checks = {
+            "register": self._check_register,
+            "buy": self._check_buy,
+            "edit": self._check_edit,
+        }
+        try:
+            if _to_int(receipt["status"]) != 1:
+                raise ConfirmationError("Transaction reverted")
+            apply = checks[job.kind](job, receipt, addresses[job.user_id].lower())
+        except ConfirmationError as e:
+            if self._claim(job, "failed", str(e)):
+                self._roll_back(job, land_ids)
+                return "failed"
+            return "waiting"
+        if self._claim(job, "confirmed"):
+            apply(land_ids)
+            return "confirmed"
+        return "waiting"
+
+    def _fail_expired(self, job, expired, error, land_ids):
+        """
+        Handle a job whose check raised an unexpected error.
+
+        The job is retried on the next passes, e.g. after an RPC failure, and
+        failed once it is older than the timeout.
+
+        Returns:
+            str: "failed" or "waiting"
+        """
+        if _utc(job.created_at) >= expired:
+            return "waiting"
+        try:
+            if self._claim(job, "failed", f"Confirmation check failed: {error!r}"[:500]):
+                self._roll_back(job, land_ids)
+                db.session.commit()
+                return "failed"
+        except Exception:
+            db.session.rollback()
+            logger.exception("Failing confirmation job %s failed", job.id)
+        return "waiting"
+
+    def process_once(self):
+        """
+        Check the receipts of the oldest pending jobs once.
+
+        Returns:
+            dict: Counters (checked, confirmed, failed, waiting) and
+                `land_ids`, the primary keys of the lands that changed
+        """
+        stats = dict.fromkeys(("checked", "confirmed", "failed", "waiting"), 0)
+        land_ids = set()
+        stats["land_ids"] = land_ids
+
+        jobs = db.session.scalars(
+            select(ConfirmationJob)
+            .where(ConfirmationJob.status == "pending")
+            .order_by(ConfirmationJob.id)
+            .limit(self.max_jobs)
+        ).all()
+        if not jobs:
+            return stats
+
+        head, receipts = self._receipts([job.tx_hash for job in jobs])
+        addresses = dict(
+            db.session.execute(
+                select(User.id, User.blockchain_address).where(
+                    User.id.in_({job.user_id for job in jobs})
+                )
+            ).all()
+        )
+        expired = datetime.now(timezone.utc) - timedelta(seconds=self.timeout)
+
+        # Each job is committed on its own
+        for job in jobs:
+            stats["checked"] += 1
+            job_id = job.id
+            try:
+                outcome = self._process_job(job, head, receipts, addresses, expired, land_ids)
+                db.session.commit()
+            except Exception as e:
+                # One bad job must not hold back the jobs behind it
+                db.session.rollback()
+                logger.exception("Checking confirmation job %s failed", job_id)
+                outcome = self._fail_expired(job, expired, e, land_ids)
+            stats[outcome] += 1
+        return stats
+
+    def run(self, poll_interval=2.0, stop_event=None, on_change=None):
+        """
+        Keep resolving pending jobs until `stop_event` is set.
+
+        Args:
+            poll_interval: Seconds to wait between two passes
+            stop_event: threading.Event used to stop the loop
+            on_change: Called with the primary keys of the changed lands
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                stats = self.process_once()
+                if stats["confirmed"] or stats["failed"]:
+                    logger.info("Resolved pending transactions: %s", stats)
+                if on_change and stats["land_ids"]:
+                    on_change(stats["land_ids"])
+            except Exception:
+                logger.exception("Confirmation worker pass failed")
+            stop_event.wait(poll_interval)
+
+
+def start_confirmation_thread(app, worker, poll_interval=2.0, on_change=None):
+    """
+    Run a ConfirmationWorker in a daemon thread inside the application context.
+
+    Args:
+        app: Flask application providing the database configuration
+        worker: ConfirmationWorker to run
+        poll_interval: Seconds to wait between two passes
+        on_change: Called with the primary keys of the changed lands
+
+    Returns:
+        threading.Event: Set it to stop the worker
+    """
+    stop_event = threading.Event()
+
+    def target():
+        with app.app_context():
+            worker.run(
+                poll_interval=poll_interval, stop_event=stop_event, on_change=on_change
+            )
+
+    threading.Thread(target=target, name="confirmation-worker", daemon=True).start()
+    return stop_event
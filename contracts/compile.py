@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import sys
+
+"""
+Contract Build
+--------------
+Compiles contracts/landRegistry.sol with solc (through py-solc-x) and
+regenerates contracts/landRegistry_abi.json, which the application loads
+(CONTRACT_ABI_PATH). The compiler is downloaded on first use, unless a
+local solc binary is given with --solc (or SOLC_BINARY), e.g. on machines
+without access to binaries.soliditylang.org.
+
+With --check, the committed ABI is compared with the compiler's instead of
+being overwritten, and the command fails if they differ in any function,
+event, parameter or return value, e.g. in CI after editing either file.
+
+Usage:
+    pip install py-solc-x
+    python contracts/compile.py [--solc-version 0.8.24 | --solc /usr/bin/solc] [--check]
+"""
+
+CONTRACTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(CONTRACTS_DIR, "landRegistry.sol")
+ABI_PATH = os.path.join(CONTRACTS_DIR, "landRegistry_abi.json")
+SOLC_VERSION = "0.8.24"
+
+
+def compile_contract(path=SOURCE, solc_version=SOLC_VERSION, solc_binary=None):
+    """
+    Compile the landRegistry contract.
+
+    Args:
+        path: Solidity source file
+        solc_version: solc release to compile with, installed if missing
+        solc_binary: Path of a solc executable to use instead of an
+            installed release
+
+    Returns:
+        tuple: (ABI list, deployment bytecode hex)
+    """
+    import solcx
+    from solcx.exceptions import SolcInstallationError
+    from requests.exceptions import RequestException
+
+    if solc_binary:
+        solc_version = None
+    elif solc_version not in {str(v) for v in solcx.get_installed_solc_versions()}:
+        try:
+            solcx.install_solc(solc_version)
+        except (RequestException, SolcInstallationError) as e:
+            raise SystemExit(
+                f"Cannot install solc {solc_version} ({e.__class__.__name__}); "
+                "pass a local compiler with --solc or SOLC_BINARY"
+            ) from e
+    compiled = solcx.compile_files(
+        [path],
+        output_values=["abi", "bin"],
+        solc_binary=solc_binary,
+        solc_version=solc_version,
+        optimize=True,
+        optimize_runs=200,
+    )
+    contract = next(
+        value for key, value in compiled.items() if key.endswith(":landRegistry")
+    )
+    return contract["abi"], contract["bin"]
+
+
+def interface(abi):
+    """
+    Reduce an ABI to what callers depend on, in a stable order.
+
+    Args:
+        abi: ABI list
+
+    Returns:
+        list: Entries without `internalType`, sorted by type, name and inputs
+    """
+
+    def strip(value):
+        if isinstance(value, dict):
+            return {key: strip(item) for key, item in value.items() if key != "internalType"}
+        if isinstance(value, list):
+            return [strip(item) for item in value]
+        return value
+
+    entries = [strip(entry) for entry in abi]
+    return sorted(entries, key=lambda entry: json.dumps(entry, sort_keys=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile landRegistry.sol and write its ABI")
+    parser.add_argument("--solc-version", default=SOLC_VERSION)
+    parser.add_argument(
+        "--solc", default=os.getenv("SOLC_BINARY"), help="Local solc executable"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Fail if the committed ABI differs from solc's"
+    )
+    args = parser.parse_args()
+
+    abi, _ = compile_contract(solc_version=args.solc_version, solc_binary=args.solc)
+    if args.check:
+        with open(ABI_PATH) as f:
+            committed = interface(json.load(f))
+        compiled = interface(abi)
+        if committed == compiled:
+            print(f"{ABI_PATH} matches {SOURCE}")
+            return
+        for entry in compiled:
+            if entry not in committed:
+                print(f"missing: {json.dumps(entry)}", file=sys.stderr)
+        for entry in committed:
+            if entry not in compiled:
+                print(f"unexpected: {json.dumps(entry)}", file=sys.stderr)
+        sys.exit(1)
+
+    with open(ABI_PATH, "w") as f:
+        json.dump(abi, f, indent=4)
+        f.write("\n")
+    print(f"Wrote {ABI_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,9 @@ contract landRegistry {
     // Mapping from user address to owned land IDs
     mapping(address => uint256[]) public landsByOwner;
 
+    // Mapping from land ID to its position in its owner's landsByOwner array
+    mapping(uint256 => uint256) private ownedLandIndex;
+
     // Counter for land IDs
     uint256 private landIdCounter;
 
@@ -104,7 +107,7 @@ contract landRegistry {
             registrationDate: block.timestamp
         });
 
-        landsByOwner[msg.sender].push(newLandId);
+        addToOwnedLands(msg.sender, newLandId);
 
         emit LandRegistered(newLandId, msg.sender, block.timestamp);
 
@@ -127,11 +130,9 @@ contract landRegistry {
         land.owner = msg.sender;
         land.forSale = false;
 
-        // Add land to buyer's owned lands
-        landsByOwner[msg.sender].push(_landId);
-
-        // Remove land from seller's owned lands
+        // Move the land from the seller's owned lands to the buyer's
         removeFromOwnedLands(previousOwner, _landId);
+        addToOwnedLands(msg.sender, _landId);
 
         // Record transaction
         transactions.push(
@@ -179,18 +180,27 @@ contract landRegistry {
         emit LandPriceChanged(_landId, _newPrice, block.timestamp);
     }
 
+    /// @notice Adds a land to the owner's list of owned lands.
+    /// @param _owner The address of the owner.
+    /// @param _landId The ID of the land to add.
+    function addToOwnedLands(address _owner, uint256 _landId) internal {
+        ownedLandIndex[_landId] = landsByOwner[_owner].length;
+        landsByOwner[_owner].push(_landId);
+    }
+
     /// @notice Removes a land from the owner's list of owned lands.
     /// @param _owner The address of the owner.
     /// @param _landId The ID of the land to remove.
+    /// @dev Moves the last land into the removed slot, in constant gas.
     function removeFromOwnedLands(address _owner, uint256 _landId) internal {
         uint256[] storage ownedLands = landsByOwner[_owner];
-        for (uint256 i = 0; i < ownedLands.length; i++) {
-            if (ownedLands[i] == _landId) {
-                ownedLands[i] = ownedLands[ownedLands.length - 1];
-                ownedLands.pop();
-                break;
-            }
-        }
+        uint256 index = ownedLandIndex[_landId];
+        uint256 lastLandId = ownedLands[ownedLands.length - 1];
+
+        ownedLands[index] = lastLandId;
+        ownedLandIndex[lastLandId] = index;
+        ownedLands.pop();
+        delete ownedLandIndex[_landId];
     }
 
     /// @notice Retrieves all lands owned by a specific address.
@@ -202,9 +212,74 @@ contract landRegistry {
         return landsByOwner[_owner];
     }
 
+    /// @notice Retrieves a page of the lands owned by a specific address.
+    /// @param _owner The address of the owner.
+    /// @param _offset The number of owned lands to skip.
+    /// @param _limit The maximum number of land IDs to return.
+    /// @return ids The land IDs of the page.
+    /// @return total The number of lands owned by the address.
+    function getLandsByOwner(
+        address _owner,
+        uint256 _offset,
+        uint256 _limit
+    ) external view returns (uint256[] memory ids, uint256 total) {
+        uint256[] storage ownedLands = landsByOwner[_owner];
+        total = ownedLands.length;
+        uint256 count = _offset < total ? total - _offset : 0;
+        if (_limit < count) {
+            count = _limit;
+        }
+
+        ids = new uint256[](count);
+        for (uint256 i = 0; i < count; i++) {
+            ids[i] = ownedLands[_offset + i];
+        }
+    }
+
+    /// @notice Retrieves many lands in one call.
+    /// @param _landIds The IDs of the lands.
+    /// @return The lands in the order of the IDs; unknown IDs give an empty land with ID 0.
+    function getLands(
+        uint256[] calldata _landIds
+    ) external view returns (Land[] memory) {
+        Land[] memory result = new Land[](_landIds.length);
+        for (uint256 i = 0; i < _landIds.length; i++) {
+            result[i] = lands[_landIds[i]];
+        }
+        return result;
+    }
+
+    /// @notice Retrieves the number of registered lands.
+    /// @return The highest land ID, as land IDs are assigned sequentially from 1.
+    function getLandCount() external view returns (uint256) {
+        return landIdCounter;
+    }
+
     /// @notice Retrieves the total number of transactions.
     /// @return The total number of transactions recorded in the contract.
     function getTransactionCount() external view returns (uint256) {
         return transactions.length;
     }
+
+    /// @notice Retrieves a range of transactions.
+    /// @param _from The index of the first transaction.
+    /// @param _count The maximum number of transactions to return.
+    /// @return The transactions from `_from`, fewer at the end of the list.
+    function getTransactions(
+        uint256 _from,
+        uint256 _count
+    ) external view returns (Transaction[] memory) {
+        uint256 available = _from < transactions.length
+            ? transactions.length - _from
+            : 0;
+        if (_count < available) {
+            available = _count;
+        }
+
+        Transaction[] memory result = new Transaction[](available);
+        for (uint256 i = 0; i < available; i++) {
+            result[i] = transactions[_from + i];
+        }
+        return result;
+    }
 }
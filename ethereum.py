@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import weakref
+
+"""
+Ethereum Handles
+----------------
+Web3 client and landRegistry contract objects created per process on first
+use.
+
+Nothing is built when the application is created: web3 is a slow import and
+a provider owns sockets and threads that must not be shared with forked
+worker processes. `ProcessLocal` values are built on first access and
+dropped in the child after `os.fork()`, so an application created before
+forking (e.g. `gunicorn --preload`) gives every worker its own provider.
+"""
+
+
+class ProcessLocal:
+    """
+    Value built on first use in every process.
+
+    Args:
+        factory: Zero-argument callable building the value
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            ref = weakref.ref(self)
+
+            def reset():
+                value = ref()
+                if value is not None:
+                    value.reset()
+
+            os.register_at_fork(after_in_child=reset)
+
+    def get(self):
+        """Return the value, building it if this process has none yet."""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._value = self.factory()
+                    self._built = True
+        return self._value
+
+    def reset(self):
+        """Forget the value; the next `get` builds a new one."""
+        # The lock may have been held by another thread of the parent
+        self._lock = threading.Lock()
+        self._value = None
+        self._built = False
+
+
+class Ethereum:
+    """
+    Provider, Web3 client and landRegistry contract of an application.
+
+    Args:
+        rpc_urls: RPC endpoints in order of preference
+        contract_address: Address of the landRegistry contract
+        abi_path: Path of the contract ABI JSON file
+        provider_options: Keyword arguments of FailoverHTTPProvider
+        on_provider: Callables run with every new provider before its first
+            request, e.g. metrics.instrument_provider
+    """
+
+    def __init__(
+        self, rpc_urls, contract_address, abi_path, provider_options=None, on_provider=()
+    ):
+        self.rpc_urls = rpc_urls
+        self.contract_address = contract_address
+        self.abi_path = abi_path
+        self.provider_options = provider_options or {}
+        self.on_provider = list(on_provider)
+        # Replaced by the benchmarks to run without a node
+        self.provider_factory = self._http_provider
+        self._handles = ProcessLocal(self._connect)
+
+    def _http_provider(self):
+        from providers import FailoverHTTPProvider
+
+        return FailoverHTTPProvider(self.rpc_urls, **self.provider_options)
+
+    def _connect(self):
+        from web3 import Web3
+
+        provider = self.provider_factory()
+        for hook in self.on_provider:
+            hook(provider)
+        w3 = Web3(provider)
+        with open(self.abi_path, "r") as f:
+            abi = json.load(f)
+        return provider, w3, w3.eth.contract(address=self.contract_address, abi=abi)
+
+    @property
+    def provider(self):
+        """Web3 provider of this process."""
+        return self._handles.get()[0]
+
+    @property
+    def w3(self):
+        """Web3 client of this process."""
+        return self._handles.get()[1]
+
+    @property
+    def contract(self):
+        """landRegistry contract bound to this process's Web3 client."""
+        return self._handles.get()[2]
@@ -0,0 +1,286 @@
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import Boolean, DateTime, Float, Integer, or_, select
+from sqlalchemy.orm import aliased
+import csv
+import io
+import re
+
+from models import User, Land, Transaction
+
+"""
+Audit Exports
+-------------
+Streams every land or transaction as CSV, Parquet or Arrow, joined with the
+usernames and wallet addresses of the users involved.
+
+The rows are read with one query over a server-side cursor
+(`stream_results`) and fetched `chunk_size` rows at a time. The export is
+written chunk by chunk, as CSV text, as one Parquet row group or as one
+Arrow record batch. Memory stays bounded by the chunk size whatever the size
+of the table. The query runs in a single read transaction, so the export is
+a consistent snapshot even while the registry is written.
+
+Exports can be limited to a date range (the creation of a land, the date of
+a transaction) and to one user (the owner of a land, the seller or buyer of
+a transaction). Parquet and Arrow need the pyarrow package.
+"""
+
+# Format: (mimetype, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+EXPORT_TABLES = ("lands", "transactions")
+
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}$")
+
+
+# Each query builder returns (query, date column, user columns, order key)
+def _lands_query():
+    owner = aliased(User, name="owner")
+    query = select(
+        Land.id,
+        Land.blockchain_id,
+        Land.title,
+        Land.location,
+        Land.latitude,
+        Land.longitude,
+        Land.description,
+        Land.price,
+        Land.for_sale,
+        Land.status,
+        Land.owner_id,
+        owner.username.label("owner_username"),
+        owner.blockchain_address.label("owner_address"),
+        Land.created_at,
+        Land.updated_at,
+        Land.version,
+    ).join(owner, owner.id == Land.owner_id)
+    return query, Land.created_at, (Land.owner_id,), Land.id
+
+
+def _transactions_query():
+    seller = aliased(User, name="seller")
+    buyer = aliased(User, name="buyer")
+    query = (
+        select(
+            Transaction.id,
+            Transaction.blockchain_tx_hash,
+            Transaction.transaction_date,
+            Transaction.status,
+            Transaction.price,
+            Transaction.land_id,
+            Land.blockchain_id.label("land_blockchain_id"),
+            Land.title.label("land_title"),
+            Transaction.seller_id,
+            seller.username.label("seller_username"),
+            seller.blockchain_address.label("seller_address"),
+            Transaction.buyer_id,
+            buyer.username.label("buyer_username"),
+            buyer.blockchain_address.label("buyer_address"),
+        )
+        .join(Land, Land.id == Transaction.land_id)
+        .join(seller, seller.id == Transaction.seller_id)
+        .join(buyer, buyer.id == Transaction.buyer_id)
+    )
+    parties = (Transaction.seller_id, Transaction.buyer_id)
+    return query, Transaction.transaction_date, parties, Transaction.id
+
+
+_QUERIES = {"lands": _lands_query, "transactions": _transactions_query}
+
+
+def parse_time(value, end=False):
+    """
+    Parse a date range bound.
+
+    Args:
+        value: ISO date or date and time; None for no bound
+        end: True for the upper bound, which includes the whole day of a
+            plain date
+
+    Returns:
+        datetime: Naive UTC bound, or None
+
+    Raises:
+        ValueError: If the value is not an ISO date
+    """
+    if not value:
+        return None
+    if _DATE.match(value):
+        bound = datetime.combine(date.fromisoformat(value), datetime.min.time())
+        return bound + timedelta(days=1) if end else bound
+    bound = datetime.fromisoformat(value)
+    if bound.tzinfo is not None:
+        bound = bound.astimezone(timezone.utc).replace(tzinfo=None)
+    return bound
+
+
+def find_user(session, reference):
+    """
+    Resolve a user ID, username or wallet address.
+
+    Args:
+        session: SQLAlchemy session
+        reference: ID, username or wallet address
+
+    Returns:
+        int: User ID, or None if there is no such user
+    """
+    reference = reference.strip()
+    condition = or_(User.username == reference, User.blockchain_address.ilike(reference))
+    if reference.isdigit():
+        condition = or_(condition, User.id == int(reference))
+    return session.scalar(select(User.id).where(condition).order_by(User.id).limit(1))
+
+
+def _arrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("Parquet and Arrow exports need the pyarrow package") from e
+    return pyarrow
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting the bytes written since the last drain."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class Export:
+    """
+    A streamed export of the lands or transactions.
+
+    Args:
+        table: "lands" or "transactions"
+        fmt: "csv", "parquet" or "arrow"
+        start: Lower bound (inclusive) of the creation/transaction date
+        end: Upper bound (exclusive) of the creation/transaction date
+        user_id: Only the lands owned by, or the transactions of, this user
+        chunk_size: Rows fetched and written at a time
+
+    Raises:
+        RuntimeError: If the format needs pyarrow and it is not installed
+    """
+
+    def __init__(self, table, fmt="csv", start=None, end=None, user_id=None, chunk_size=10000):
+        query, date_column, user_columns, key = _QUERIES[table]()
+        if start is not None:
+            query = query.where(date_column >= start)
+        if end is not None:
+            query = query.where(date_column < end)
+        if user_id is not None:
+            query = query.where(or_(*(column == user_id for column in user_columns)))
+        self.query = query.order_by(key)
+        self.table = table
+        self.fmt = fmt
+        self.chunk_size = chunk_size
+        self.mimetype, extension = EXPORT_FORMATS[fmt]
+        self.filename = f"{table}.{extension}"
+        self.columns = [column.key for column in self.query.selected_columns]
+        self.rows = 0
+        if fmt != "csv":
+            _arrow()
+
+    def batches(self, engine):
+        """
+        Read the rows in chunks over a server-side cursor.
+
+        Args:
+            engine: SQLAlchemy engine of the application database
+
+        Yields:
+            list: Up to `chunk_size` rows
+        """
+        with engine.connect() as conn:
+            result = conn.execution_options(
+                stream_results=True, yield_per=self.chunk_size
+            ).execute(self.query)
+            for rows in result.partitions():
+                self.rows += len(rows)
+                yield rows
+
+    def chunks(self, engine):
+        """
+        Stream the export.
+
+        Args:
+            engine: SQLAlchemy engine of the application database
+
+        Yields:
+            bytes: The next part of the file
+        """
+        if self.fmt == "csv":
+            return self._csv(self.batches(engine))
+        return self._arrow(self.batches(engine))
+
+    def _csv(self, batches):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.columns)
+        for rows in batches:
+            writer.writerows(rows)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    def _schema(self, pa):
+        types = []
+        for column in self.query.selected_columns:
+            if isinstance(column.type, Boolean):
+                types.append(pa.bool_())
+            elif isinstance(column.type, Integer):
+                types.append(pa.int64())
+            elif isinstance(column.type, Float):
+                types.append(pa.float64())
+            elif isinstance(column.type, DateTime):
+                # Stored as naive UTC
+                types.append(pa.timestamp("us", tz="UTC"))
+            else:
+                types.append(pa.string())
+        return pa.schema(list(zip(self.columns, types)))
+
+    def _arrow(self, batches):
+        pa = _arrow()
+        schema = self._schema(pa)
+        sink = _ChunkSink()
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+        else:
+            writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+        try:
+            for rows in batches:
+                arrays = [
+                    pa.array(values, type=field.type)
+                    for values, field in zip(zip(*rows), schema)
+                ]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
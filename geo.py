@@ -0,0 +1,419 @@
+from sqlalchemy import column, exists, func, select, table, text
+from sqlalchemy.exc import OperationalError
+import json
+import math
+
+from models import db, Land
+
+"""
+Land Geospatial Index
+---------------------
+Bounding-box, radius and nearest-neighbour queries over land coordinates.
+
+A land can have a point (`latitude`, `longitude`, WGS 84 degrees) and
+optionally a boundary, a GeoJSON Polygon or MultiPolygon stored as text.
+The extent of every located land (its point and all boundary positions) is
+kept in the SQLite R*Tree table `land_rtree`. Like the full-text index it is
+maintained by triggers on `land`, so every write path updates it.
+
+- Bounding-box queries match lands whose extent intersects the box.
+- Radius and nearest-neighbour queries measure the distance to the land's
+  point. They use the R*Tree to find candidates and order them with an
+  equirectangular approximation of the distance, which is accurate for the
+  distances of a single country; reported distances are great-circle
+  distances. Boxes do not wrap around the antimeridian.
+
+Without R*Tree support (another database backend, or SQLite compiled
+without it) the queries fall back to ranges on the point columns.
+"""
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.radians(EARTH_RADIUS_KM)
+# Half the Earth's circumference: no two points are further apart
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+# First search radius of a nearest-neighbour query, doubled per step
+KNN_START_RADIUS_KM = 1.0
+# Boxes holding more lands are checked per land instead of listed upfront
+RTREE_LIST_LIMIT = 5000
+
+land_rtree = table(
+    "land_rtree",
+    column("id"),
+    column("min_lat"),
+    column("max_lat"),
+    column("min_lon"),
+    column("max_lon"),
+)
+
+# Extent of the `new` row of a trigger; no row if the land has no point
+_NEW_EXTENT = """
+    INSERT INTO land_rtree (id, min_lat, max_lat, min_lon, max_lon)
+    SELECT * FROM (
+        SELECT new.id, MIN(lat) AS min_lat, MAX(lat), MIN(lon), MAX(lon) FROM (
+            SELECT new.latitude AS lat, new.longitude AS lon
+            UNION ALL
+            SELECT json_extract(value, '$[1]'), json_extract(value, '$[0]')
+            FROM json_tree(new.boundary, '$.coordinates')
+            WHERE type = 'array' AND json_type(value, '$[0]') IN ('integer', 'real')
+        )
+    )
+    WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+"""
+
+GEO_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS land_rtree USING rtree(
+        id, min_lat, max_lat, min_lon, max_lon
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS land_rtree_insert AFTER INSERT ON land BEGIN
+        {_NEW_EXTENT}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_rtree_delete AFTER DELETE ON land BEGIN
+        DELETE FROM land_rtree WHERE id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS land_rtree_update
+    AFTER UPDATE OF latitude, longitude, boundary ON land BEGIN
+        DELETE FROM land_rtree WHERE id = old.id;
+        {_NEW_EXTENT}
+    END
+    """,
+)
+
+GEO_REBUILD = """
+    INSERT INTO land_rtree (id, min_lat, max_lat, min_lon, max_lon)
+    SELECT id, MIN(lat), MAX(lat), MIN(lon), MAX(lon) FROM (
+        SELECT id, latitude AS lat, longitude AS lon FROM land
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        UNION ALL
+        SELECT land.id, json_extract(p.value, '$[1]'), json_extract(p.value, '$[0]')
+        FROM land, json_tree(land.boundary, '$.coordinates') AS p
+        WHERE land.latitude IS NOT NULL AND land.longitude IS NOT NULL
+            AND land.boundary IS NOT NULL
+            AND p.type = 'array' AND json_type(p.value, '$[0]') IN ('integer', 'real')
+    )
+    GROUP BY id
+"""
+
+
+def setup_land_geo(engine):
+    """
+    Create the R*Tree index and its sync triggers if they do not exist yet.
+
+    A newly created index is populated from the existing lands.
+
+    Args:
+        engine: SQLAlchemy engine of the application database
+
+    Returns:
+        bool: True if the R*Tree index is available, False to use ranges
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'land_rtree'")
+            ).first()
+            for statement in GEO_SCHEMA:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(GEO_REBUILD))
+    except OperationalError:
+        # SQLite built without the R*Tree or JSON extension
+        return False
+    return True
+
+
+def positions(coordinates):
+    """Yield the [lon, lat] positions of nested GeoJSON coordinates."""
+    if not isinstance(coordinates, list):
+        raise TypeError("GeoJSON coordinates must be nested arrays")
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        yield coordinates
+    else:
+        for part in coordinates:
+            yield from positions(part)
+
+
+def _check_point(lat, lon):
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise ValueError("coordinates must be finite numbers")
+    if not -90 <= lat <= 90:
+        raise ValueError("latitude must be between -90 and 90")
+    if not -180 <= lon <= 180:
+        raise ValueError("longitude must be between -180 and 180")
+
+
+def parse_point(lat, lon):
+    """
+    Parse a latitude/longitude pair.
+
+    Args:
+        lat: Latitude in degrees, as a string or number
+        lon: Longitude in degrees, as a string or number
+
+    Returns:
+        tuple: (latitude, longitude) as floats
+
+    Raises:
+        ValueError: If a value is missing, not a number or out of range
+    """
+    lat, lon = float(lat), float(lon)
+    _check_point(lat, lon)
+    return lat, lon
+
+
+def parse_bbox(value):
+    """
+    Parse a GeoJSON style bounding box "min_lon,min_lat,max_lon,max_lat".
+
+    Returns:
+        tuple: (min_lon, min_lat, max_lon, max_lat)
+
+    Raises:
+        ValueError: If the box is malformed or empty
+    """
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    min_lon, min_lat, max_lon, max_lat = (float(part) for part in parts)
+    _check_point(min_lat, min_lon)
+    _check_point(max_lat, max_lon)
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("bbox minimum exceeds its maximum")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_boundary(value):
+    """
+    Validate a GeoJSON Polygon or MultiPolygon.
+
+    Args:
+        value: GeoJSON text of a geometry or of a Feature holding one
+
+    Returns:
+        tuple: (compact GeoJSON text of the geometry, centroid latitude,
+            centroid longitude), the centroid being the mean position
+
+    Raises:
+        ValueError: If the text is not a valid polygon
+    """
+    try:
+        geometry = json.loads(value)
+    except json.JSONDecodeError:
+        raise ValueError("boundary is not valid JSON")
+    if isinstance(geometry, dict) and geometry.get("type") == "Feature":
+        geometry = geometry.get("geometry")
+    if not isinstance(geometry, dict) or geometry.get("type") not in (
+        "Polygon",
+        "MultiPolygon",
+    ):
+        raise ValueError("boundary must be a GeoJSON Polygon or MultiPolygon")
+
+    coordinates = geometry.get("coordinates")
+    polygons = [coordinates] if geometry["type"] == "Polygon" else coordinates
+    try:
+        for polygon in polygons:
+            for ring in polygon:
+                if len(ring) < 4 or ring[0] != ring[-1]:
+                    raise ValueError("boundary rings must be closed with at least 4 positions")
+        points = list(positions(coordinates))
+        for point in points:
+            if len(point) < 2 or not all(isinstance(v, (int, float)) for v in point):
+                raise ValueError("boundary positions must be [longitude, latitude]")
+            _check_point(point[1], point[0])
+    except TypeError:
+        raise ValueError("boundary coordinates are malformed")
+    if not points:
+        raise ValueError("boundary has no coordinates")
+
+    lat = sum(p[1] for p in points) / len(points)
+    lon = sum(p[0] for p in points) / len(points)
+    text_value = json.dumps(
+        {"type": geometry["type"], "coordinates": coordinates}, separators=(",", ":")
+    )
+    return text_value, lat, lon
+
+
+def land_geometry(values):
+    """
+    Read the optional coordinates of a land from form or import values.
+
+    A boundary without a point gets its centroid as point.
+
+    Args:
+        values: Mapping with optional latitude, longitude and boundary
+
+    Returns:
+        dict: latitude, longitude and boundary, each None when absent
+
+    Raises:
+        ValueError: If a value is invalid or only one coordinate is given
+    """
+    lat = str(values.get("latitude") or "").strip()
+    lon = str(values.get("longitude") or "").strip()
+    boundary = values.get("boundary")
+    if isinstance(boundary, dict):
+        boundary = json.dumps(boundary)
+    boundary = (boundary or "").strip()
+
+    geometry = {"latitude": None, "longitude": None, "boundary": None}
+    if boundary:
+        geometry["boundary"], geometry["latitude"], geometry["longitude"] = (
+            parse_boundary(boundary)
+        )
+    if lat or lon:
+        if not (lat and lon):
+            raise ValueError("latitude and longitude must be given together")
+        geometry["latitude"], geometry["longitude"] = parse_point(lat, lon)
+    return geometry
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat, lon, radius_km):
+    """
+    Bounding box of a circle, clamped to the valid coordinate range.
+
+    Returns:
+        tuple: (min_lon, min_lat, max_lon, max_lat)
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    # Longitude degrees shrink towards the poles
+    dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+    return (
+        max(lon - dlon, -180.0),
+        max(lat - dlat, -90.0),
+        min(lon + dlon, 180.0),
+        min(lat + dlat, 90.0),
+    )
+
+
+def _intersects(bbox):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return (
+        land_rtree.c.min_lat <= max_lat,
+        land_rtree.c.max_lat >= min_lat,
+        land_rtree.c.min_lon <= max_lon,
+        land_rtree.c.max_lon >= min_lon,
+    )
+
+
+def _is_small(intersects):
+    """Whether fewer than RTREE_LIST_LIMIT index entries match."""
+    listed = select(land_rtree.c.id).where(*intersects).limit(RTREE_LIST_LIMIT)
+    count = db.session.scalar(select(func.count()).select_from(listed.subquery()))
+    return count < RTREE_LIST_LIMIT
+
+
+def bbox_filter(bbox, use_rtree=True):
+    """
+    SQL filter selecting the lands whose extent intersects a bounding box.
+
+    Counts the matching index entries (up to RTREE_LIST_LIMIT) to pick the
+    cheaper plan for the box.
+
+    Args:
+        bbox: (min_lon, min_lat, max_lon, max_lat)
+        use_rtree: Whether the R*Tree index is available
+
+    Returns:
+        SQLAlchemy filter expression on Land
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    if not use_rtree:
+        return Land.latitude.between(min_lat, max_lat) & Land.longitude.between(
+            min_lon, max_lon
+        )
+    intersects = _intersects(bbox)
+    if _is_small(intersects):
+        return Land.id.in_(select(land_rtree.c.id).where(*intersects))
+    # A large box would be materialized before the first row is returned:
+    # look up the extent of each land scanned instead
+    return exists(
+        select(land_rtree.c.id).where(land_rtree.c.id == Land.id, *intersects)
+    )
+
+
+def _squared_distance(lat, lon):
+    """Equirectangular squared distance to a point, in squared degrees."""
+    dlat = Land.latitude - lat
+    dlon = (Land.longitude - lon) * math.cos(math.radians(lat))
+    return dlat * dlat + dlon * dlon
+
+
+def nearby_query(columns, filters, lat, lon, radius_km=None, use_rtree=True):
+    """
+    Select located lands ordered by distance from a point.
+
+    Args:
+        columns: Columns or entities to select
+        filters: Additional SQLAlchemy filter expressions
+        lat, lon: Point in degrees
+        radius_km: Only lands within this distance, None for all
+        use_rtree: Whether the R*Tree index is available
+
+    Returns:
+        Select: Query ordered by distance, then land ID
+    """
+    distance = _squared_distance(lat, lon)
+    query = select(*columns).where(
+        Land.latitude.is_not(None), Land.longitude.is_not(None), *filters
+    )
+    if radius_km is not None and radius_km < MAX_DISTANCE_KM:
+        box = radius_bbox(lat, lon, radius_km)
+        query = query.where(distance <= (radius_km / KM_PER_DEGREE) ** 2)
+        if not use_rtree:
+            query = query.where(bbox_filter(box, use_rtree=False))
+        elif _is_small(_intersects(box)):
+            # The distance is checked on the point columns, so the index only
+            # narrows down the candidates of small circles
+            query = query.where(
+                Land.id.in_(select(land_rtree.c.id).where(*_intersects(box)))
+            )
+    return query.order_by(distance, Land.id)
+
+
+def nearest_radius(filters, lat, lon, k, use_rtree=True):
+    """
+    Find a radius holding the k nearest lands matching the filters.
+
+    The radius doubles until the circle holds k lands, so nearby_query with
+    it returns the k nearest lands first while sorting few others.
+
+    Args:
+        filters: Additional SQLAlchemy filter expressions
+        lat, lon: Point in degrees
+        k: Number of neighbours
+        use_rtree: Whether the R*Tree index is available
+
+    Returns:
+        float: Radius in kilometres for nearby_query, None if fewer than k
+            lands match at all
+    """
+    radius = KNN_START_RADIUS_KM
+    while radius < MAX_DISTANCE_KM:
+        in_circle = (
+            nearby_query((Land.id,), filters, lat, lon, radius, use_rtree)
+            .order_by(None)
+            .limit(k)
+            .subquery()
+        )
+        if db.session.scalar(select(func.count()).select_from(in_circle)) >= k:
+            return radius
+        radius *= 2
+    return None
@@ -0,0 +1,237 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
+import logging
+import os
+import tempfile
+
+from metrics import GENERATION_SECONDS
+
+"""
+Upload Image Pipeline
+---------------------
+Stores uploaded images under a hash of their content and produces resized
+variants for the pages that display them.
+
+- Re-uploading an image that is already stored costs only its hash.
+- For every image, thumb/medium/full variants are written in WebP and JPEG
+  (for browsers without WebP) by a background worker pool, so the request
+  that uploaded the image does not wait for the resizing.
+- Variants and the stored original are re-encoded without their EXIF
+  metadata (camera, GPS location, ...); the EXIF orientation is applied to
+  the pixels first.
+
+Variant files are named `<stem>-<variant>.<webp|jpg>` next to the original.
+The full JPEG is written last and marks the variants of an image as ready.
+Images are never upscaled, so a variant of a narrow image is narrower than
+its nominal width; `variants` reports the real widths, read from the full
+JPEG, and omits variants that would repeat a smaller one.
+Pillow is only imported when the first image is processed.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> maximum width in pixels
+VARIANTS = {"thumb": 320, "medium": 800, "full": 1600}
+
+# Pillow save format per stored extension
+SAVE_FORMATS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "gif": "GIF"}
+
+
+def _write_atomic(path, save):
+    """Call save(file) on a temporary file, then move it to `path`."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            save(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ImagePipeline:
+    """
+    Content-addressed storage and variant generation for uploaded images.
+
+    Args:
+        upload_root: The UPLOAD_FOLDER that uploads are stored under
+        workers: Number of background threads generating variants
+        quality: WebP/JPEG encoding quality
+    """
+
+    def __init__(self, upload_root, workers=2, quality=82):
+        self.upload_root = upload_root
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="image-pipeline"
+        )
+        # Ready upload (relative path) -> width of its full variant
+        self._full_widths = {}
+
+    def _variant_path(self, path, variant, ext):
+        stem = os.path.splitext(path)[0]
+        return f"{stem}-{variant}.{ext}"
+
+    def save(self, file, folder, ext):
+        """
+        Store an uploaded image and schedule its variants.
+
+        Args:
+            file: Uploaded file object
+            folder: Subfolder of the upload root (e.g. "lands")
+            ext: Lower-case file extension of the upload
+
+        Returns:
+            str: File name of the stored image within `folder`, or None if
+                the upload is not a readable image
+        """
+        from PIL import Image
+
+        data = file.read()
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.verify()
+        except Exception:
+            return None
+
+        ext = "jpg" if ext == "jpeg" else ext
+        filename = f"{hashlib.sha256(data).hexdigest()[:40]}.{ext}"
+        path = os.path.join(self.upload_root, folder, filename)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, lambda f: f.write(data))
+        if not self.is_ready(os.path.join(folder, filename)):
+            self._executor.submit(self._process, path)
+        return filename
+
+    def _process(self, path):
+        try:
+            with GENERATION_SECONDS.time(kind="image_variants"):
+                self.generate_variants(path)
+        except Exception:
+            logger.exception("Could not generate variants for %s", path)
+
+    def generate_variants(self, path):
+        """
+        Write the resized variants of an image and strip its metadata.
+
+        Args:
+            path: Path of the stored original image
+        """
+        from PIL import Image, ImageOps
+
+        ext = os.path.splitext(path)[1][1:].lower()
+        with Image.open(path) as img:
+            animated = getattr(img, "is_animated", False)
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+            # Flatten transparency onto white for JPEG
+            if img.mode == "RGBA":
+                opaque = Image.new("RGB", img.size, "white")
+                opaque.paste(img, mask=img.getchannel("A"))
+            else:
+                opaque = img
+
+            # Re-encode the original without EXIF (animated GIFs are kept)
+            if not animated and ext in SAVE_FORMATS:
+                original = opaque if SAVE_FORMATS[ext] == "JPEG" else img
+                _write_atomic(
+                    path,
+                    lambda f: original.save(
+                        f, SAVE_FORMATS[ext], quality=self.quality
+                    ),
+                )
+
+            # Full JPEG last: its presence marks the variants as ready
+            for variant, width in sorted(VARIANTS.items(), key=lambda v: v[0] == "full"):
+                size = (width, round(img.height * width / img.width))
+                resized = img if img.width <= width else img.resize(size, Image.LANCZOS)
+                resized_opaque = (
+                    opaque if img.width <= width else opaque.resize(size, Image.LANCZOS)
+                )
+                _write_atomic(
+                    self._variant_path(path, variant, "webp"),
+                    lambda f: resized.save(f, "WEBP", quality=self.quality),
+                )
+                _write_atomic(
+                    self._variant_path(path, variant, "jpg"),
+                    lambda f: resized_opaque.save(
+                        f, "JPEG", quality=self.quality, optimize=True, progressive=True
+                    ),
+                )
+
+    def is_ready(self, relative_path):
+        """Whether the variants of an upload (relative to the root) exist."""
+        return self._full_width(relative_path) is not None
+
+    def _full_width(self, relative_path):
+        """Width of the full variant of an upload, or None if not generated."""
+        if relative_path in self._full_widths:
+            return self._full_widths[relative_path]
+        marker = self._variant_path(
+            os.path.join(self.upload_root, relative_path), "full", "jpg"
+        )
+        if not os.path.exists(marker):
+            return None
+        from PIL import Image
+
+        # Only the header is read
+        with Image.open(marker) as img:
+            width = img.width
+        self._full_widths[relative_path] = width
+        return width
+
+    def variants(self, relative_path):
+        """
+        Return the variant file names of an upload.
+
+        Args:
+            relative_path: Image path relative to the upload root
+
+        Returns:
+            dict: {"webp"|"jpg": [(relative path, width), ...]} by increasing
+                width, or None if the variants have not been generated (yet).
+                Widths are those of the files; variants no wider than a
+                smaller one (the image was narrower) are left out.
+        """
+        full_width = self._full_width(relative_path) if relative_path else None
+        if full_width is None:
+            return None
+        widths = {}
+        for variant, width in VARIANTS.items():
+            widths.setdefault(min(width, full_width), variant)
+        return {
+            ext: [
+                (self._variant_path(relative_path, variant, ext), width)
+                for width, variant in widths.items()
+            ]
+            for ext in ("webp", "jpg")
+        }
+
+    def backfill(self, folder):
+        """
+        Generate missing variants for every original image in a folder.
+
+        Args:
+            folder: Subfolder of the upload root
+
+        Returns:
+            int: Number of images processed
+        """
+        directory = os.path.join(self.upload_root, folder)
+        count = 0
+        for name in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(name)
+            if ext[1:].lower() not in SAVE_FORMATS:
+                continue
+            if any(stem.endswith(f"-{variant}") for variant in VARIANTS):
+                continue
+            if not self.is_ready(os.path.join(folder, name)):
+                with GENERATION_SECONDS.time(kind="image_variants"):
+                    self.generate_variants(os.path.join(directory, name))
+                count += 1
+        return count
@@ -0,0 +1,429 @@
+from sqlalchemy import delete, func, insert, select, update
+from web3 import Web3
+from datetime import datetime, timezone
+import json
+import logging
+import threading
+
+from chain import to_ether
+from models import db, User, Land, Transaction, ChainEvent, IndexerCheckpoint
+from registryclient import RegistryClient
+
+"""
+Blockchain Event Indexer
+------------------------
+Keeps the local database in sync with the landRegistry contract by replaying
+its events (LandRegistered, LandTransferred, LandStatusChanged and
+LandPriceChanged) into the Land and Transaction tables.
+
+- Logs for all four events are fetched with a single eth_getLogs call per
+  block range; the range adapts to provider limits.
+- Progress is persisted in IndexerCheckpoint after every range, so a restart
+  resumes where it stopped.
+- The hash of the checkpoint block is compared with the canonical chain on
+  resume. If it changed, the last `confirmations` blocks are re-scanned and
+  events that were orphaned by the reorganisation are undone.
+- Rows are written with bulk INSERT/UPDATE statements, one round of
+  statements per block range.
+"""
+
+logger = logging.getLogger(__name__)
+
+EVENT_NAMES = (
+    "LandRegistered",
+    "LandTransferred",
+    "LandStatusChanged",
+    "LandPriceChanged",
+)
+ZERO_ADDRESS = "0x" + "0" * 40
+
+# Keep IN (...) lists well below SQLite's bound parameter limit
+SQL_CHUNK_SIZE = 500
+
+
+def _chunks(items, size=SQL_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class EventIndexer:
+    """
+    Incremental indexer for landRegistry contract events.
+
+    Args:
+        w3: Web3 instance used to query the chain
+        contract: landRegistry contract object
+        name: Checkpoint name, allowing several indexers to share a database
+        start_block: First block to scan when no checkpoint exists
+        batch_size: Initial number of blocks per eth_getLogs query
+        max_batch_size: Upper bound the adaptive batch size may grow to
+        confirmations: Number of blocks re-scanned when a reorg is detected
+    """
+
+    def __init__(
+        self,
+        w3,
+        contract,
+        name="landRegistry",
+        start_block=0,
+        batch_size=2000,
+        max_batch_size=10000,
+        confirmations=12,
+    ):
+        self.w3 = w3
+        self.contract = contract
+        self.name = name
+        self.start_block = start_block
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.confirmations = confirmations
+        self.client = RegistryClient(w3, contract)
+        self._events = {}
+        for event_name in EVENT_NAMES:
+            event = getattr(contract.events, event_name)
+            self._events[event.topic] = event()
+
+    # Chain access
+    def _get_logs(self, from_block, to_block):
+        return self.w3.eth.get_logs(
+            {
+                "address": self.contract.address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [list(self._events)],
+            }
+        )
+
+    def _block_hash(self, block_number):
+        return Web3.to_hex(self.w3.eth.get_block(block_number)["hash"])
+
+    def _fetch_lands(self, blockchain_ids):
+        """Read the `lands(id)` structs for many IDs in batched calls."""
+        return self.client.get_lands(blockchain_ids)
+
+    def _decode(self, log):
+        event = self._events[Web3.to_hex(log["topics"][0])]
+        decoded = event.process_log(log)
+        args = dict(decoded["args"])
+        return {
+            "block_number": decoded["blockNumber"],
+            "block_hash": Web3.to_hex(decoded["blockHash"]),
+            "tx_hash": Web3.to_hex(decoded["transactionHash"]),
+            "log_index": decoded["logIndex"],
+            "event": decoded["event"],
+            "land_id": args["landId"],
+            "payload": json.dumps(args),
+            "args": args,
+        }
+
+    # Database helpers
+    def _user_ids(self, addresses):
+        """Map lower-cased wallet addresses to local user IDs."""
+        result = {}
+        for chunk in _chunks({a.lower() for a in addresses}):
+            rows = db.session.execute(
+                select(func.lower(User.blockchain_address), User.id).where(
+                    func.lower(User.blockchain_address).in_(chunk)
+                )
+            )
+            result.update(rows.all())
+        return result
+
+    def _land_ids(self, blockchain_ids):
+        """Map blockchain land IDs to local Land primary keys."""
+        result = {}
+        for chunk in _chunks(blockchain_ids):
+            rows = db.session.execute(
+                select(Land.blockchain_id, Land.id).where(
+                    Land.blockchain_id.in_(chunk)
+                )
+            )
+            result.update(rows.all())
+        return result
+
+    def _bulk_update_lands(self, updates):
+        """Apply {land pk: {column: value}} updates grouped by column set."""
+        groups = {}
+        for land_pk, values in updates.items():
+            groups.setdefault(tuple(sorted(values)), []).append(
+                {"id": land_pk, **values}
+            )
+        for rows in groups.values():
+            db.session.execute(update(Land), rows)
+
+    def upsert_from_structs(self, structs, stats):
+        """
+        Insert, overwrite or delete Land rows from `lands(id)` structs.
+
+        Args:
+            structs: {blockchain land ID: lands(id) struct}
+            stats: Counter dict; "lands" and "skipped" are incremented
+        """
+        owners = self._user_ids(struct[1] for struct in structs.values())
+        existing = self._land_ids(structs)
+        inserts, updates, removed = [], {}, []
+
+        for blockchain_id, struct in structs.items():
+            (_, owner, title, location, description, price, for_sale, registered) = struct
+            if owner == ZERO_ADDRESS:
+                if blockchain_id in existing:
+                    removed.append(existing[blockchain_id])
+                continue
+            owner_id = owners.get(owner.lower())
+            if owner_id is None:
+                stats["skipped"] += 1
+                continue
+            values = {
+                "owner_id": owner_id,
+                "title": title,
+                "location": location,
+                "description": description,
+                "price": to_ether(price),
+                "for_sale": for_sale,
+            }
+            if blockchain_id in existing:
+                updates[existing[blockchain_id]] = values
+            else:
+                inserts.append(
+                    {
+                        "blockchain_id": blockchain_id,
+                        "image": "default_land.png",
+                        "created_at": datetime.fromtimestamp(registered, timezone.utc),
+                        **values,
+                    }
+                )
+
+        if inserts:
+            db.session.execute(insert(Land), inserts)
+        self._bulk_update_lands(updates)
+        for chunk in _chunks(removed):
+            db.session.execute(
+                delete(Transaction).where(Transaction.land_id.in_(chunk))
+            )
+            db.session.execute(delete(Land).where(Land.id.in_(chunk)))
+        stats["lands"] += len(inserts) + len(updates) + len(removed)
+
+    # Indexing
+    def _resume_block(self, checkpoint):
+        """Return the first block to scan, re-scanning after a reorg."""
+        if checkpoint is None:
+            return self.start_block
+        if self._block_hash(checkpoint.block_number) == checkpoint.block_hash:
+            return checkpoint.block_number + 1
+        logger.warning(
+            "Reorg detected at block %s, re-scanning %s blocks",
+            checkpoint.block_number,
+            self.confirmations,
+        )
+        return max(self.start_block, checkpoint.block_number - self.confirmations + 1)
+
+    def _apply(self, from_block, to_block, logs, stats):
+        """Replace the stored events of a block range and apply them."""
+        events = sorted(
+            (self._decode(log) for log in logs),
+            key=lambda e: (e["block_number"], e["log_index"]),
+        )
+
+        # Events previously stored for this range that the chain no longer has
+        in_range = ChainEvent.block_number.between(from_block, to_block)
+        seen = {(e["tx_hash"], e["log_index"]) for e in events}
+        orphaned = [
+            row
+            for row in db.session.execute(
+                select(
+                    ChainEvent.tx_hash,
+                    ChainEvent.log_index,
+                    ChainEvent.event,
+                    ChainEvent.land_id,
+                ).where(in_range)
+            )
+            if (row.tx_hash, row.log_index) not in seen
+        ]
+        db.session.execute(delete(ChainEvent).where(in_range))
+        if events:
+            db.session.execute(
+                insert(ChainEvent),
+                [{k: v for k, v in e.items() if k != "args"} for e in events],
+            )
+        stats["events"] += len(events)
+
+        registered = {e["land_id"] for e in events if e["event"] == "LandRegistered"}
+        if registered:
+            self.upsert_from_structs(self._fetch_lands(registered), stats)
+
+        # Fold the remaining events into the final state of each land
+        changes = {}
+        transfers = {}
+        for e in events:
+            args, land_changes = e["args"], changes.setdefault(e["land_id"], {})
+            if e["event"] == "LandStatusChanged":
+                land_changes["for_sale"] = args["forSale"]
+            elif e["event"] == "LandPriceChanged":
+                land_changes["price"] = to_ether(args["newPrice"])
+            elif e["event"] == "LandTransferred":
+                land_changes["owner"] = args["to"]
+                land_changes["for_sale"] = False
+                transfers[e["tx_hash"]] = e
+        changes = {land_id: c for land_id, c in changes.items() if c}
+
+        land_pks = self._land_ids(changes)
+        owners = self._user_ids(
+            [a for e in transfers.values() for a in (e["args"]["from"], e["args"]["to"])]
+        )
+
+        updates = {}
+        for land_id, land_changes in changes.items():
+            if land_id not in land_pks:
+                stats["skipped"] += 1
+                continue
+            values = {k: v for k, v in land_changes.items() if k != "owner"}
+            if "owner" in land_changes:
+                owner_id = owners.get(land_changes["owner"].lower())
+                if owner_id is None:
+                    stats["skipped"] += 1
+                else:
+                    values["owner_id"] = owner_id
+            updates[land_pks[land_id]] = values
+        self._bulk_update_lands(updates)
+        stats["lands"] += len(updates)
+
+        known_hashes = set()
+        for chunk in _chunks(transfers):
+            known_hashes.update(
+                db.session.scalars(
+                    select(Transaction.blockchain_tx_hash).where(
+                        Transaction.blockchain_tx_hash.in_(chunk)
+                    )
+                )
+            )
+        new_transactions = []
+        for tx_hash, e in transfers.items():
+            args = e["args"]
+            seller_id = owners.get(args["from"].lower())
+            buyer_id = owners.get(args["to"].lower())
+            if tx_hash in known_hashes:
+                continue
+            if e["land_id"] not in land_pks or seller_id is None or buyer_id is None:
+                stats["skipped"] += 1
+                continue
+            new_transactions.append(
+                {
+                    "blockchain_tx_hash": tx_hash,
+                    "land_id": land_pks[e["land_id"]],
+                    "seller_id": seller_id,
+                    "buyer_id": buyer_id,
+                    "price": to_ether(args["price"]),
+                    "transaction_date": datetime.fromtimestamp(
+                        args["timestamp"], timezone.utc
+                    ),
+                }
+            )
+        if new_transactions:
+            db.session.execute(insert(Transaction), new_transactions)
+        stats["transactions"] += len(new_transactions)
+
+        # Undo orphaned events: drop their transfers and re-read affected lands
+        if orphaned:
+            stale_hashes = [
+                row.tx_hash
+                for row in orphaned
+                if row.event == "LandTransferred" and row.tx_hash not in transfers
+            ]
+            for chunk in _chunks(stale_hashes):
+                db.session.execute(
+                    delete(Transaction).where(Transaction.blockchain_tx_hash.in_(chunk))
+                )
+            stale_lands = {row.land_id for row in orphaned}
+            self.upsert_from_structs(self._fetch_lands(stale_lands), stats)
+            stats["orphaned"] += len(orphaned)
+
+    def sync_once(self):
+        """
+        Index all blocks between the checkpoint and the current chain head.
+
+        Returns:
+            dict: Counters for processed events, written lands/transactions,
+                events skipped because a user or land is unknown locally,
+                and orphaned events undone
+        """
+        stats = dict.fromkeys(
+            ("events", "lands", "transactions", "skipped", "orphaned"), 0
+        )
+        head = self.w3.eth.block_number
+        checkpoint = db.session.get(IndexerCheckpoint, self.name)
+        from_block = self._resume_block(checkpoint)
+
+        while from_block <= head:
+            to_block = min(from_block + self.batch_size - 1, head)
+            try:
+                logs = self._get_logs(from_block, to_block)
+            except Exception:
+                # Providers cap the block span or result size of eth_getLogs
+                if to_block == from_block:
+                    raise
+                self.batch_size = max(1, (to_block - from_block + 1) // 2)
+                continue
+
+            try:
+                self._apply(from_block, to_block, logs, stats)
+                if checkpoint is None:
+                    checkpoint = IndexerCheckpoint(name=self.name)
+                    db.session.add(checkpoint)
+                checkpoint.block_number = to_block
+                checkpoint.block_hash = self._block_hash(to_block)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+            from_block = to_block + 1
+            self.batch_size = min(self.batch_size * 2, self.max_batch_size)
+
+        return stats
+
+    def run(self, poll_interval=5.0, stop_event=None, on_change=None):
+        """
+        Keep tailing the chain until `stop_event` is set.
+
+        Args:
+            poll_interval: Seconds to wait between two syncs
+            stop_event: threading.Event used to stop the loop
+            on_change: Called with the sync stats after a sync wrote rows
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                stats = self.sync_once()
+                if stats["events"]:
+                    logger.info("Indexed chain events: %s", stats)
+                if on_change and (stats["lands"] or stats["transactions"]):
+                    on_change(stats)
+            except Exception:
+                logger.exception("Event indexer sync failed")
+            stop_event.wait(poll_interval)
+
+
+def start_indexer_thread(app, indexer, poll_interval=5.0, on_change=None):
+    """
+    Run an EventIndexer in a daemon thread inside the application context.
+
+    Args:
+        app: Flask application providing the database configuration
+        indexer: EventIndexer to run
+        poll_interval: Seconds to wait between two syncs
+        on_change: Called with the sync stats after a sync wrote rows
+
+    Returns:
+        threading.Event: Set it to stop the indexer
+    """
+    stop_event = threading.Event()
+
+    def target():
+        with app.app_context():
+            indexer.run(
+                poll_interval=poll_interval, stop_event=stop_event, on_change=on_change
+            )
+
+    threading.Thread(target=target, name="event-indexer", daemon=True).start()
+    return stop_event
@@ -0,0 +1,716 @@
+from collections import deque
+from itertools import islice
+from sqlalchemy import delete, func, insert, or_, select, update
+from hexbytes import HexBytes
+from web3 import Web3
+import csv
+import hashlib
+import json
+import math
+import os
+import time
+
+from chain import rpc_batch
+from geo import land_geometry, positions
+from models import db, User, Land, ImportRow
+
+"""
+Bulk Land Import
+----------------
+Imports land parcels from CSV or GeoJSON files in large batches.
+
+Each row (CSV) or feature (GeoJSON properties) has the columns title,
+location, price and optionally description, for_sale, image, owner
+(username, e-mail or wallet address of an existing user), blockchain_id,
+latitude and longitude. GeoJSON features without a location get the centre
+of their geometry; Point features set the coordinates and Polygon or
+MultiPolygon features the boundary of the land.
+
+- Rows with a blockchain_id describe lands already registered on chain and
+  are written with one bulk INSERT per batch. Re-running an import skips
+  lands whose blockchain_id is already stored.
+- Rows without one can be registered on chain from a server-held key
+  (ChainRegistrar). Transactions are signed locally with locally assigned
+  nonces and sent in JSON-RPC batches, with many of them in flight at once.
+  Every transaction is recorded in ImportRow before it is sent, so an
+  interrupted import resumes by re-broadcasting or collecting the pending
+  ones instead of registering parcels twice.
+"""
+
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f"}
+
+# Responses of nodes that already have a re-broadcast transaction
+KNOWN_TRANSACTION_ERRORS = ("already known", "known transaction")
+# Response for a used nonce: by this transaction only if the node has it
+STALE_NONCE_ERROR = "nonce too low"
+
+
+class ImportRowError(ValueError):
+    """Raised for a row that cannot be imported."""
+
+
+def _to_int(value):
+    return value if isinstance(value, int) else int(value, 16)
+
+
+def _batches(items, size):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def file_digest(path):
+    """SHA-256 of a file, identifying an import across runs."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _feature_row(feature):
+    row = dict(feature.get("properties") or {})
+    geometry = feature.get("geometry")
+    if not row.get("location") and geometry:
+        points = list(positions(geometry["coordinates"]))
+        lon = sum(p[0] for p in points) / len(points)
+        lat = sum(p[1] for p in points) / len(points)
+        row["location"] = f"{lat:.6f}, {lon:.6f}"
+    if geometry and geometry.get("type") == "Point":
+        row.setdefault("longitude", geometry["coordinates"][0])
+        row.setdefault("latitude", geometry["coordinates"][1])
+    elif geometry and geometry.get("type") in ("Polygon", "MultiPolygon"):
+        row.setdefault("boundary", geometry)
+    return row
+
+
+def read_rows(path):
+    """
+    Read the rows of an import file.
+
+    CSV files and newline-delimited GeoJSON (.geojsonl, .ndjson) are
+    streamed; GeoJSON FeatureCollections are loaded at once.
+
+    Args:
+        path: Path of a .csv, .geojson, .json, .geojsonl or .ndjson file
+
+    Yields:
+        tuple: (row number starting at 1, dict of column values)
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from enumerate(csv.DictReader(f), start=1)
+    elif ext in (".geojsonl", ".geojsons", ".ndjson", ".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield number, _feature_row(json.loads(line))
+    elif ext in (".geojson", ".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        features = data["features"] if data.get("type") == "FeatureCollection" else [data]
+        for number, feature in enumerate(features, start=1):
+            yield number, _feature_row(feature)
+    else:
+        raise ValueError(f"Unsupported import file type: {ext}")
+
+
+def _text(row, column, max_length=None, required=False):
+    value = row.get(column)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise ImportRowError(f"{column} is required")
+    if max_length and len(value) > max_length:
+        raise ImportRowError(f"{column} is longer than {max_length} characters")
+    return value
+
+
+def validate_row(row):
+    """
+    Check an import row and convert it to Land column values.
+
+    Args:
+        row: Dict of column values as read from the file
+
+    Returns:
+        dict: title, location, description, price, for_sale, image,
+            latitude, longitude, boundary (None when absent), blockchain_id
+            (None if not registered yet) and owner (None for the default
+            owner)
+
+    Raises:
+        ImportRowError: If a value is missing or invalid
+    """
+    values = {
+        "title": _text(row, "title", 100, required=True),
+        "location": _text(row, "location", 200, required=True),
+        "description": _text(row, "description"),
+        "image": _text(row, "image", 200) or "default_land.png",
+        "owner": _text(row, "owner") or None,
+    }
+
+    try:
+        values["price"] = float(row.get("price"))
+    except (TypeError, ValueError):
+        raise ImportRowError("price must be a number")
+    if not math.isfinite(values["price"]) or values["price"] <= 0:
+        raise ImportRowError("price must be a positive number")
+
+    for_sale = _text(row, "for_sale").lower() or "true"
+    if for_sale not in TRUE_VALUES | FALSE_VALUES:
+        raise ImportRowError("for_sale must be true or false")
+    values["for_sale"] = for_sale in TRUE_VALUES
+
+    try:
+        values.update(land_geometry(row))
+    except ValueError as e:
+        raise ImportRowError(str(e))
+
+    blockchain_id = _text(row, "blockchain_id")
+    values["blockchain_id"] = None
+    if blockchain_id:
+        if not blockchain_id.isdigit() or int(blockchain_id) < 1:
+            raise ImportRowError("blockchain_id must be a positive integer")
+        values["blockchain_id"] = int(blockchain_id)
+    return values
+
+
+class ChainRegistrar:
+    """
+    Registers lands on chain from a server-held key.
+
+    Args:
+        w3: Web3 instance used to send transactions
+        contract: landRegistry contract object
+        private_key: Key of the account that will own the registered lands
+        gas_headroom: Factor applied to the estimated gas of each transaction
+        receipt_timeout: Seconds to wait for a batch of transactions to be mined
+        poll_interval: Seconds between two receipt polls
+    """
+
+    def __init__(
+        self,
+        w3,
+        contract,
+        private_key,
+        gas_headroom=1.2,
+        receipt_timeout=300,
+        poll_interval=1.0,
+    ):
+        self.w3 = w3
+        self.contract = contract
+        self.account = w3.eth.account.from_key(private_key)
+        self.gas_headroom = gas_headroom
+        self.receipt_timeout = receipt_timeout
+        self.poll_interval = poll_interval
+        self.chain_id = None
+        self._nonce = None
+        self._registered_topic = contract.events.LandRegistered.topic
+
+    @property
+    def address(self):
+        return self.account.address
+
+    def reset_nonce(self):
+        """Continue from the node's pending nonce on the next transaction."""
+        self._nonce = None
+
+    def _next_nonce(self):
+        if self._nonce is None:
+            self._nonce = self.w3.eth.get_transaction_count(self.address, "pending")
+        nonce = self._nonce
+        self._nonce += 1
+        return nonce
+
+    def _sign(self, transaction):
+        signed = self.account.sign_transaction(transaction)
+        return Web3.to_hex(signed.hash), Web3.to_hex(signed.raw_transaction)
+
+    def sign_registrations(self, lands):
+        """
+        Estimate gas for and sign registerLand transactions.
+
+        Args:
+            lands: Validated rows (see `validate_row`)
+
+        Returns:
+            list: Per land, either {"nonce", "tx_hash", "raw"} or {"error"}
+                if the call would revert
+        """
+        if self.chain_id is None:
+            self.chain_id = self.w3.eth.chain_id
+        calls = [
+            self.contract.encode_abi(
+                "registerLand",
+                args=[
+                    land["title"],
+                    land["location"],
+                    land["description"],
+                    Web3.to_wei(land["price"], "ether"),
+                    land["for_sale"],
+                ],
+            )
+            for land in lands
+        ]
+        estimates = rpc_batch(
+            self.w3,
+            [
+                (
+                    "eth_estimateGas",
+                    [{"from": self.address, "to": self.contract.address, "data": data}],
+                )
+                for data in calls
+            ],
+        )
+        gas_price = self.w3.eth.gas_price
+
+        signed = []
+        for data, estimate in zip(calls, estimates):
+            if "error" in estimate:
+                signed.append({"error": str(estimate["error"])})
+                continue
+            nonce = self._next_nonce()
+            tx_hash, raw = self._sign(
+                {
+                    "to": self.contract.address,
+                    "data": data,
+                    "value": 0,
+                    "gas": math.ceil(_to_int(estimate["result"]) * self.gas_headroom),
+                    "gasPrice": gas_price,
+                    "nonce": nonce,
+                    "chainId": self.chain_id,
+                }
+            )
+            signed.append({"nonce": nonce, "tx_hash": tx_hash, "raw": raw})
+        return signed
+
+    def send(self, raw_transactions):
+        """
+        Broadcast signed transactions in JSON-RPC batches.
+
+        A transaction rejected with "nonce too low" counts as accepted only if
+        the node has it (mined or in its pool). Otherwise its nonce was taken
+        by another transaction of the account, and the local nonce is re-synced
+        with the node's pending count.
+
+        Returns:
+            list: None per accepted transaction, else the node's error message
+        """
+        raw_transactions = list(raw_transactions)
+        responses = rpc_batch(
+            self.w3,
+            [("eth_sendRawTransaction", [raw]) for raw in raw_transactions],
+        )
+        errors, stale = [], {}
+        for index, response in enumerate(responses):
+            error = response.get("error")
+            message = error.get("message", str(error)) if isinstance(error, dict) else error
+            if message and any(known in message for known in KNOWN_TRANSACTION_ERRORS):
+                message = None
+            elif message and STALE_NONCE_ERROR in message:
+                stale[index] = Web3.to_hex(Web3.keccak(hexstr=raw_transactions[index]))
+            errors.append(message)
+
+        if stale:
+            lookups = rpc_batch(
+                self.w3,
+                [
+                    (method, [tx_hash])
+                    for tx_hash in stale.values()
+                    for method in ("eth_getTransactionReceipt", "eth_getTransactionByHash")
+                ],
+            )
+            for position, index in enumerate(stale):
+                receipt, transaction = lookups[2 * position : 2 * position + 2]
+                if receipt.get("result") or transaction.get("result"):
+                    errors[index] = None
+                else:
+                    self.reset_nonce()
+        return errors
+
+    def fill_nonce(self, nonce):
+        """
+        Send a no-op transfer to self with `nonce`.
+
+        Used when a registration was rejected after its nonce was assigned, so
+        the transactions with higher nonces are not stuck behind the gap.
+        """
+        _, raw = self._sign(
+            {
+                "to": self.address,
+                "value": 0,
+                "gas": 21000,
+                "gasPrice": self.w3.eth.gas_price,
+                "nonce": nonce,
+                "chainId": self.chain_id,
+            }
+        )
+        return self.send([raw])[0]
+
+    def wait_for_receipts(self, tx_hashes, timeout=None):
+        """
+        Poll receipts in batches until all transactions are mined or timeout.
+
+        Args:
+            tx_hashes: Hashes of the transactions to wait for
+            timeout: Seconds to wait, defaults to `receipt_timeout`; 0 polls once
+
+        Returns:
+            dict: Raw receipt per transaction hash, None if still not mined
+        """
+        receipts = dict.fromkeys(tx_hashes)
+        timeout = self.receipt_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            missing = [h for h, receipt in receipts.items() if receipt is None]
+            if missing:
+                responses = rpc_batch(
+                    self.w3, [("eth_getTransactionReceipt", [h]) for h in missing]
+                )
+                for tx_hash, response in zip(missing, responses):
+                    receipts[tx_hash] = response.get("result")
+                missing = [h for h in missing if receipts[h] is None]
+            if not missing or time.monotonic() >= deadline:
+                return receipts
+            time.sleep(self.poll_interval)
+
+    def registered_land_id(self, receipt):
+        """Land ID from the LandRegistered log of a receipt, or None."""
+        for log in receipt.get("logs", []):
+            topics = [HexBytes(topic) for topic in log["topics"]]
+            if (
+                log["address"].lower() == self.contract.address.lower()
+                and topics
+                and Web3.to_hex(topics[0]) == self._registered_topic
+            ):
+                # landId is the first indexed argument
+                return int.from_bytes(topics[1], "big")
+        return None
+
+    def confirmed_nonce(self):
+        """Number of transactions of the account included in blocks."""
+        return self.w3.eth.get_transaction_count(self.address, "latest")
+
+
+class LandImporter:
+    """
+    Imports land rows into the database, optionally registering them on chain.
+
+    Args:
+        batch_size: Rows per bulk INSERT and per batch of transactions
+        default_owner: Username, e-mail or wallet address of the user owning
+            rows without an owner
+        registrar: ChainRegistrar for rows without a blockchain_id, or None
+            to reject those rows
+        max_in_flight: Maximum number of unmined transactions
+        dry_run: Validate rows without writing or sending anything
+    """
+
+    def __init__(
+        self,
+        batch_size=1000,
+        default_owner=None,
+        registrar=None,
+        max_in_flight=2000,
+        dry_run=False,
+    ):
+        self.batch_size = batch_size
+        self.default_owner = default_owner
+        self.registrar = registrar
+        self.max_in_flight = max_in_flight
+        self.dry_run = dry_run
+
+    def _owner_ids(self, references):
+        """Map usernames, e-mails and wallet addresses to user IDs."""
+        references = {r for r in references if r}
+        if not references:
+            return {}
+        lowered = [r.lower() for r in references]
+        result = {}
+        for user_id, username, email, address in db.session.execute(
+            select(User.id, User.username, User.email, User.blockchain_address).where(
+                or_(
+                    User.username.in_(references),
+                    User.email.in_(references),
+                    func.lower(User.blockchain_address).in_(lowered),
+                )
+            )
+        ):
+            for reference in references:
+                if reference in (username, email) or reference.lower() == address.lower():
+                    result[reference] = user_id
+        return result
+
+    def _insert_lands(self, rows, stats):
+        """Bulk insert Land rows, skipping blockchain IDs already stored."""
+        existing = set(
+            db.session.scalars(
+                select(Land.blockchain_id).where(
+                    Land.blockchain_id.in_([row["blockchain_id"] for row in rows])
+                )
+            )
+        )
+        new_rows = []
+        for row in rows:
+            if row["blockchain_id"] in existing:
+                stats["skipped"] += 1
+            else:
+                existing.add(row["blockchain_id"])
+                new_rows.append(row)
+        if new_rows:
+            db.session.execute(insert(Land), new_rows)
+        stats["imported"] += len(new_rows)
+
+    @staticmethod
+    def _land_row(values, owner_id, blockchain_id):
+        return {
+            "blockchain_id": blockchain_id,
+            "owner_id": owner_id,
+            "title": values["title"],
+            "location": values["location"],
+            "description": values["description"],
+            "price": values["price"],
+            "image": values["image"],
+            "for_sale": values["for_sale"],
+            "latitude": values["latitude"],
+            "longitude": values["longitude"],
+            "boundary": values["boundary"],
+        }
+
+    # On-chain registration
+    def _submit(self, source, rows, registrar_id, stats):
+        """Sign, record and send registerLand transactions for a batch."""
+        signed = self.registrar.sign_registrations([values for _, values in rows])
+        records, submitted = [], []
+        for (number, values), tx in zip(rows, signed):
+            record = {"source": source, "row_number": number}
+            if "error" in tx:
+                records.append({**record, "status": "failed", "error": tx["error"]})
+                stats["failed"] += 1
+                continue
+            records.append(
+                {
+                    **record,
+                    "status": "submitted",
+                    "nonce": tx["nonce"],
+                    "tx_hash": tx["tx_hash"],
+                    "raw_transaction": tx["raw"],
+                }
+            )
+            submitted.append((number, values, tx))
+
+        # Record the transactions before they can be mined, replacing the
+        # records of rows that failed in an earlier run
+        db.session.execute(
+            delete(ImportRow).where(
+                ImportRow.source == source,
+                ImportRow.row_number.in_([number for number, _ in rows]),
+            )
+        )
+        db.session.execute(insert(ImportRow), records)
+        db.session.commit()
+
+        errors = self.registrar.send([tx["raw"] for _, _, tx in submitted])
+        pending = []
+        for (number, values, tx), error in zip(submitted, errors):
+            if error is None:
+                pending.append((number, values, tx["tx_hash"], tx["nonce"]))
+                continue
+            # Keep later nonces minable, then record the rejection; a stale
+            # nonce was used by another transaction and leaves no gap
+            if STALE_NONCE_ERROR not in error:
+                self.registrar.fill_nonce(tx["nonce"])
+            db.session.execute(
+                update(ImportRow)
+                .where(ImportRow.source == source, ImportRow.row_number == number)
+                .values(status="failed", error=error)
+            )
+            stats["failed"] += 1
+        db.session.commit()
+        stats["submitted"] += len(pending)
+        return pending
+
+    def _collect(self, source, pending, registrar_id, stats):
+        """Wait for a batch of transactions and insert the registered lands."""
+        receipts = self.registrar.wait_for_receipts([p[2] for p in pending])
+        confirmed_nonce = None
+        lands, updates = [], []
+        for number, values, tx_hash, nonce in pending:
+            receipt = receipts[tx_hash]
+            key = {"source": source, "row_number": number}
+            if receipt is None:
+                if confirmed_nonce is None:
+                    confirmed_nonce = self.registrar.confirmed_nonce()
+                if nonce < confirmed_nonce:
+                    # The nonce was used by another transaction: retry next run
+                    updates.append({**key, "status": "failed", "error": "dropped"})
+                    stats["failed"] += 1
+                else:
+                    stats["pending"] += 1
+                continue
+            land_id = (
+                self.registrar.registered_land_id(receipt)
+                if _to_int(receipt["status"]) == 1
+                else None
+            )
+            if land_id is None:
+                updates.append({**key, "status": "failed", "error": "reverted"})
+                stats["failed"] += 1
+                continue
+            lands.append(self._land_row(values, registrar_id, land_id))
+            updates.append({**key, "status": "imported", "blockchain_id": land_id})
+
+        if lands:
+            self._insert_lands(lands, stats)
+        if updates:
+            db.session.execute(update(ImportRow), updates)
+        db.session.commit()
+
+    def _resume(self, source, rows_by_number, registrar_id, stats):
+        """Re-broadcast and collect transactions left by an interrupted run."""
+        leftovers = db.session.execute(
+            select(
+                ImportRow.row_number,
+                ImportRow.tx_hash,
+                ImportRow.nonce,
+                ImportRow.raw_transaction,
+            )
+            .filter_by(source=source, status="submitted")
+            .order_by(ImportRow.nonce)
+        ).all()
+        for batch in _batches(leftovers, self.batch_size):
+            mined = self.registrar.wait_for_receipts([row.tx_hash for row in batch], 0)
+            self.registrar.send(
+                [row.raw_transaction for row in batch if mined[row.tx_hash] is None]
+            )
+            pending = [
+                (row.row_number, rows_by_number[row.row_number], row.tx_hash, row.nonce)
+                for row in batch
+            ]
+            self._collect(source, pending, registrar_id, stats)
+        self.registrar.reset_nonce()
+
+    def run(self, path):
+        """
+        Import a CSV or GeoJSON file.
+
+        Args:
+            path: Path of the file (see `read_rows`)
+
+        Returns:
+            dict: Counters (rows, imported, skipped, invalid, submitted,
+                pending, failed) and `errors`, a list of (row number,
+                message) for invalid or failed rows
+        """
+        stats = dict.fromkeys(
+            ("rows", "imported", "skipped", "invalid", "submitted", "pending", "failed"),
+            0,
+        )
+        stats["errors"] = []
+        source = file_digest(path)
+
+        registrar_id = None
+        if self.registrar:
+            registrar_id = self._owner_ids([self.registrar.address]).get(
+                self.registrar.address
+            )
+            if registrar_id is None:
+                raise ValueError(
+                    f"No user has the registrar address {self.registrar.address}"
+                )
+        default_owner_id = None
+        if self.default_owner:
+            default_owner_id = self._owner_ids([self.default_owner]).get(
+                self.default_owner
+            )
+            if default_owner_id is None:
+                raise ValueError(f"Unknown owner {self.default_owner}")
+
+        # Rows already imported or waiting for their transaction
+        done = set(
+            db.session.scalars(
+                select(ImportRow.row_number).where(
+                    ImportRow.source == source, ImportRow.status != "failed"
+                )
+            )
+        )
+        submitted = set(
+            db.session.scalars(
+                select(ImportRow.row_number).filter_by(source=source, status="submitted")
+            )
+        )
+        if self.registrar and not self.dry_run and submitted:
+            leftover_rows = {
+                number: validate_row(row)
+                for number, row in read_rows(path)
+                if number in submitted
+            }
+            self._resume(source, leftover_rows, registrar_id, stats)
+
+        in_flight = deque()
+        for batch in _batches(read_rows(path), self.batch_size):
+            valid = []
+            for number, row in batch:
+                stats["rows"] += 1
+                if number in done:
+                    stats["skipped"] += 1
+                    continue
+                try:
+                    valid.append((number, validate_row(row)))
+                except ImportRowError as e:
+                    stats["invalid"] += 1
+                    stats["errors"].append((number, str(e)))
+
+            owners = self._owner_ids(values["owner"] for _, values in valid)
+            registered, to_register = [], []
+            for number, values in valid:
+                if values["owner"] and values["owner"] not in owners:
+                    stats["invalid"] += 1
+                    stats["errors"].append((number, f"unknown owner {values['owner']}"))
+                elif values["blockchain_id"] is not None:
+                    owner_id = owners.get(values["owner"], default_owner_id)
+                    if owner_id is None:
+                        stats["invalid"] += 1
+                        stats["errors"].append((number, "owner is required"))
+                    else:
+                        registered.append(
+                            self._land_row(values, owner_id, values["blockchain_id"])
+                        )
+                elif self.registrar is None:
+                    stats["invalid"] += 1
+                    stats["errors"].append(
+                        (number, "blockchain_id is required without on-chain registration")
+                    )
+                elif values["owner"] and owners[values["owner"]] != registrar_id:
+                    stats["invalid"] += 1
+                    stats["errors"].append(
+                        (number, "lands registered on chain are owned by the registrar")
+                    )
+                else:
+                    to_register.append((number, values))
+
+            if self.dry_run:
+                stats["imported"] += len(registered) + len(to_register)
+                continue
+            if registered:
+                self._insert_lands(registered, stats)
+                db.session.commit()
+            if to_register:
+                in_flight.append(self._submit(source, to_register, registrar_id, stats))
+                while sum(len(pending) for pending in in_flight) > self.max_in_flight:
+                    self._collect(source, in_flight.popleft(), registrar_id, stats)
+
+        while in_flight:
+            self._collect(source, in_flight.popleft(), registrar_id, stats)
+
+        stats["errors"].extend(
+            tuple(row)
+            for row in db.session.execute(
+                select(ImportRow.row_number, ImportRow.error).filter_by(
+                    source=source, status="failed"
+                )
+            )
+        )
+        return stats
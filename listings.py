@@ -0,0 +1,252 @@
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+import base64
+import binascii
+import json
+
+from models import db, Land
+from search import fts_query
+
+"""
+Marketplace Listings
+--------------------
+Sorted, filtered and keyset-paginated pages of the lands for sale.
+
+Pages are fetched with a cursor holding the sort key of the last land of the
+previous page (`WHERE (price, id) > (:price, :id)`), so every page costs the
+same index range scan however deep it is, and lands listed or sold between
+two requests do not shift the following pages.
+
+The number of lands for sale is kept in the `land_counts` table by triggers
+on `land`, like the full-text and R*Tree indexes, so the marketplace header
+never counts the table. Filtered listings are counted up to COUNT_LIMIT and
+reported as "more than" beyond that. Without trigger support (another
+database backend) the unfiltered count is capped the same way.
+"""
+
+# Sort orders: key columns, descending
+SORTS = {
+    "newest": ((Land.id,), True),
+    "price_asc": ((Land.price, Land.id), False),
+    "price_desc": ((Land.price, Land.id), True),
+}
+DEFAULT_SORT = "newest"
+# Filtered listings are counted up to this many lands
+COUNT_LIMIT = 1000
+
+COUNTS_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS land_counts (
+        name VARCHAR(32) PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_counts_insert
+    AFTER INSERT ON land WHEN new.for_sale BEGIN
+        UPDATE land_counts SET value = value + 1 WHERE name = 'for_sale';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_counts_delete
+    AFTER DELETE ON land WHEN old.for_sale BEGIN
+        UPDATE land_counts SET value = value - 1 WHERE name = 'for_sale';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_counts_update
+    AFTER UPDATE OF for_sale ON land WHEN new.for_sale IS NOT old.for_sale BEGIN
+        UPDATE land_counts
+        SET value = value + (CASE WHEN new.for_sale THEN 1 ELSE -1 END)
+        WHERE name = 'for_sale';
+    END
+    """,
+)
+
+
+def setup_listing_counts(engine):
+    """
+    Create the listing counter and its triggers if they do not exist yet.
+
+    A newly created counter is initialised by counting the existing lands.
+
+    Args:
+        engine: SQLAlchemy engine of the application database
+
+    Returns:
+        bool: True if the counter is maintained, False to count with a limit
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            for statement in COUNTS_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(
+                text(
+                    """
+                    INSERT OR IGNORE INTO land_counts (name, value)
+                    SELECT 'for_sale', COUNT(*) FROM land WHERE for_sale = 1
+                    """
+                )
+            )
+    except OperationalError:
+        return False
+    return True
+
+
+def encode_cursor(land, sort):
+    """
+    Encode the sort key of a land as an opaque URL-safe cursor.
+
+    Args:
+        land: Last Land of a page
+        sort: Name of the sort order (key of SORTS)
+
+    Returns:
+        str: Cursor of the page after this land
+    """
+    columns, _ = SORTS[sort]
+    key = json.dumps([getattr(land, column.key) for column in columns])
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    """
+    Decode a cursor produced by `encode_cursor` for the same sort order.
+
+    Args:
+        cursor: Cursor from the request
+        sort: Name of the sort order (key of SORTS)
+
+    Returns:
+        list: Sort key values
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another sort order
+    """
+    columns, _ = SORTS[sort]
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if (
+        not isinstance(key, list)
+        or len(key) != len(columns)
+        or not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in key
+        )
+    ):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def listing_filters(min_price=None, max_price=None, location=None, use_fts=True):
+    """
+    Build SQL filters for the marketplace.
+
+    Args:
+        min_price: Lowest price, inclusive
+        max_price: Highest price, inclusive
+        location: Words the location must contain (as word prefixes with FTS)
+        use_fts: Whether the FTS5 index is available
+
+    Returns:
+        list: SQLAlchemy filter expressions
+    """
+    filters = []
+    if min_price is not None:
+        filters.append(Land.price >= min_price)
+    if max_price is not None:
+        filters.append(Land.price <= max_price)
+    if location:
+        match = fts_query(location) if use_fts else None
+        if match:
+            filters.append(
+                Land.id.in_(
+                    text("SELECT rowid FROM land_fts WHERE land_fts MATCH :location_match")
+                    .bindparams(location_match=f"location : ({match})")
+                    .columns(Land.id)
+                )
+            )
+        else:
+            filters.append(Land.location.contains(location))
+    return filters
+
+
+def listing_query(filters, sort=DEFAULT_SORT, cursor=None, per_page=24):
+    """
+    Build the statement of one page of lands for sale.
+
+    Args:
+        filters: Expressions from `listing_filters`
+        sort: Name of the sort order (key of SORTS)
+        cursor: Decoded cursor of the previous page, None for the first page
+        per_page: Number of lands per page
+
+    Returns:
+        Select: Lands of the page, plus the first land of the next page
+    """
+    columns, descending = SORTS[sort]
+    query = (
+        select(Land)
+        .options(joinedload(Land.owner))
+        .where(Land.for_sale == True, *filters)
+    )
+    if cursor is not None:
+        key = tuple_(*columns)
+        after = tuple_(*cursor)
+        query = query.where(key < after if descending else key > after)
+    return query.order_by(
+        *(column.desc() if descending else column for column in columns)
+    ).limit(per_page + 1)
+
+
+def listing_page(filters, sort=DEFAULT_SORT, cursor=None, per_page=24):
+    """
+    Fetch one page of lands for sale.
+
+    Args:
+        filters: Expressions from `listing_filters`
+        sort: Name of the sort order (key of SORTS)
+        cursor: Decoded cursor of the previous page, None for the first page
+        per_page: Number of lands per page
+
+    Returns:
+        tuple: (list of Land on this page, cursor of the next page or None)
+    """
+    lands = db.session.scalars(listing_query(filters, sort, cursor, per_page)).all()
+    if len(lands) > per_page:
+        lands = lands[:per_page]
+        return lands, encode_cursor(lands[-1], sort)
+    return lands, None
+
+
+def listing_count(filters, use_counter=True):
+    """
+    Count the lands for sale matching the filters.
+
+    Args:
+        filters: Expressions from `listing_filters`
+        use_counter: Whether the `land_counts` counter is maintained
+
+    Returns:
+        tuple: (count, whether it is exact); an inexact count means at least
+            COUNT_LIMIT lands match
+    """
+    if use_counter and not filters:
+        count = db.session.scalar(
+            text("SELECT value FROM land_counts WHERE name = 'for_sale'")
+        )
+        return count or 0, True
+
+    matches = (
+        select(Land.id)
+        .where(Land.for_sale == True, *filters)
+        .limit(COUNT_LIMIT)
+        .subquery()
+    )
+    count = db.session.scalar(select(func.count()).select_from(matches))
+    return count, count < COUNT_LIMIT
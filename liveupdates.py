@@ -0,0 +1,344 @@
+from collections import namedtuple
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+import bisect
+import json
+import logging
+import threading
+import time
+
+"""
+Live Updates
+------------
+Changes of the lands for sale, pushed to the browsers over Server-Sent
+Events.
+
+Every change is recorded by triggers on `land` into the `land_event` table,
+in the same transaction as the change itself, whichever code made it: the
+write routes (listing toggles, purchases and edits going "pending"), the
+confirmation worker and the event indexer applying on-chain events, or the
+bulk import. Events are compact diffs of one land:
+
+- listed: {"price", "title", "location"}
+- unlisted: {}
+- price: {"price"}
+- sold: {"owner_id", "price"}
+- status: {"status"} ("pending" while a transaction awaits confirmation)
+
+Each worker process runs one `EventHub`: a single thread polls the table for
+new rows (woken up at once by `notify()` after a local commit), keeps the
+most recent ones in a buffer with their SSE frames already encoded, and
+wakes up every waiting stream. A stream only holds a cursor into that shared
+buffer, so an idle subscriber costs one blocked thread or greenlet and no
+queue, and one database query per poll serves all of them.
+
+Event IDs are the table's AUTOINCREMENT keys, which SQLite assigns in commit
+order, so a reconnecting browser resumes with its Last-Event-ID from the
+buffer or, for older IDs, from the table. A cursor older than the retained
+events receives a "reset" event telling the page to reload. The triggers
+need SQLite; on other backends the stream is unavailable.
+"""
+
+logger = logging.getLogger(__name__)
+
+EVENTS_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS land_event (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        land_id INTEGER NOT NULL,
+        kind VARCHAR(16) NOT NULL,
+        data TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_event_insert
+    AFTER INSERT ON land WHEN new.for_sale BEGIN
+        INSERT INTO land_event (land_id, kind, data)
+        VALUES (
+            new.id,
+            'listed',
+            json_object('price', new.price, 'title', new.title, 'location', new.location)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_event_delete
+    AFTER DELETE ON land WHEN old.for_sale BEGIN
+        INSERT INTO land_event (land_id, kind, data) VALUES (old.id, 'unlisted', '{}');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_event_listed
+    AFTER UPDATE OF for_sale ON land WHEN new.for_sale AND NOT old.for_sale BEGIN
+        INSERT INTO land_event (land_id, kind, data)
+        VALUES (
+            new.id,
+            'listed',
+            json_object('price', new.price, 'title', new.title, 'location', new.location)
+        );
+    END
+    """,
+    # A sale also takes the land off the market; it is reported once, as sold
+    """
+    CREATE TRIGGER IF NOT EXISTS land_event_unlisted
+    AFTER UPDATE OF for_sale ON land
+    WHEN old.for_sale AND NOT new.for_sale AND new.owner_id IS old.owner_id BEGIN
+        INSERT INTO land_event (land_id, kind, data) VALUES (new.id, 'unlisted', '{}');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_event_sold
+    AFTER UPDATE OF owner_id ON land WHEN new.owner_id IS NOT old.owner_id BEGIN
+        INSERT INTO land_event (land_id, kind, data)
+        VALUES (new.id, 'sold', json_object('owner_id', new.owner_id, 'price', new.price));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_event_price
+    AFTER UPDATE OF price ON land
+    WHEN new.price IS NOT old.price
+        AND new.for_sale IS old.for_sale
+        AND new.owner_id IS old.owner_id BEGIN
+        INSERT INTO land_event (land_id, kind, data)
+        VALUES (new.id, 'price', json_object('price', new.price));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_event_status
+    AFTER UPDATE OF status ON land WHEN new.status IS NOT old.status BEGIN
+        INSERT INTO land_event (land_id, kind, data)
+        VALUES (new.id, 'status', json_object('status', new.status));
+    END
+    """,
+)
+
+SELECT_EVENTS = text(
+    """
+    SELECT id, land_id, kind, data FROM land_event
+    WHERE id > :after ORDER BY id LIMIT :limit
+    """
+)
+
+# One change of a land; `frame` is its encoded SSE message
+Event = namedtuple("Event", ["id", "land_id", "kind", "frame"])
+
+
+def setup_land_events(engine):
+    """
+    Create the land event table and its triggers if they do not exist yet.
+
+    Args:
+        engine: SQLAlchemy engine of the application database
+
+    Returns:
+        bool: True if land changes are recorded, False if unsupported
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            for statement in EVENTS_SCHEMA:
+                conn.execute(text(statement))
+    except OperationalError:
+        return False
+    return True
+
+
+def sse_frame(event_id, kind, data):
+    """
+    Encode one Server-Sent Events message.
+
+    Args:
+        event_id: ID sent back by the browser as Last-Event-ID
+        kind: Event type, the name browsers listen to
+        data: JSON-serialisable payload
+
+    Returns:
+        bytes: The message including its terminating blank line
+    """
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n".encode()
+
+
+def _event(row):
+    data = {"land_id": row.land_id, **json.loads(row.data)}
+    return Event(row.id, row.land_id, row.kind, sse_frame(row.id, row.kind, data))
+
+
+class EventHub:
+    """
+    Per-process fan-out of the recorded land events to the open streams.
+
+    Args:
+        engine: Zero-argument callable returning the SQLAlchemy engine
+        poll_interval: Seconds between two polls of the event table
+        buffer_size: Recent events kept in memory for the streams
+        backfill_limit: Events at most replayed from the table on resume;
+            older cursors are reset
+        retention: Events kept in the table, older ones are deleted
+        prune_interval: Seconds between two deletions of old events
+    """
+
+    def __init__(
+        self,
+        engine,
+        poll_interval=1.0,
+        buffer_size=1000,
+        backfill_limit=1000,
+        retention=100000,
+        prune_interval=60.0,
+    ):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.backfill_limit = backfill_limit
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self.subscribers = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        self._clear()
+
+    def _clear(self):
+        # Every event after `_floor` is in the buffer; None until the first poll
+        self.last_id = None
+        self._floor = None
+        self._ids = []
+        self._events = []
+
+    def notify(self):
+        """Poll at once, e.g. after committing a change of a land."""
+        self._wake.set()
+
+    # Poller
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._poll_loop, name="live-updates", daemon=True
+            )
+            self._thread.start()
+
+    def _append(self, events):
+        with self._cond:
+            self._ids.extend(event.id for event in events)
+            self._events.extend(events)
+            self.last_id = events[-1].id
+            # Trimmed in bulk so appending stays cheap
+            if len(self._events) > 2 * self.buffer_size:
+                drop = len(self._events) - self.buffer_size
+                self._floor = self._ids[drop - 1]
+                del self._ids[:drop], self._events[:drop]
+            self._cond.notify_all()
+
+    def _poll_loop(self):
+        engine = self.engine()
+        pruned = time.monotonic()
+        while True:
+            with self._cond:
+                if not self.subscribers:
+                    # Restarted from the current table by the next subscriber
+                    self._thread = None
+                    self._clear()
+                    return
+                after = self.last_id
+            self._wake.clear()
+            rows = []
+            try:
+                with engine.connect() as conn:
+                    if after is None:
+                        after = conn.scalar(text("SELECT COALESCE(MAX(id), 0) FROM land_event"))
+                        with self._cond:
+                            self.last_id = self._floor = after
+                            self._cond.notify_all()
+                    rows = conn.execute(
+                        SELECT_EVENTS, {"after": after, "limit": self.buffer_size}
+                    ).all()
+                if rows:
+                    self._append([_event(row) for row in rows])
+                if time.monotonic() - pruned >= self.prune_interval:
+                    pruned = time.monotonic()
+                    self.prune(engine)
+            except Exception:
+                logger.exception("Polling the land events failed")
+            if len(rows) < self.buffer_size:
+                self._wake.wait(self.poll_interval)
+
+    def prune(self, engine):
+        """Delete the events beyond the retention limit from the table."""
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    """
+                    DELETE FROM land_event
+                    WHERE id <= (SELECT MAX(id) FROM land_event) - :retention
+                    """
+                ),
+                {"retention": self.retention},
+            )
+
+    # Streams
+    def _backfill(self, cursor):
+        """Events after an ID older than the buffer, or None to reset."""
+        with self.engine().connect() as conn:
+            rows = conn.execute(
+                SELECT_EVENTS, {"after": cursor, "limit": self.backfill_limit + 1}
+            ).all()
+        # IDs have no gaps until old events are pruned
+        if len(rows) > self.backfill_limit or (rows and rows[0].id != cursor + 1):
+            return None
+        return [_event(row) for row in rows]
+
+    def _next(self, cursor, timeout):
+        """Return (new cursor, events after `cursor`), waiting up to `timeout`."""
+        with self._cond:
+            if self.last_id is None:
+                self._cond.wait(timeout)
+                return cursor, []
+            if cursor is None:
+                return self.last_id, []
+            if cursor > self.last_id:
+                # Unknown ID, e.g. from before the database was recreated
+                return self.last_id, [self._reset_event()]
+            if cursor >= self._floor:
+                if cursor == self.last_id:
+                    self._cond.wait(timeout)
+                events = self._events[bisect.bisect_right(self._ids, cursor) :]
+                return (events[-1].id if events else cursor), events
+            last_id = self.last_id
+
+        events = self._backfill(cursor)
+        if events is None:
+            return last_id, [self._reset_event(last_id)]
+        return (events[-1].id if events else cursor), events
+
+    def _reset_event(self, event_id=None):
+        event_id = self.last_id if event_id is None else event_id
+        return Event(event_id, None, "reset", sse_frame(event_id, "reset", {}))
+
+    def stream(self, last_event_id=None, timeout=15.0):
+        """
+        Follow the land events.
+
+        Args:
+            last_event_id: Resume after this event; None starts with the
+                events recorded from now on
+            timeout: Seconds after which an empty list is yielded, so the
+                caller can send a heartbeat
+
+        Yields:
+            tuple: (ID of the last event sent or None, list of Event)
+        """
+        with self._cond:
+            self.subscribers += 1
+            self._start()
+        try:
+            cursor = last_event_id
+            while True:
+                # The cursor stays None until the first poll has completed
+                cursor, events = self._next(cursor, timeout)
+                yield cursor, events
+        finally:
+            with self._cond:
+                self.subscribers -= 1
@@ -0,0 +1,388 @@
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from bisect import bisect_left
+import contextlib
+import logging
+import threading
+import time
+
+"""
+Performance Metrics
+-------------------
+Per-request instrumentation exposed in the Prometheus text format.
+
+Recorded metrics:
+
+- HTTP request latency per route, plus the number and total time of the SQL
+  statements each request ran
+- SQL statement latency per operation (SELECT, INSERT, ...)
+- Web3 RPC calls and latency per method; a JSON-RPC batch is timed once
+  under the method "batch" and counts each of its requests
+- Template render time per template
+- QR code and image variant generation time
+
+Metrics live in the process-wide `REGISTRY`; each worker process serves its
+own values at /metrics. Requests slower than the app's SLOW_REQUEST_THRESHOLD
+are logged with the SQL statements they ran. The latency of streamed
+responses covers the time until the body starts streaming.
+"""
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter with labels.
+
+    Args:
+        name: Metric name
+        documentation: HELP text
+        labelnames: Names of the labels passed to `inc`
+    """
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Counter):
+    """
+    Histogram of observed values with labels.
+
+    Args:
+        name: Metric name
+        documentation: HELP text
+        labelnames: Names of the labels passed to `observe`
+        buckets: Sorted upper bounds of the buckets
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the duration of a `with` block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(c), s)) for key, (c, s) in self._values.items())
+        for key, (counts, total) in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        """Return the counter `name`, creating it on first use."""
+        return self._get(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        """Return the histogram `name`, creating it on first use."""
+        return self._get(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text (version 0.0.4)
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, metric in metrics:
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for sample, labels, value in metric.samples():
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests handled", ("endpoint", "method", "status")
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("endpoint", "method")
+)
+HTTP_REQUEST_SQL_STATEMENTS = REGISTRY.histogram(
+    "http_request_sql_statements",
+    "SQL statements run per HTTP request",
+    ("endpoint",),
+    buckets=COUNT_BUCKETS,
+)
+HTTP_REQUEST_SQL_SECONDS = REGISTRY.histogram(
+    "http_request_sql_duration_seconds", "SQL time per HTTP request", ("endpoint",)
+)
+SQL_STATEMENT_SECONDS = REGISTRY.histogram(
+    "sql_statement_duration_seconds", "SQL statement latency", ("operation",)
+)
+RPC_REQUESTS = REGISTRY.counter("rpc_requests_total", "Web3 RPC requests", ("method",))
+RPC_ERRORS = REGISTRY.counter("rpc_errors_total", "Failed Web3 RPC requests", ("method",))
+RPC_REQUEST_SECONDS = REGISTRY.histogram(
+    "rpc_request_duration_seconds", "Web3 RPC round trip latency", ("method",)
+)
+TEMPLATE_RENDER_SECONDS = REGISTRY.histogram(
+    "template_render_duration_seconds", "Template render time", ("template",)
+)
+GENERATION_SECONDS = REGISTRY.histogram(
+    "generation_duration_seconds",
+    "QR code and image variant generation time",
+    ("kind",),
+)
+
+
+def _operation(statement):
+    words = statement.lstrip().split(None, 1)
+    operation = words[0].upper() if words else ""
+    if operation in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+        return operation
+    return "OTHER"
+
+
+def _request_totals():
+    """Per-request SQL and RPC accumulators, None outside of a request."""
+    if not has_request_context():
+        return None
+    return g.setdefault(
+        "metrics_totals", {"sql": [], "sql_seconds": 0.0, "rpc": 0, "rpc_seconds": 0.0}
+    )
+
+
+def instrument_engine(engine):
+    """
+    Time every SQL statement an engine executes.
+
+    Args:
+        engine: SQLAlchemy engine to instrument
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        SQL_STATEMENT_SECONDS.observe(elapsed, operation=_operation(statement))
+        totals = _request_totals()
+        if totals is not None:
+            totals["sql"].append((elapsed, statement))
+            totals["sql_seconds"] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def failed_statement(context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection else None
+        if starts:
+            starts.pop()
+
+
+def instrument_provider(provider):
+    """
+    Count and time the requests sent through a Web3 provider.
+
+    Must be called before the provider's first request.
+
+    Args:
+        provider: Web3 provider instance
+    """
+    make_request = provider.make_request
+
+    def timed_make_request(method, params):
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = make_request(method, params)
+            failed = "error" in response
+            return response
+        finally:
+            _record_rpc("single", [method], time.perf_counter() - start, failed)
+
+    provider.make_request = timed_make_request
+
+    if hasattr(provider, "make_batch_request"):
+        make_batch_request = provider.make_batch_request
+
+        def timed_make_batch_request(requests):
+            start = time.perf_counter()
+            failed = True
+            try:
+                responses = make_batch_request(requests)
+                failed = isinstance(responses, dict)
+                return responses
+            finally:
+                methods = [method for method, _ in requests]
+                _record_rpc("batch", methods, time.perf_counter() - start, failed)
+
+        provider.make_batch_request = timed_make_batch_request
+
+    # Web3 caches the provider's bound request functions
+    for cache in ("_request_func_cache", "_batch_request_func_cache"):
+        if hasattr(provider, cache):
+            setattr(provider, cache, (None, None))
+
+
+def _record_rpc(kind, methods, elapsed, failed):
+    RPC_REQUEST_SECONDS.observe(elapsed, method=methods[0] if kind == "single" else "batch")
+    for method in methods:
+        RPC_REQUESTS.inc(method=method)
+        if failed:
+            RPC_ERRORS.inc(method=method)
+    totals = _request_totals()
+    if totals is not None:
+        totals["rpc"] += len(methods)
+        totals["rpc_seconds"] += elapsed
+
+
+_render_starts = threading.local()
+
+
+def _template_started(sender, template, context, **extra):
+    _render_starts.__dict__.setdefault("stack", []).append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    stack = _render_starts.__dict__.get("stack")
+    if stack:
+        TEMPLATE_RENDER_SECONDS.observe(
+            time.perf_counter() - stack.pop(), template=template.name or "<string>"
+        )
+
+
+def init_metrics(app, engine, provider=None):
+    """
+    Install the request, SQL, template and RPC instrumentation.
+
+    Args:
+        app: Flask application whose requests are measured
+        engine: SQLAlchemy engine whose statements are timed
+        provider: Web3 provider whose requests are timed, optional
+    """
+    instrument_engine(engine)
+    if provider is not None:
+        instrument_provider(provider)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_rendered, app)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        # Drop the starts of renders that raised in an earlier request
+        _render_starts.stack = []
+
+    def record(status):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or "unmatched"
+        totals = _request_totals()
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=status)
+        HTTP_REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method)
+        HTTP_REQUEST_SQL_STATEMENTS.observe(len(totals["sql"]), endpoint=endpoint)
+        HTTP_REQUEST_SQL_SECONDS.observe(totals["sql_seconds"], endpoint=endpoint)
+
+        threshold = app.config.get("SLOW_REQUEST_THRESHOLD")
+        if threshold and elapsed >= threshold:
+            logger.warning(
+                "Slow request %s %s (%s): %.3fs, %d SQL statements in %.3fs, "
+                "%d RPC requests in %.3fs%s",
+                request.method,
+                request.full_path.rstrip("?"),
+                endpoint,
+                elapsed,
+                len(totals["sql"]),
+                totals["sql_seconds"],
+                totals["rpc"],
+                totals["rpc_seconds"],
+                "".join(
+                    f"\n    {seconds * 1000:8.2f} ms  {' '.join(statement.split())}"
+                    for seconds, statement in totals["sql"]
+                ),
+            )
+
+    @app.after_request
+    def record_request(response):
+        record(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        # Requests that raised skip after_request
+        record(500)
@@ -0,0 +1,142 @@
+from sqlalchemy import inspect, text
+import logging
+
+"""
+Schema Migrations
+-----------------
+`db.create_all()` creates missing tables but never alters existing ones, so
+schema changes to a live database (new indexes, columns, ...) are applied
+here. Each migration has a version number and a list of SQL statements; the
+highest applied version is stored in the `schema_version` table and pending
+migrations run in order, each in its own transaction.
+
+Statements must be idempotent (IF NOT EXISTS) because a fresh database
+created by `db.create_all()` may already contain the objects they add. New
+columns are added with `add_column`, which checks for the column first since
+SQLite has no ADD COLUMN IF NOT EXISTS.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def add_column(table, column, definition):
+    """
+    Build a migration step adding a column unless it already exists.
+
+    Args:
+        table: Table name
+        column: Column name
+        definition: Column type and constraints, e.g. "INTEGER NOT NULL DEFAULT 0"
+
+    Returns:
+        callable: Step executed with the migration's connection
+    """
+
+    def step(conn):
+        if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}'))
+
+    return step
+
+
+MIGRATIONS = [
+    (
+        1,
+        "Indexes for marketplace, dashboard and transaction history filters",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_land_for_sale_price ON land (for_sale, price)",
+            "CREATE INDEX IF NOT EXISTS ix_land_owner_id ON land (owner_id)",
+            'CREATE INDEX IF NOT EXISTS ix_transaction_buyer_date ON "transaction" (buyer_id, transaction_date)',
+            'CREATE INDEX IF NOT EXISTS ix_transaction_seller_date ON "transaction" (seller_id, transaction_date)',
+            'CREATE INDEX IF NOT EXISTS ix_transaction_land_id ON "transaction" (land_id)',
+        ],
+    ),
+    (
+        2,
+        "Pending state of lands and transactions awaiting chain confirmation",
+        [
+            add_column("land", "status", "VARCHAR(16) NOT NULL DEFAULT 'confirmed'"),
+            add_column("transaction", "status", "VARCHAR(16) NOT NULL DEFAULT 'confirmed'"),
+        ],
+    ),
+    (
+        3,
+        "Optional coordinates and boundary of lands",
+        [
+            add_column("land", "latitude", "FLOAT"),
+            add_column("land", "longitude", "FLOAT"),
+            add_column("land", "boundary", "TEXT"),
+        ],
+    ),
+    (
+        4,
+        "Index for the newest-first marketplace order",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_land_for_sale_id ON land (for_sale, id)",
+            # Without statistics for the new index SQLite prefers it over
+            # ix_land_for_sale_price even for price-ordered pages
+            "ANALYZE land",
+        ],
+    ),
+    (
+        5,
+        "Row versions of lands for conditional requests and delta sync",
+        [
+            add_column("land", "version", "INTEGER NOT NULL DEFAULT 0"),
+            add_column("land", "updated_at", "TIMESTAMP"),
+            # Existing lands get distinct versions; the sequence continues
+            # after them (see versions.py)
+            "UPDATE land SET version = id, updated_at = created_at WHERE version = 0",
+            "CREATE INDEX IF NOT EXISTS ix_land_version ON land (version)",
+        ],
+    ),
+]
+
+
+def schema_version(conn):
+    """
+    Return the highest migration version applied to the database.
+
+    Args:
+        conn: Open SQLAlchemy connection
+
+    Returns:
+        int: Applied version, 0 for a database that was never migrated
+    """
+    conn.execute(
+        text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    )
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def upgrade(engine):
+    """
+    Apply all pending migrations.
+
+    Args:
+        engine: SQLAlchemy engine of the application database
+
+    Returns:
+        list: Versions applied by this call
+    """
+    applied = []
+    with engine.begin() as conn:
+        current = schema_version(conn)
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            conn.execute(
+                text("INSERT INTO schema_version (version) VALUES (:version)"),
+                {"version": version},
+            )
+        logger.info("Applied migration %s: %s", version, description)
+        applied.append(version)
+    return applied
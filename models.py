@@ -0,0 +1,319 @@
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime, timezone
+
+"""
+Database Models
+---------------
+SQLAlchemy models shared by the web application and the background
+blockchain workers (event indexer, etc.).
+"""
+
+db = SQLAlchemy()
+
+
+# Database models
+class User(db.Model):
+    """
+    User model representing registered users in the system.
+
+    Attributes:
+        id: Unique identifier for the user
+        username: User's chosen username
+        email: User's email address
+        password_hash: Hashed password for security
+        blockchain_address: User's Ethereum wallet address
+        profile_image: Path to user's profile image
+        created_at: Timestamp when the user account was created
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(200), nullable=False)
+    blockchain_address = db.Column(db.String(42), unique=True, nullable=False)
+    profile_image = db.Column(db.String(200), default="default_profile.jpg")
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<User {self.username}>"
+
+
+class Land(db.Model):
+    """
+    Land model representing land parcels registered in the system.
+
+    Attributes:
+        id: Unique identifier for the land record
+        blockchain_id: Corresponding ID in the blockchain
+        owner_id: ID of the user who owns the land
+        title: Title of the land
+        location: Physical location of the land
+        latitude: Latitude of the land's point in degrees (WGS 84), optional
+        longitude: Longitude of the land's point in degrees (WGS 84), optional
+        boundary: GeoJSON Polygon or MultiPolygon of the parcel, optional
+        description: Detailed description of the land
+        price: Asking price for the land (if for sale)
+        image: Path to land's image
+        for_sale: Whether the land is currently listed for sale
+        status: "confirmed", or "pending" while a registration, purchase or
+            edit of the land waits for its blockchain transaction
+        created_at: Timestamp when the land was registered
+        version: Registry-wide version of the land's last write
+        updated_at: Timestamp of the land's last write
+    """
+
+    # Keep in sync with the migrations in migrations.py
+    __table_args__ = (
+        db.Index("ix_land_for_sale_price", "for_sale", "price"),
+        db.Index("ix_land_for_sale_id", "for_sale", "id"),
+        db.Index("ix_land_owner_id", "owner_id"),
+        db.Index("ix_land_version", "version"),
+    )
+    # version and updated_at are set by triggers (see versions.py), which
+    # RETURNING does not see: reload them from the table when accessed
+    __mapper_args__ = {"eager_defaults": False}
+
+    id = db.Column(db.Integer, primary_key=True)
+    blockchain_id = db.Column(db.Integer, unique=True, nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    title = db.Column(db.String(100), nullable=False)
+    location = db.Column(db.String(200), nullable=False)
+    # Indexed by the land_rtree table, see geo.py
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    boundary = db.Column(db.Text)
+    description = db.Column(db.Text)
+    price = db.Column(db.Float, nullable=False)
+    image = db.Column(db.String(200))
+    for_sale = db.Column(db.Boolean, default=True)
+    status = db.Column(
+        db.String(16), nullable=False, default="confirmed", server_default="confirmed"
+    )
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    version = db.Column(
+        db.Integer, nullable=False, server_default="0", server_onupdate=db.FetchedValue()
+    )
+    updated_at = db.Column(
+        db.DateTime, server_default=db.FetchedValue(), server_onupdate=db.FetchedValue()
+    )
+
+    owner = db.relationship("User", backref=db.backref("lands", lazy=True))
+
+    def __repr__(self):
+        return f"<Land {self.title}>"
+
+
+class Transaction(db.Model):
+    """
+    Transaction model recording land ownership transfers.
+
+    Attributes:
+        id: Unique identifier for the transaction
+        blockchain_tx_hash: Hash of the blockchain transaction
+        land_id: ID of the land being transferred
+        seller_id: ID of the user selling the land
+        buyer_id: ID of the user buying the land
+        price: Price at which the land was sold
+        status: "confirmed", or "pending" until the purchase is mined
+        transaction_date: Timestamp when the transaction occurred
+    """
+
+    # Keep in sync with the migrations in migrations.py
+    __table_args__ = (
+        db.Index("ix_transaction_buyer_date", "buyer_id", "transaction_date"),
+        db.Index("ix_transaction_seller_date", "seller_id", "transaction_date"),
+        db.Index("ix_transaction_land_id", "land_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    blockchain_tx_hash = db.Column(db.String(66), unique=True, nullable=False)
+    land_id = db.Column(db.Integer, db.ForeignKey("land.id"), nullable=False)
+    seller_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    buyer_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    status = db.Column(
+        db.String(16), nullable=False, default="confirmed", server_default="confirmed"
+    )
+    transaction_date = db.Column(
+        db.DateTime, default=lambda: datetime.now(timezone.utc)
+    )
+
+    land = db.relationship("Land", backref=db.backref("transactions", lazy=True))
+    seller = db.relationship("User", foreign_keys=[seller_id])
+    buyer = db.relationship("User", foreign_keys=[buyer_id])
+
+    def __repr__(self):
+        return f"<Transaction {self.blockchain_tx_hash[:10]}>"
+
+
+class ConfirmationJob(db.Model):
+    """
+    Blockchain transaction submitted by a user that waits for its receipt.
+
+    Routes record a job instead of trusting the transaction; the confirmation
+    worker finalizes the pending rows once the receipt is mined or rolls them
+    back if the transaction failed or never appeared.
+
+    Attributes:
+        id: Unique identifier for the job
+        kind: register, buy or edit
+        tx_hash: Hash of the submitted transaction
+        user_id: ID of the user who submitted it
+        land_id: ID of the land the transaction refers to
+        transaction_id: ID of the pending Transaction of a purchase
+        payload: JSON encoded values applied on confirmation
+        status: pending, confirmed or failed
+        error: Reason a job failed
+        blockchain_id: Land ID read from the receipt of a registration
+        created_at: Timestamp when the transaction was submitted
+        updated_at: Timestamp of the last status change
+    """
+
+    __table_args__ = (db.Index("ix_confirmation_job_status", "status", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)
+    tx_hash = db.Column(db.String(66), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    land_id = db.Column(db.Integer, db.ForeignKey("land.id"))
+    transaction_id = db.Column(db.Integer, db.ForeignKey("transaction.id"))
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    status = db.Column(db.String(16), nullable=False, default="pending")
+    error = db.Column(db.Text)
+    blockchain_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    @property
+    def placeholder_blockchain_id(self):
+        """Blockchain ID stored on a land until its registration is confirmed."""
+        return -self.id
+
+    def __repr__(self):
+        return f"<ConfirmationJob {self.kind} {self.tx_hash[:10]} {self.status}>"
+
+
+class ChainEvent(db.Model):
+    """
+    Raw landRegistry contract event captured by the event indexer.
+
+    Events are kept so that a chain reorganisation can be undone: when the
+    indexer re-scans a block range it deletes the events it stored for that
+    range and compares them with the canonical ones.
+
+    Attributes:
+        id: Unique identifier for the event record
+        block_number: Block the event was emitted in
+        block_hash: Hash of that block
+        tx_hash: Hash of the emitting transaction
+        log_index: Position of the log within the block
+        event: Event name (LandRegistered, LandTransferred, ...)
+        land_id: Blockchain ID of the land the event refers to
+        payload: JSON encoded event arguments
+    """
+
+    __table_args__ = (db.UniqueConstraint("tx_hash", "log_index"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    block_number = db.Column(db.Integer, nullable=False, index=True)
+    block_hash = db.Column(db.String(66), nullable=False)
+    tx_hash = db.Column(db.String(66), nullable=False)
+    log_index = db.Column(db.Integer, nullable=False)
+    event = db.Column(db.String(32), nullable=False)
+    land_id = db.Column(db.Integer, nullable=False, index=True)
+    payload = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f"<ChainEvent {self.event} #{self.land_id} @{self.block_number}>"
+
+
+class IndexerCheckpoint(db.Model):
+    """
+    Last block processed by a named event indexer.
+
+    Attributes:
+        name: Name of the indexer owning the checkpoint
+        block_number: Highest block whose events have been applied
+        block_hash: Hash of that block, used to detect reorganisations
+        updated_at: Timestamp of the last checkpoint update
+    """
+
+    name = db.Column(db.String(64), primary_key=True)
+    block_number = db.Column(db.Integer, nullable=False)
+    block_hash = db.Column(db.String(66), nullable=False)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    def __repr__(self):
+        return f"<IndexerCheckpoint {self.name} @{self.block_number}>"
+
+
+class ReconcileRange(db.Model):
+    """
+    Range of blockchain land IDs last found consistent with the contract.
+
+    Attributes:
+        range_start: First blockchain land ID of the range
+        range_end: Last blockchain land ID of the range
+        digest: Hash of the range's database rows when they last matched
+        block_number: Chain head the range was compared at
+        checked_at: Timestamp of that comparison
+    """
+
+    range_start = db.Column(db.Integer, primary_key=True)
+    range_end = db.Column(db.Integer, nullable=False)
+    digest = db.Column(db.String(64), nullable=False)
+    block_number = db.Column(db.Integer, nullable=False)
+    checked_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    def __repr__(self):
+        return f"<ReconcileRange {self.range_start}-{self.range_end}>"
+
+
+class ImportRow(db.Model):
+    """
+    Progress of one row of a bulk land import.
+
+    Rows registered on chain are recorded before their transaction is sent,
+    so an interrupted import can re-broadcast or pick up pending transactions
+    instead of registering the parcel twice.
+
+    Attributes:
+        source: SHA-256 of the imported file
+        row_number: Position of the row within the file
+        status: submitted, imported or failed
+        nonce: Nonce of the registerLand transaction
+        tx_hash: Hash of the registerLand transaction
+        raw_transaction: Signed transaction, kept for re-broadcasting
+        blockchain_id: Land ID assigned by the contract
+        error: Reason a row failed
+        updated_at: Timestamp of the last status change
+    """
+
+    source = db.Column(db.String(64), primary_key=True)
+    row_number = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(16), nullable=False)
+    nonce = db.Column(db.Integer)
+    tx_hash = db.Column(db.String(66))
+    raw_transaction = db.Column(db.Text)
+    blockchain_id = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+    def __repr__(self):
+        return f"<ImportRow {self.source[:8]}:{self.row_number} {self.status}>"
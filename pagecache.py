@@ -0,0 +1,206 @@
+from collections import Counter, OrderedDict
+import json
+import threading
+
+from cache import LRUCache
+
+"""
+Response Cache
+--------------
+Caches rendered page fragments and query results of the land pages
+(marketplace, search, land details) until the data behind them changes.
+
+Entries are keyed on version numbers instead of being deleted on writes:
+
+- The registry version changes whenever any land is written; it is part of
+  the keys of list pages (marketplace, search results).
+- Each land has its own version, part of the keys of its detail page.
+
+With SQLite, the pages key their entries on the row versions kept by the
+database (see versions.py), which every writer advances: other worker
+processes, the confirmation worker, the indexer and CLI commands alike.
+The versions of this cache are then only a second key for what row versions
+do not cover. Write routes call `bump(land_ids)` after committing, which
+makes every entry built from the old data unreachable; unreachable entries
+age out of the LRU or expire after their TTL.
+
+Two backends are available: an in-process LRU (the default; versions are
+per process) and Redis, which shares entries and versions between all
+worker processes. Redis needs the optional `redis` package. Without row
+versions, entries whose key relies on the versions of this cache are only
+reused with a shared backend (`shared`).
+"""
+
+
+class LRUBackend:
+    """
+    In-process backend.
+
+    Versions are kept for the `max_versions` most recently used names. A
+    forgotten name reads as `floor`, which is raised above every forgotten
+    version, so a name never goes back to a version it had before and
+    entries of older data stay unreachable.
+
+    Args:
+        maxsize: Maximum number of cached entries
+        max_versions: Maximum number of versions kept (default 4 x maxsize)
+    """
+
+    shared = False
+
+    def __init__(self, maxsize=2048, max_versions=None):
+        self.entries = LRUCache(maxsize)
+        self.versions = OrderedDict()
+        self.max_versions = max_versions or 4 * maxsize
+        self.floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.entries.set(key, value, ttl)
+
+    def get_versions(self, names):
+        with self._lock:
+            result = []
+            for name in names:
+                if name in self.versions:
+                    self.versions.move_to_end(name)
+                result.append(self.versions.get(name, self.floor))
+            return result
+
+    def incr(self, names):
+        with self._lock:
+            for name in names:
+                self.versions[name] = self.versions.get(name, self.floor) + 1
+                self.versions.move_to_end(name)
+            while len(self.versions) > self.max_versions:
+                _, version = self.versions.popitem(last=False)
+                self.floor = max(self.floor, version) + 1
+
+
+class RedisBackend:
+    """
+    Redis (or Redis-compatible) backend shared between processes.
+
+    Args:
+        url: Redis URL, e.g. "redis://localhost:6379/0"
+        prefix: Prefix of all keys written by the cache
+    """
+
+    shared = True
+
+    def __init__(self, url, prefix="landregistry:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("The Redis response cache needs the redis package") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(
+            self.prefix + key, json.dumps(value), ex=None if ttl is None else int(ttl)
+        )
+
+    def get_versions(self, names):
+        values = self.client.mget([f"{self.prefix}version:{name}" for name in names])
+        return [int(value or 0) for value in values]
+
+    def incr(self, names):
+        with self.client.pipeline() as pipe:
+            for name in names:
+                pipe.incr(f"{self.prefix}version:{name}")
+            pipe.execute()
+
+
+class ResponseCache:
+    """
+    Version-keyed cache for rendered fragments and query results.
+
+    Args:
+        backend: LRUBackend or RedisBackend storing entries and versions
+        ttl: Seconds an entry is kept at most
+        enabled: When False, every lookup is a miss and nothing is stored
+    """
+
+    def __init__(self, backend=None, ttl=300, enabled=True):
+        self.backend = backend if backend is not None else LRUBackend()
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        """True if the entries and versions are shared between processes."""
+        return self.backend.shared
+
+    def registry_version(self):
+        return self.backend.get_versions(["registry"])[0]
+
+    def land_version(self, land_id):
+        return self.backend.get_versions([f"land:{land_id}"])[0]
+
+    def bump(self, land_ids=()):
+        """
+        Invalidate the list pages and the detail pages of some lands.
+
+        Args:
+            land_ids: Primary keys of the lands that were written
+        """
+        self.backend.incr(["registry"] + [f"land:{land_id}" for land_id in land_ids])
+
+    def invalidate_all(self):
+        """Invalidate every entry, e.g. after a bulk write by the indexer."""
+        self.backend.incr(["epoch"])
+
+    def get_or_set(self, namespace, key_parts, build):
+        """
+        Return a cached value, building and storing it on a miss.
+
+        Args:
+            namespace: Name of the cached page, used for the hit/miss counters
+            key_parts: JSON-serialisable values identifying the entry; must
+                include the versions of the data it was built from. None
+                builds the value without caching it.
+            build: Zero-argument callable returning a JSON-serialisable value
+
+        Returns:
+            The cached or newly built value
+        """
+        if not self.enabled or key_parts is None:
+            return build()
+        epoch = self.backend.get_versions(["epoch"])[0]
+        key = json.dumps([namespace, epoch, *key_parts], separators=(",", ":"))
+        value = self.backend.get(key)
+        with self._lock:
+            (self.hits if value is not None else self.misses)[namespace] += 1
+        if value is not None:
+            return value
+        value = build()
+        self.backend.set(key, value, self.ttl)
+        return value
+
+    def stats(self):
+        """
+        Hit and miss counters of this process.
+
+        Returns:
+            dict: {namespace: {"hits": n, "misses": n, "hit_rate": ratio}}
+        """
+        result = {}
+        for namespace in sorted(set(self.hits) | set(self.misses)):
+            hits, misses = self.hits[namespace], self.misses[namespace]
+            result[namespace] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4),
+            }
+        return result
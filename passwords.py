@@ -0,0 +1,118 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+import threading
+
+"""
+Password Hashing
+----------------
+Runs the deliberately expensive password hash functions in a process pool so
+that a burst of logins does not pin every WSGI worker thread.
+
+- The pool is bounded: at most `max_pending` hashes may be queued or running.
+  Callers wait up to `queue_timeout` seconds for a slot and then get
+  HasherBusy, which routes turn into a "try again" response instead of
+  letting requests pile up.
+- The algorithm and cost are configurable with a werkzeug method string,
+  e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000". Stored hashes made
+  with other parameters are reported by `needs_rehash` so they can be
+  upgraded on the next successful login.
+- A pool whose worker process died (BrokenProcessPool) is replaced by a new
+  one and the hash is retried once.
+"""
+
+# Parameters werkzeug fills in when a method string leaves them out
+METHOD_DEFAULTS = {
+    "scrypt": ("32768", "8", "1"),
+    "pbkdf2": ("sha256", str(DEFAULT_PBKDF2_ITERATIONS)),
+}
+
+
+def normalize_method(method):
+    """
+    Complete a werkzeug method string with its default parameters, as they
+    appear in the hashes it makes ("scrypt" -> "scrypt:32768:8:1").
+
+    Args:
+        method: werkzeug hash method string
+
+    Returns:
+        str: Method string with every parameter
+    """
+    name, *params = method.split(":")
+    defaults = METHOD_DEFAULTS.get(name, ())
+    params = [str(int(p)) if p.isdigit() else p for p in params]
+    return ":".join([name, *params, *defaults[len(params) :]])
+
+
+class HasherBusy(RuntimeError):
+    """Raised when the hashing queue stays full for longer than the timeout."""
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for password hashing.
+
+    Args:
+        method: werkzeug hash method string including its cost parameters
+        workers: Number of hashing processes (default: one per CPU)
+        max_pending: Maximum number of hashes queued or running at once
+        queue_timeout: Seconds to wait for a free slot before HasherBusy
+    """
+
+    def __init__(
+        self, method="scrypt:32768:8:1", workers=None, max_pending=64, queue_timeout=5.0
+    ):
+        self.method = method
+        self._stored_method = normalize_method(method)
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        # Created on first use so importing the app does not fork processes
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _discard(self, pool):
+        """Drop a broken pool so that the next call creates a new one."""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusy("Password hashing queue is full")
+        try:
+            for attempt in range(2):
+                pool = self._executor()
+                try:
+                    return pool.submit(fn, *args).result()
+                except BrokenProcessPool:
+                    # A worker process died; every later submit would fail too
+                    self._discard(pool)
+                    if attempt:
+                        raise
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash a password with the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made with other than the configured method."""
+        return password_hash.split("$", 1)[0] != self._stored_method
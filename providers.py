@@ -0,0 +1,305 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from web3.providers import JSONBaseProvider
+import random
+import threading
+import time
+
+import requests
+
+"""
+Resilient Web3 Provider
+-----------------------
+A JSON-RPC HTTP provider that spreads calls over several RPC endpoints so one
+slow or failing node does not stall the application.
+
+- Each endpoint has its own keep-alive connection pool.
+- Every call has a deadline covering all of its attempts.
+- Idempotent reads are retried on other endpoints with exponential backoff
+  and full jitter; writes (eth_sendRawTransaction, ...) are sent once.
+- Optionally, a read that takes longer than a latency percentile of its
+  endpoint is hedged: the same request goes to a second endpoint and the
+  first answer wins.
+- A circuit breaker takes an endpoint out of rotation after consecutive
+  failures and lets a probe request through once its cool-down is over.
+- Per-endpoint request, error and latency statistics are available through
+  `stats()`.
+"""
+
+# JSON-RPC methods that change state; never retried or hedged
+NON_IDEMPOTENT_METHODS = frozenset(
+    {
+        "eth_sendRawTransaction",
+        "eth_sendTransaction",
+        "eth_sign",
+        "eth_signTransaction",
+        "personal_sendTransaction",
+    }
+)
+
+
+class RPCEndpointError(requests.RequestException):
+    """Raised when an endpoint answers with an HTTP error status."""
+
+
+class LatencyStats:
+    """
+    Request counters and a window of recent latencies for one endpoint.
+
+    Args:
+        window: Number of recent latencies kept for percentiles
+    """
+
+    def __init__(self, window=512):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.requests += 1
+            if ok:
+                self.latencies.append(latency)
+            else:
+                self.errors += 1
+
+    def percentile(self, p):
+        """Latency percentile in seconds, or None without samples."""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Args:
+        threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds before an open circuit lets a probe through
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Whether a request may be sent to the endpoint."""
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                # Also restarts the cool-down after a failed half-open probe
+                self.opened_at = time.monotonic()
+
+
+class Endpoint:
+    """An RPC URL with its connection pool, statistics and breaker."""
+
+    def __init__(self, url, pool_size, breaker):
+        self.url = url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats = LatencyStats()
+        self.breaker = breaker
+
+
+class FailoverHTTPProvider(JSONBaseProvider):
+    """
+    Web3 HTTP provider with several endpoints, retries, hedging and breakers.
+
+    Args:
+        endpoint_uris: RPC URLs, in order of preference
+        timeout: Deadline in seconds for a call including its retries
+        retries: Extra attempts for idempotent calls
+        backoff: Base delay in seconds of the exponential retry backoff
+        hedge_percentile: Latency percentile (e.g. 95) after which a read
+            is also sent to a second endpoint, or None to disable hedging
+        hedge_min_delay: Lower bound in seconds of the hedging delay
+        pool_size: Keep-alive connections per endpoint
+        breaker_threshold: Consecutive failures that open an endpoint's breaker
+        breaker_reset: Seconds an open breaker keeps an endpoint out
+    """
+
+    def __init__(
+        self,
+        endpoint_uris,
+        timeout=10.0,
+        retries=2,
+        backoff=0.1,
+        hedge_percentile=None,
+        hedge_min_delay=0.05,
+        pool_size=20,
+        breaker_threshold=5,
+        breaker_reset=30.0,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        if not endpoint_uris:
+            raise ValueError("At least one RPC endpoint is required")
+        self.endpoints = [
+            Endpoint(url, pool_size, CircuitBreaker(breaker_threshold, breaker_reset))
+            for url in endpoint_uris
+        ]
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self._hedge_pool = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="rpc-hedge"
+        )
+
+    def __str__(self):
+        return f"RPC connection {', '.join(e.url for e in self.endpoints)}"
+
+    def _candidates(self):
+        """Endpoints whose breaker allows traffic, or all if none does."""
+        healthy = [e for e in self.endpoints if e.breaker.allow()]
+        return healthy or list(self.endpoints)
+
+    def _post(self, endpoint, data, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout("RPC call deadline exceeded")
+        start = time.monotonic()
+        try:
+            response = endpoint.session.post(
+                endpoint.url,
+                data=data,
+                headers={"Content-Type": "application/json"},
+                timeout=remaining,
+            )
+            if response.status_code >= 500 or response.status_code == 429:
+                raise RPCEndpointError(
+                    f"{endpoint.url} answered HTTP {response.status_code}"
+                )
+            response.raise_for_status()
+        except requests.RequestException:
+            endpoint.stats.record(time.monotonic() - start, ok=False)
+            endpoint.breaker.record_failure()
+            raise
+        endpoint.stats.record(time.monotonic() - start, ok=True)
+        endpoint.breaker.record_success()
+        return response.content
+
+    def _post_hedged(self, primary, secondary, data, deadline):
+        delay = primary.stats.percentile(self.hedge_percentile)
+        delay = max(delay or 0, self.hedge_min_delay)
+        first = self._hedge_pool.submit(self._post, primary, data, deadline)
+        done, _ = wait([first], timeout=min(delay, deadline - time.monotonic()))
+        if done:
+            return first.result()
+
+        second = self._hedge_pool.submit(self._post, secondary, data, deadline)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _send(self, data, idempotent):
+        deadline = time.monotonic() + self.timeout
+        attempts = 1 + (self.retries if idempotent else 0)
+        error = None
+        for attempt in range(attempts):
+            candidates = self._candidates()
+            endpoint = candidates[attempt % len(candidates)]
+            try:
+                if idempotent and self.hedge_percentile and len(candidates) > 1:
+                    secondary = candidates[(attempt + 1) % len(candidates)]
+                    return self._post_hedged(endpoint, secondary, data, deadline)
+                return self._post(endpoint, data, deadline)
+            except requests.RequestException as e:
+                error = e
+            if attempt + 1 < attempts:
+                # Exponential backoff with full jitter, within the deadline
+                pause = random.uniform(0, self.backoff * 2**attempt)
+                if time.monotonic() + pause >= deadline:
+                    break
+                time.sleep(pause)
+        raise error
+
+    def make_request(self, method, params):
+        raw = self._send(
+            self.encode_rpc_request(method, params),
+            idempotent=method not in NON_IDEMPOTENT_METHODS,
+        )
+        return self.decode_rpc_response(raw)
+
+    def make_batch_request(self, batch_requests):
+        raw = self._send(
+            self.encode_batch_rpc_request(batch_requests),
+            idempotent=not any(
+                method in NON_IDEMPOTENT_METHODS for method, _ in batch_requests
+            ),
+        )
+        response = self.decode_rpc_response(raw)
+        if not isinstance(response, list):
+            # RPC errors return only one response with the error object
+            return response
+        return sorted(response, key=lambda r: r.get("id", 0))
+
+    def is_connected(self, show_traceback=False):
+        try:
+            response = self.make_request("web3_clientVersion", [])
+        except requests.RequestException:
+            if show_traceback:
+                raise
+            return False
+        return "result" in response
+
+    def stats(self):
+        """
+        Per-endpoint statistics.
+
+        Returns:
+            dict: For each URL, request and error counts, p50/p95/p99 latency
+                in milliseconds and the circuit breaker state
+        """
+        result = {}
+        for endpoint in self.endpoints:
+            percentiles = {
+                f"p{p}_ms": (
+                    None
+                    if endpoint.stats.percentile(p) is None
+                    else round(endpoint.stats.percentile(p) * 1000, 2)
+                )
+                for p in (50, 95, 99)
+            }
+            result[endpoint.url] = {
+                "requests": endpoint.stats.requests,
+                "errors": endpoint.stats.errors,
+                **percentiles,
+                "breaker": endpoint.breaker.state,
+            }
+        return result
@@ -0,0 +1,170 @@
+from collections import namedtuple
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Land, Transaction, ConfirmationJob
+
+"""
+Land Purchases
+--------------
+Reserves a land for a buyer while the purchase transaction is confirmed.
+
+The land is read without a lock and reserved with a compare-and-swap: the
+UPDATE moving it to "pending" only matches while the land still has the
+version that was read (see versions.py) and is still confirmed and for
+sale. The reserved land is taken off sale, so it leaves the marketplace,
+the search results and the listing count until the purchase fails and the
+confirmation worker lists it again. Of two buyers racing for the same listing exactly one UPDATE matches;
+the other re-reads the land, finds it pending and is turned away, so no
+database-wide lock is held and no land is sold twice. A reservation that
+lost to an unrelated write (e.g. a price change) is retried a bounded
+number of times with the new values.
+
+Purchases are idempotent per transaction hash: a buyer re-submitting the
+same hash (double click, browser retry) gets the result of the original
+submission instead of an error, including after it was confirmed or failed.
+"""
+
+# Result of a submission; `replayed` is True when the hash was seen before
+PurchaseResult = namedtuple("PurchaseResult", ["status", "transaction_id", "replayed"])
+
+
+class PurchaseError(Exception):
+    """
+    Raised when a purchase cannot be submitted.
+
+    Args:
+        message: Reason shown to the buyer
+        category: Flash category of the message
+    """
+
+    def __init__(self, message, category="warning"):
+        super().__init__(message)
+        self.message = message
+        self.category = category
+
+
+class LandNotFound(PurchaseError):
+    """Raised when the land to buy does not exist."""
+
+    def __init__(self):
+        super().__init__("Land not found", "danger")
+
+
+def previous_purchase(tx_hash, land_id, buyer_id):
+    """
+    Look up an earlier submission of a transaction hash.
+
+    Args:
+        tx_hash: Normalised transaction hash
+        land_id: Land being bought
+        buyer_id: Buying user
+
+    Returns:
+        PurchaseResult: The original result, or None for a new hash
+
+    Raises:
+        PurchaseError: If the hash belongs to another request
+    """
+    job = db.session.scalar(select(ConfirmationJob).where(ConfirmationJob.tx_hash == tx_hash))
+    if job is not None:
+        if job.kind != "buy" or job.user_id != buyer_id or job.land_id != land_id:
+            raise PurchaseError("This blockchain transaction has already been submitted", "danger")
+        if job.status == "failed":
+            raise PurchaseError(f"This purchase failed: {job.error}", "danger")
+        return PurchaseResult(job.status, job.transaction_id, True)
+
+    # Recorded by the event indexer before the buyer submitted it
+    transaction = db.session.scalar(
+        select(Transaction).where(Transaction.blockchain_tx_hash == tx_hash)
+    )
+    if transaction is not None:
+        if transaction.buyer_id != buyer_id or transaction.land_id != land_id:
+            raise PurchaseError("This blockchain transaction has already been submitted", "danger")
+        return PurchaseResult(transaction.status, transaction.id, True)
+    return None
+
+
+def submit_purchase(land_id, buyer_id, tx_hash, max_retries=3):
+    """
+    Reserve a land for a buyer and record the pending purchase.
+
+    Args:
+        land_id: Land to buy
+        buyer_id: Buying user
+        tx_hash: Normalised hash of the buyer's purchase transaction
+        max_retries: Reservations retried after losing to a concurrent write
+
+    Returns:
+        PurchaseResult: "pending" for a new purchase, or the original result
+            of a re-submitted hash
+
+    Raises:
+        LandNotFound: If the land does not exist
+        PurchaseError: If the land cannot be bought, the hash was used for
+            another request or the land kept changing
+    """
+    for _ in range(max_retries + 1):
+        previous = previous_purchase(tx_hash, land_id, buyer_id)
+        if previous is not None:
+            return previous
+
+        land = db.session.execute(
+            select(Land.owner_id, Land.price, Land.for_sale, Land.status, Land.version).where(
+                Land.id == land_id
+            )
+        ).first()
+        if land is None:
+            raise LandNotFound()
+        if land.owner_id == buyer_id:
+            raise PurchaseError("You already own this land")
+        if land.status == "pending":
+            raise PurchaseError("This land has a blockchain transaction awaiting confirmation")
+        if not land.for_sale:
+            raise PurchaseError("This land is not for sale")
+
+        # Compare-and-swap: only matches if nobody wrote the land since it was read
+        reserved = db.session.execute(
+            update(Land)
+            .where(
+                Land.id == land_id,
+                Land.version == land.version,
+                Land.for_sale == True,
+                Land.status == "confirmed",
+            )
+            .values(status="pending", for_sale=False)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not reserved:
+            db.session.rollback()
+            continue
+
+        transaction = Transaction(
+            blockchain_tx_hash=tx_hash,
+            land_id=land_id,
+            seller_id=land.owner_id,
+            buyer_id=buyer_id,
+            price=land.price,
+            status="pending",
+        )
+        db.session.add(transaction)
+        try:
+            db.session.flush()
+            transaction_id = transaction.id
+            db.session.add(
+                ConfirmationJob(
+                    kind="buy",
+                    tx_hash=tx_hash,
+                    user_id=buyer_id,
+                    land_id=land_id,
+                    transaction_id=transaction_id,
+                )
+            )
+            db.session.commit()
+        except IntegrityError:
+            # The same hash was submitted concurrently: replay its result
+            db.session.rollback()
+            continue
+        return PurchaseResult("pending", transaction_id, False)
+
+    raise PurchaseError("The land changed while the purchase was submitted, please try again")
@@ -0,0 +1,224 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+
+from cache import LRUCache
+from metrics import GENERATION_SECONDS
+
+"""
+Land QR Codes
+-------------
+Renders the verification QR codes of lands and caches them by content.
+
+A rendered code only depends on the encoded URL and the render parameters,
+so their hash is used as cache key (and as ETag). Codes are kept in an
+in-memory LRU and on disk, so they survive restarts and are shared between
+worker processes. Bulk exports render cache misses in a process pool and
+stream the result as a ZIP archive. The qrcode package is loaded when the
+first code is rendered.
+"""
+
+# Bump when the rendering changes so stale cache entries are ignored
+RENDER_VERSION = 1
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def render_qr(url, fmt="png", box_size=10, border=4):
+    """
+    Render a QR code for a URL.
+
+    Args:
+        url: Data encoded in the QR code
+        fmt: Output format, "png" or "svg"
+        box_size: Size of one QR module in pixels
+        border: Width of the quiet zone in modules
+
+    Returns:
+        bytes: Encoded image
+    """
+    import qrcode
+    import qrcode.image.svg
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    img_bytes = io.BytesIO()
+    if fmt == "svg":
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(img_bytes)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(img_bytes, format="PNG")
+    return img_bytes.getvalue()
+
+
+def _render_job(job):
+    """Process pool entry point: render one (url, fmt, box_size, border)."""
+    return render_qr(*job)
+
+
+def qr_cache_key(url, fmt="png", box_size=10, border=4):
+    """
+    Content hash identifying a rendered QR code.
+
+    Args:
+        url: Data encoded in the QR code
+        fmt: Output format
+        box_size: Size of one QR module in pixels
+        border: Width of the quiet zone in modules
+
+    Returns:
+        str: Hex SHA-256 digest of the render inputs
+    """
+    params = json.dumps([RENDER_VERSION, url, fmt, box_size, border])
+    return hashlib.sha256(params.encode()).hexdigest()
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, unseekable buffer that ZipFile streams into."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class QRCodeCache:
+    """
+    Two-level (memory, disk) cache of rendered QR codes.
+
+    Args:
+        directory: Folder for the on-disk cache, or None to disable it
+        maxsize: Number of codes kept in memory
+        workers: Size of the process pool used by bulk renders
+        pool_threshold: Minimum number of misses rendered in the pool;
+            smaller batches are rendered inline
+    """
+
+    def __init__(self, directory=None, maxsize=2048, workers=None, pool_threshold=16):
+        self.directory = directory
+        self.memory = LRUCache(maxsize)
+        self.workers = workers
+        self.pool_threshold = pool_threshold
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _path(self, key, fmt):
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def _load(self, key, fmt):
+        data = self.memory.get(key)
+        if data is None and self.directory:
+            try:
+                with open(self._path(key, fmt), "rb") as f:
+                    data = f.read()
+            except OSError:
+                return None
+            self.memory.set(key, data)
+        return data
+
+    def _store(self, key, fmt, data):
+        self.memory.set(key, data)
+        if not self.directory:
+            return
+        path = self._path(key, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def get(self, url, fmt="png", box_size=10, border=4):
+        """
+        Return a QR code, rendering and caching it on a miss.
+
+        Returns:
+            tuple: (cache key, image bytes)
+        """
+        key = qr_cache_key(url, fmt, box_size, border)
+        data = self._load(key, fmt)
+        if data is None:
+            with GENERATION_SECONDS.time(kind=f"qr_{fmt}"):
+                data = render_qr(url, fmt, box_size, border)
+            self._store(key, fmt, data)
+        return key, data
+
+    def get_many(self, urls, fmt="png", box_size=10, border=4):
+        """
+        Return QR codes for many URLs, rendering misses in parallel.
+
+        Args:
+            urls: URLs to encode
+
+        Returns:
+            list: (cache key, image bytes) per URL, in order
+        """
+        keys = [qr_cache_key(url, fmt, box_size, border) for url in urls]
+        images = [self._load(key, fmt) for key in keys]
+        misses = [i for i, data in enumerate(images) if data is None]
+
+        jobs = [(urls[i], fmt, box_size, border) for i in misses]
+        if jobs:
+            # Timed per batch: codes rendered in the pool report no timings
+            with GENERATION_SECONDS.time(kind=f"qr_{fmt}_batch"):
+                if len(jobs) >= self.pool_threshold:
+                    rendered = list(self._executor().map(_render_job, jobs, chunksize=8))
+                else:
+                    rendered = [_render_job(job) for job in jobs]
+            for i, data in zip(misses, rendered):
+                self._store(keys[i], fmt, data)
+                images[i] = data
+
+        return list(zip(keys, images))
+
+    def stream_zip(self, named_urls, fmt="png", box_size=10, border=4, chunk_size=256):
+        """
+        Yield a ZIP archive of QR codes chunk by chunk.
+
+        Args:
+            named_urls: Iterable of (file name without extension, URL)
+            chunk_size: Number of codes rendered per step
+
+        Yields:
+            bytes: Consecutive pieces of the archive
+        """
+        buffer = _StreamBuffer()
+        named_urls = iter(named_urls)
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            while True:
+                chunk = [item for _, item in zip(range(chunk_size), named_urls)]
+                if not chunk:
+                    break
+                codes = self.get_many([url for _, url in chunk], fmt, box_size, border)
+                for (name, _), (_, data) in zip(chunk, codes):
+                    archive.writestr(f"{name}.{fmt}", data)
+                yield buffer.take()
+        yield buffer.take()
@@ -0,0 +1,62 @@
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+"""
+SQL Query Budget
+----------------
+Counts the SQL statements executed while handling each request. When
+enforcement is enabled (typically in tests), a request that runs more
+statements than its route's budget fails with QueryBudgetExceeded, which
+catches N+1 query regressions as soon as they are introduced.
+
+Configuration:
+    SQL_QUERY_BUDGET_ENFORCE: Raise when a budget is exceeded
+    SQL_QUERY_BUDGET_DEFAULT: Budget for routes without their own entry
+    SQL_QUERY_BUDGETS: Mapping of endpoint name to statement budget
+"""
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised when a request runs more SQL statements than its budget."""
+
+
+def request_statements():
+    """
+    Return the SQL statements executed so far by the current request.
+
+    Returns:
+        list: Statement strings, empty outside of a request
+    """
+    if not has_request_context():
+        return []
+    return g.setdefault("sql_statements", [])
+
+
+def init_query_budget(app, engine):
+    """
+    Install the statement counter on an engine and the budget check on an app.
+
+    Args:
+        app: Flask application whose requests are checked
+        engine: SQLAlchemy engine whose statements are counted
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            request_statements().append(statement)
+
+    @app.after_request
+    def check_query_budget(response):
+        if not app.config.get("SQL_QUERY_BUDGET_ENFORCE"):
+            return response
+        budget = app.config["SQL_QUERY_BUDGETS"].get(
+            request.endpoint, app.config["SQL_QUERY_BUDGET_DEFAULT"]
+        )
+        statements = request_statements()
+        if len(statements) > budget:
+            raise QueryBudgetExceeded(
+                f"{request.endpoint} ran {len(statements)} SQL statements "
+                f"(budget {budget}):\n" + "\n".join(statements)
+            )
+        return response
@@ -0,0 +1,59 @@
+from sqlalchemy import text
+
+"""
+Query Plan Checks
+-----------------
+Runs EXPLAIN QUERY PLAN (SQLite) for the queries behind the hot routes and
+reports any that fall back to a full table scan, proving the indexes from
+migrations.py are used.
+
+The statements are built by the same functions the routes execute (see
+`route_queries` in app.py), so a change to a route's query is checked as
+it ships.
+"""
+
+
+def full_scans(plan):
+    """Return the plan steps that scan a whole table without an index."""
+    return [
+        step
+        for step in plan
+        if step.startswith("SCAN ")
+        and "INDEX" not in step
+        and not step.startswith("SCAN CONSTANT ROW")
+    ]
+
+
+def explain(conn, statement):
+    """
+    Explain one statement.
+
+    Args:
+        conn: SQLAlchemy connection to a SQLite database
+        statement: SQLAlchemy select or text statement, with its parameters
+            bound
+
+    Returns:
+        list: Steps of the query plan
+    """
+    sql = statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    return [row.detail for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def check_query_plans(engine, statements):
+    """
+    Explain every hot query.
+
+    Args:
+        engine: SQLAlchemy engine of a SQLite database
+        statements: Mapping of route name to statement
+
+    Returns:
+        dict: Mapping of route name to (plan steps, full scan steps)
+    """
+    results = {}
+    with engine.connect() as conn:
+        for name, statement in statements.items():
+            plan = explain(conn, statement)
+            results[name] = (plan, full_scans(plan))
+    return results
@@ -0,0 +1,349 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import delete, func, select
+import hashlib
+import json
+import math
+
+from chain import to_ether
+from indexer import EVENT_NAMES, ZERO_ADDRESS, EventIndexer
+from models import db, User, Land, ChainEvent, ReconcileRange
+from registryclient import RegistryClient
+
+"""
+Chain Reconciliation
+--------------------
+Compares the Land table with the public state of the landRegistry contract
+(`lands(id)` and `getLandsByOwner`) and reports or repairs drift.
+
+- Land IDs are checked in fixed ranges. Contract state of a range is read
+  through RegistryClient (batch view functions where the contract has them,
+  batched JSON-RPC calls), several ranges at a time in a thread pool.
+- After a range is found consistent, a digest of its database rows and the
+  chain head are stored in ReconcileRange. Later runs skip ranges whose
+  digest is unchanged and whose lands emitted no contract event since, so
+  only ranges touched on either side are read from the chain again.
+- The owner index is checked for the owners of every re-checked land.
+- With `repair`, drifted lands are overwritten from the chain state. Lands
+  missing on chain are only reported: deleting them would also delete their
+  transaction history, so that takes `delete_missing` and is limited to IDs
+  the contract has issued (`getLandCount()`).
+- A range is only remembered as consistent when neither its lands nor the
+  owner index of their owners drifted.
+"""
+
+FIELDS = ("owner", "title", "location", "description", "price", "for_sale")
+
+
+def _land_values(owner, title, location, description, price, for_sale):
+    return {
+        "owner": owner.lower(),
+        "title": title,
+        "location": location,
+        "description": description or "",
+        "price": price,
+        "for_sale": bool(for_sale),
+    }
+
+
+def _same(field, db_value, chain_value):
+    if field == "price":
+        return math.isclose(db_value, chain_value, rel_tol=1e-9)
+    return db_value == chain_value
+
+
+def range_digest(lands):
+    """
+    Hash the database state of a land ID range.
+
+    Args:
+        lands: {blockchain land ID: field values} of the lands in the range
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    rows = [[land_id, [lands[land_id][f] for f in FIELDS]] for land_id in sorted(lands)]
+    return hashlib.sha256(json.dumps(rows).encode()).hexdigest()
+
+
+class Reconciler:
+    """
+    Checks the Land table against the landRegistry contract.
+
+    Args:
+        w3: Web3 instance used to query the chain
+        contract: landRegistry contract object
+        range_size: Number of land IDs per digest range
+        batch_size: Maximum number of calls per JSON-RPC batch
+        workers: Number of ranges read from the chain concurrently
+        log_span: Maximum number of blocks per eth_getLogs query
+    """
+
+    def __init__(
+        self, w3, contract, range_size=1000, batch_size=100, workers=4, log_span=10000
+    ):
+        self.w3 = w3
+        self.contract = contract
+        self.range_size = range_size
+        self.batch_size = batch_size
+        self.workers = workers
+        self.log_span = log_span
+        self._topics = [getattr(contract.events, name).topic for name in EVENT_NAMES]
+        self.client = RegistryClient(w3, contract, rpc_batch_size=batch_size)
+        self.land_count = None
+
+    # Chain access
+    def _fetch_lands(self, land_ids):
+        """Read `lands(id)` for many IDs; nonexistent lands have ID 0."""
+        return self.client.get_lands(land_ids)
+
+    def _fetch_owned(self, addresses):
+        return {
+            address: set(ids) for address, ids in self.client.lands_by_owner(addresses).items()
+        }
+
+    def _upper_bound(self, known_max):
+        """Highest land ID on chain, probing past the highest known one."""
+        land_count = self.land_count = self.client.land_count()
+        if land_count is not None:
+            return max(known_max, land_count)
+        upper = max(
+            known_max,
+            db.session.scalar(
+                select(func.max(ChainEvent.land_id)).where(
+                    ChainEvent.event == "LandRegistered"
+                )
+            )
+            or 0,
+        )
+        while True:
+            probe = self._fetch_lands(range(upper + 1, upper + 1 + self.batch_size))
+            registered = [land_id for land_id, struct in probe.items() if struct[0]]
+            if not registered:
+                return upper
+            upper = max(registered)
+
+    def _touched(self, since_block, head):
+        """
+        Last block in (since_block, head] in which each land emitted an event.
+
+        Returns:
+            dict: {blockchain land ID: block number}
+        """
+        touched = {}
+        start = since_block + 1
+        while start <= head:
+            end = min(start + self.log_span - 1, head)
+            logs = self.w3.eth.get_logs(
+                {
+                    "address": self.contract.address,
+                    "fromBlock": start,
+                    "toBlock": end,
+                    "topics": [self._topics],
+                }
+            )
+            # landId is the first indexed argument of every registry event
+            for log in logs:
+                land_id = int.from_bytes(log["topics"][1], "big")
+                touched[land_id] = max(touched.get(land_id, 0), log["blockNumber"])
+            start = end + 1
+        return touched
+
+    # Database access
+    def _db_lands(self, first=None, last=None):
+        query = select(
+            Land.blockchain_id,
+            User.blockchain_address,
+            Land.title,
+            Land.location,
+            Land.description,
+            Land.price,
+            Land.for_sale,
+        ).join(User, Land.owner_id == User.id)
+        # Pending registrations hold negative placeholder IDs
+        query = query.where(Land.blockchain_id > 0)
+        if first is not None:
+            query = query.where(Land.blockchain_id.between(first, last))
+        # Streamed from a server-side cursor on PostgreSQL
+        query = query.execution_options(yield_per=1000)
+        return {row[0]: _land_values(*row[1:]) for row in db.session.execute(query)}
+
+    def _range_of(self, land_id):
+        return (land_id - 1) // self.range_size * self.range_size + 1
+
+    # Comparison
+    def _compare(self, db_lands, structs):
+        diffs = []
+        for land_id, struct in structs.items():
+            row = db_lands.get(land_id)
+            on_chain = struct[0] != 0 and struct[1] != ZERO_ADDRESS
+            if not on_chain:
+                if row is not None:
+                    diffs.append({"land_id": land_id, "kind": "missing_on_chain", "db": row})
+                continue
+            chain = _land_values(*struct[1:5], to_ether(struct[5]), struct[6])
+            if row is None:
+                diffs.append({"land_id": land_id, "kind": "missing_in_db", "chain": chain})
+                continue
+            fields = {
+                f: {"db": row[f], "chain": chain[f]}
+                for f in FIELDS
+                if not _same(f, row[f], chain[f])
+            }
+            if fields:
+                diffs.append({"land_id": land_id, "kind": "mismatch", "fields": fields})
+        return diffs
+
+    def _compare_owners(self, db_lands, structs, owners):
+        """Compare getLandsByOwner with the database for known owners."""
+        addresses = set()
+        for land_id, struct in structs.items():
+            if struct[0]:
+                addresses.add(struct[1].lower())
+            if land_id in db_lands:
+                addresses.add(db_lands[land_id]["owner"])
+        addresses &= owners.keys()
+        if not addresses:
+            return []
+
+        diffs = []
+        for address, chain_ids in self._fetch_owned(sorted(addresses)).items():
+            db_ids = owners[address]
+            if db_ids != chain_ids:
+                diffs.append(
+                    {
+                        "owner": address,
+                        "db_only": sorted(db_ids - chain_ids),
+                        "chain_only": sorted(chain_ids - db_ids),
+                    }
+                )
+        return diffs
+
+    def _mark_checked(self, first, last, digest, head):
+        checked = db.session.get(ReconcileRange, first)
+        if checked is None:
+            checked = ReconcileRange(range_start=first)
+            db.session.add(checked)
+        checked.range_end = last
+        checked.digest = digest
+        checked.block_number = head
+
+    def _deletable(self, diff):
+        """Whether a missing_on_chain land was issued and then removed by the contract."""
+        return self.land_count is not None and diff["land_id"] <= self.land_count
+
+    def run(self, full=False, repair=False, delete_missing=False):
+        """
+        Reconcile all land ID ranges that may have drifted.
+
+        Args:
+            full: Re-check every range, ignoring stored digests
+            repair: Overwrite drifted lands with their chain state
+            delete_missing: With `repair`, also delete lands (and their
+                transactions) that are missing on chain, if their ID is not
+                above the contract's land count
+
+        Returns:
+            dict: Report with the chain head, the number of ranges and lands
+                checked, the per-land `diffs` (missing_in_db, missing_on_chain
+                or mismatch with the differing fields), the `owner_diffs` of
+                the owner index and, with `repair`, the repair counters
+                (`kept` counts missing_on_chain lands left in place)
+        """
+        head = self.w3.eth.block_number
+        db_lands = self._db_lands()
+        upper = self._upper_bound(max(db_lands, default=0))
+
+        owners = {}
+        for land_id, values in db_lands.items():
+            owners.setdefault(values["owner"], set()).add(land_id)
+        owners.update(
+            (address.lower(), owners.get(address.lower(), set()))
+            for address in db.session.scalars(select(User.blockchain_address))
+        )
+
+        stored = {r.range_start: r for r in db.session.scalars(select(ReconcileRange))}
+        # Last event block per range, for ranges whose chain state may have changed
+        touched = {}
+        if stored and not full:
+            since = min(r.block_number for r in stored.values())
+            for land_id, block in self._touched(since, head).items():
+                first = self._range_of(land_id)
+                touched[first] = max(touched.get(first, 0), block)
+
+        ranges = [
+            (first, min(first + self.range_size - 1, upper))
+            for first in range(1, upper + 1, self.range_size)
+        ]
+        by_range = {}
+        for land_id, values in db_lands.items():
+            by_range.setdefault(self._range_of(land_id), {})[land_id] = values
+        dirty = []
+        for first, last in ranges:
+            lands = by_range.get(first, {})
+            checked = stored.get(first)
+            if (
+                full
+                or checked is None
+                or checked.range_end != last
+                or checked.digest != range_digest(lands)
+                or touched.get(first, 0) > checked.block_number
+            ):
+                dirty.append((first, last, lands))
+
+        report = {
+            "block_number": head,
+            "ranges": len(ranges),
+            "checked_ranges": len(dirty),
+            "checked_lands": 0,
+            "diffs": [],
+            "owner_diffs": [],
+            "repaired": None,
+        }
+        repair_stats = dict.fromkeys(("lands", "skipped", "kept"), 0)
+        indexer = EventIndexer(self.w3, self.contract) if repair else None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            fetched = pool.map(
+                lambda r: self._fetch_lands(range(r[0], r[1] + 1)), dirty
+            )
+            for (first, last, lands), structs in zip(dirty, fetched):
+                diffs = self._compare(lands, structs)
+                report["checked_lands"] += len(lands)
+                report["diffs"].extend(diffs)
+                owner_diffs = self._compare_owners(lands, structs, owners)
+                report["owner_diffs"].extend(owner_diffs)
+
+                if diffs and repair:
+                    kept = [
+                        d
+                        for d in diffs
+                        if d["kind"] == "missing_on_chain"
+                        and not (delete_missing and self._deletable(d))
+                    ]
+                    repair_stats["kept"] += len(kept)
+                    skipped = repair_stats["skipped"]
+                    repairable = {
+                        d["land_id"]: structs[d["land_id"]] for d in diffs if d not in kept
+                    }
+                    if repairable:
+                        indexer.upsert_from_structs(repairable, repair_stats)
+                        db.session.flush()
+                    if repair_stats["skipped"] == skipped:
+                        lands = self._db_lands(first, last)
+                        diffs = kept
+
+                if diffs or owner_diffs:
+                    db.session.execute(
+                        delete(ReconcileRange).where(ReconcileRange.range_start == first)
+                    )
+                else:
+                    self._mark_checked(first, last, range_digest(lands), head)
+                db.session.commit()
+
+        # An owner drifts once per land range it appears in
+        report["owner_diffs"] = list(
+            {d["owner"]: d for d in report["owner_diffs"]}.values()
+        )
+        if repair:
+            report["repaired"] = repair_stats
+        return report
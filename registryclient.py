@@ -0,0 +1,189 @@
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+
+from chain import call_many
+
+"""
+Land Registry Client
+--------------------
+Reads the state of the landRegistry contract in as few RPC round trips as
+possible.
+
+Deployments of the contract with the batch view functions (`getLands`,
+the paginated `getLandsByOwner`, `getTransactions` and `getLandCount`)
+return up to `batch_size` lands or transactions per eth_call, and those
+calls are grouped into JSON-RPC batches. Reading N lands then takes
+N / batch_size calls instead of N. Older deployments only have the `lands`
+and `transactions` getters, which are read one item per call. Which kind
+of contract is deployed is detected by the first read.
+
+Lands are returned as the `lands(id)` getter returns them: (id, owner,
+title, location, description, price, forSale, registrationDate), with ID 0
+for lands that do not exist. Transactions are (landId, seller, buyer,
+price, transactionDate).
+"""
+
+
+def _chunks(items, size):
+    items = list(items)
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+class RegistryClient:
+    """
+    Batched reads of the landRegistry contract.
+
+    Args:
+        w3: Web3 instance used to query the chain
+        contract: landRegistry contract object
+        batch_size: Maximum lands, land IDs or transactions per contract call
+        rpc_batch_size: Maximum number of calls per JSON-RPC batch
+    """
+
+    def __init__(self, w3, contract, batch_size=200, rpc_batch_size=100):
+        self.w3 = w3
+        self.contract = contract
+        self.batch_size = batch_size
+        self.rpc_batch_size = rpc_batch_size
+        self._land_count = None
+        self._batch_reads = None
+
+    @property
+    def batch_reads(self):
+        """True if the deployed contract has the batch view functions."""
+        if self._batch_reads is None:
+            self.land_count()
+        return self._batch_reads
+
+    def _call_many(self, requests):
+        return call_many(self.w3, requests, batch_size=self.rpc_batch_size)
+
+    def land_count(self):
+        """
+        Read the highest land ID.
+
+        Returns:
+            int: Number of registered lands, or None if the contract cannot
+                tell (no batch view functions)
+        """
+        if self._batch_reads is False:
+            return None
+        try:
+            self._land_count = self.contract.functions.getLandCount().call()
+        except (BadFunctionCallOutput, ContractLogicError):
+            # Older deployment: the selector is unknown and the call reverts
+            self._batch_reads = False
+            return None
+        self._batch_reads = True
+        return self._land_count
+
+    def get_lands(self, land_ids):
+        """
+        Read many lands.
+
+        Args:
+            land_ids: Blockchain land IDs
+
+        Returns:
+            dict: {land ID: land struct}
+        """
+        land_ids = list(land_ids)
+        if not land_ids:
+            return {}
+        if self.batch_reads:
+            chunks = _chunks(land_ids, self.batch_size)
+            pages = self._call_many(
+                [lambda chunk=chunk: self.contract.functions.getLands(chunk) for chunk in chunks]
+            )
+            structs = [struct for page in pages for struct in page]
+        else:
+            structs = self._call_many(
+                [
+                    lambda land_id=land_id: self.contract.functions.lands(land_id)
+                    for land_id in land_ids
+                ]
+            )
+        return dict(zip(land_ids, structs))
+
+    def lands_by_owner(self, addresses):
+        """
+        Read the IDs of the lands owned by many addresses.
+
+        Args:
+            addresses: Wallet addresses
+
+        Returns:
+            dict: {address: list of land IDs}
+        """
+        addresses = list(addresses)
+        checksummed = [self.w3.to_checksum_address(address) for address in addresses]
+        if not self.batch_reads:
+            owned = self._call_many(
+                [
+                    lambda address=address: self.contract.functions.getLandsByOwner(address)
+                    for address in checksummed
+                ]
+            )
+            return {address: list(ids) for address, ids in zip(addresses, owned)}
+
+        def pages(requests):
+            return self._call_many(
+                [
+                    lambda address=address, offset=offset: self.contract.functions.getLandsByOwner(
+                        address, offset, self.batch_size
+                    )
+                    for address, offset in requests
+                ]
+            )
+
+        # First page of every owner, then the remaining pages of large owners
+        result = {}
+        remaining = []
+        for address, checksum, (ids, total) in zip(
+            addresses, checksummed, pages([(checksum, 0) for checksum in checksummed])
+        ):
+            result[address] = list(ids)
+            remaining.extend(
+                (address, checksum, offset)
+                for offset in range(self.batch_size, total, self.batch_size)
+            )
+        more = pages([(checksum, offset) for _, checksum, offset in remaining])
+        for (address, _, _), (ids, _) in zip(remaining, more):
+            result[address].extend(ids)
+        return result
+
+    def transaction_count(self):
+        """Read the number of transactions recorded by the contract."""
+        return self.contract.functions.getTransactionCount().call()
+
+    def get_transactions(self, start=0, count=None):
+        """
+        Read a range of the contract's transactions.
+
+        Args:
+            start: Index of the first transaction
+            count: Maximum number of transactions, None for all from `start`
+
+        Returns:
+            list: Transaction structs, fewer than `count` at the end of the list
+        """
+        if count is None or not self.batch_reads:
+            total = self.transaction_count()
+            count = total - start if count is None else min(count, total - start)
+        if count <= 0:
+            return []
+        if not self.batch_reads:
+            return self._call_many(
+                [
+                    lambda index=index: self.contract.functions.transactions(index)
+                    for index in range(start, start + count)
+                ]
+            )
+        pages = self._call_many(
+            [
+                lambda offset=offset: self.contract.functions.getTransactions(
+                    offset, min(self.batch_size, start + count - offset)
+                )
+                for offset in range(start, start + count, self.batch_size)
+            ]
+        )
+        return [transaction for page in pages for transaction in page]
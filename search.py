@@ -0,0 +1,176 @@
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+import re
+
+from models import db, Land
+
+"""
+Land Full-Text Search
+---------------------
+SQLite FTS5 index over the title, location and description of lands.
+
+The `land_fts` virtual table uses the `land` table as external content and is
+kept in sync by triggers, so every write path (ORM, bulk inserts from the
+event indexer, manual SQL) updates it. Searches are ranked with BM25 and
+match word prefixes. When FTS5 is not available (another database backend,
+or SQLite compiled without it) searches fall back to LIKE scans.
+"""
+
+# BM25 column weights: title, location, description
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS land_fts USING fts5(
+        title, location, description,
+        content='land', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_fts_insert AFTER INSERT ON land BEGIN
+        INSERT INTO land_fts(rowid, title, location, description)
+        VALUES (new.id, new.title, new.location, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_fts_delete AFTER DELETE ON land BEGIN
+        INSERT INTO land_fts(land_fts, rowid, title, location, description)
+        VALUES ('delete', old.id, old.title, old.location, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS land_fts_update
+    AFTER UPDATE OF title, location, description ON land BEGIN
+        INSERT INTO land_fts(land_fts, rowid, title, location, description)
+        VALUES ('delete', old.id, old.title, old.location, old.description);
+        INSERT INTO land_fts(rowid, title, location, description)
+        VALUES (new.id, new.title, new.location, new.description);
+    END
+    """,
+)
+
+
+def setup_land_search(engine):
+    """
+    Create the FTS5 index and its sync triggers if they do not exist yet.
+
+    A newly created index is populated from the existing lands.
+
+    Args:
+        engine: SQLAlchemy engine of the application database
+
+    Returns:
+        bool: True if full-text search is available, False to use LIKE
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = 'land_fts'")
+            ).first()
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text("INSERT INTO land_fts(land_fts) VALUES ('rebuild')"))
+    except OperationalError:
+        # SQLite built without the FTS5 extension
+        return False
+    return True
+
+
+def fts_query(query):
+    """
+    Turn free text into an FTS5 query matching every word as a prefix.
+
+    Args:
+        query: User supplied search text
+
+    Returns:
+        str: FTS5 MATCH expression, or an empty string if there are no words
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def search_query(query, page=1, per_page=24, use_fts=True):
+    """
+    Build the statement of one page of search results.
+
+    Args:
+        query: Search text; an empty query lists every land for sale
+        page: 1-based page number
+        per_page: Number of lands per page
+        use_fts: Whether the FTS5 index is available
+
+    Returns:
+        Select or TextClause: Lands of the page (land IDs in rank order
+            with FTS5), plus the first one of the next page; None if the
+            query has no words to match
+    """
+    offset = (page - 1) * per_page
+
+    if not query or not use_fts:
+        statement = select(Land).options(joinedload(Land.owner)).where(Land.for_sale == True)
+        if query:
+            statement = statement.where(
+                Land.title.contains(query)
+                | Land.location.contains(query)
+                | Land.description.contains(query)
+            )
+        return statement.order_by(Land.id).offset(offset).limit(per_page + 1)
+
+    match = fts_query(query)
+    if not match:
+        return None
+    return text(
+        """
+        SELECT land.id FROM land_fts
+        JOIN land ON land.id = land_fts.rowid
+        WHERE land_fts MATCH :match AND land.for_sale = 1
+        ORDER BY bm25(land_fts, :w_title, :w_location, :w_description)
+        LIMIT :limit OFFSET :offset
+        """
+    ).bindparams(
+        match=match,
+        w_title=BM25_WEIGHTS[0],
+        w_location=BM25_WEIGHTS[1],
+        w_description=BM25_WEIGHTS[2],
+        limit=per_page + 1,
+        offset=offset,
+    )
+
+
+def search_lands(query, page=1, per_page=24, use_fts=True):
+    """
+    Search lands for sale by title, location or description.
+
+    Args:
+        query: Search text; an empty query lists every land for sale
+        page: 1-based page number
+        per_page: Number of lands per page
+        use_fts: Whether the FTS5 index is available
+
+    Returns:
+        tuple: (list of Land on this page, whether a next page exists)
+    """
+    statement = search_query(query, page, per_page, use_fts)
+    if statement is None:
+        return [], False
+    if not query or not use_fts:
+        lands = db.session.scalars(statement).all()
+        return lands[:per_page], len(lands) > per_page
+
+    land_ids = db.session.scalars(statement).all()
+    has_next = len(land_ids) > per_page
+    land_ids = land_ids[:per_page]
+
+    lands = {
+        land.id: land
+        for land in Land.query.options(joinedload(Land.owner)).filter(
+            Land.id.in_(land_ids)
+        )
+    }
+    return [lands[land_id] for land_id in land_ids if land_id in lands], has_next
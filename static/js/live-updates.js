@@ -0,0 +1,123 @@
+// static/js/live-updates.js
+
+/**
+ * Live updates of the marketplace and land pages
+ * Applies the land events streamed from /api/events (see liveupdates.py)
+ */
+
+// Show a notice with a reload link above the page content
+function showLiveNotice(container, message) {
+    let notice = document.getElementById('live-update-notice');
+    if (!notice) {
+        notice = document.createElement('div');
+        notice.id = 'live-update-notice';
+        notice.className = 'alert alert-info d-flex justify-content-between align-items-center';
+        (container.querySelector('.container') || container).prepend(notice);
+    }
+    notice.innerHTML = '';
+    const text = document.createElement('span');
+    text.textContent = message;
+    const reload = document.createElement('a');
+    reload.href = window.location.href;
+    reload.className = 'alert-link';
+    reload.textContent = 'Refresh';
+    notice.append(text, reload);
+}
+
+// Open the event stream; the browser reconnects and resumes by itself
+function openLiveUpdates(element, handlers) {
+    if (!window.EventSource || !element) {
+        return null;
+    }
+    const params = new URLSearchParams();
+    if (element.dataset.lastEventId) {
+        params.set('last_event_id', element.dataset.lastEventId);
+    }
+    if (element.dataset.landId) {
+        params.set('land', element.dataset.landId);
+    }
+    const source = new EventSource('/api/events?' + params.toString());
+    Object.keys(handlers).forEach(function (kind) {
+        source.addEventListener(kind, function (e) {
+            handlers[kind](JSON.parse(e.data));
+        });
+    });
+    return source;
+}
+
+// Marketplace: update prices and badges in place, announce new listings
+function initMarketplaceUpdates(container) {
+    let listed = 0;
+
+    function card(landId) {
+        return container.querySelector('[data-land-id="' + landId + '"]');
+    }
+
+    function setBadge(landId, text, className) {
+        const land = card(landId);
+        if (!land) {
+            return null;
+        }
+        const badge = land.querySelector('[data-land-badge]');
+        badge.textContent = text;
+        badge.className = 'badge ' + className;
+        return land;
+    }
+
+    function unavailable(text) {
+        return function (event) {
+            const land = setBadge(event.land_id, text, 'bg-secondary');
+            if (land) {
+                land.classList.add('opacity-50');
+            }
+        };
+    }
+
+    openLiveUpdates(container, {
+        listed: function (event) {
+            if (card(event.land_id)) {
+                setBadge(event.land_id, 'For Sale', 'bg-success');
+                card(event.land_id).classList.remove('opacity-50');
+                return;
+            }
+            listed += 1;
+            showLiveNotice(container, listed === 1
+                ? 'A land was just listed for sale.'
+                : listed + ' lands were just listed for sale.');
+        },
+        unlisted: unavailable('No Longer For Sale'),
+        sold: unavailable('Sold'),
+        price: function (event) {
+            const land = card(event.land_id);
+            if (land) {
+                land.querySelector('[data-land-price]').textContent = '$' + Number(event.price).toFixed(2);
+            }
+        },
+        status: function (event) {
+            if (event.status === 'pending') {
+                setBadge(event.land_id, 'Purchase Pending', 'bg-warning text-dark');
+            } else if (card(event.land_id) && !card(event.land_id).classList.contains('opacity-50')) {
+                setBadge(event.land_id, 'For Sale', 'bg-success');
+            }
+        },
+        reset: function () {
+            showLiveNotice(container, 'The listings have changed.');
+        },
+    });
+}
+
+// Land details: the page depends on the owner and status, so offer a reload
+function initLandUpdates(container) {
+    function changed() {
+        showLiveNotice(container, 'This land has just been updated.');
+    }
+
+    openLiveUpdates(container, {
+        listed: changed,
+        unlisted: changed,
+        sold: changed,
+        price: changed,
+        status: changed,
+        reset: changed,
+    });
+}
@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "contracts"))
+
+from compile import ABI_PATH, SOLC_VERSION, compile_contract, interface
+
+"""
+Contract ABI Test
+-----------------
+Compiles landRegistry.sol and checks that the committed ABI, which the
+application loads, has the same interface (`python contracts/compile.py
+--check`). Skipped where no compiler is available: set SOLC_BINARY or install
+solc SOLC_VERSION with py-solc-x first.
+"""
+
+
+def solc_binary():
+    solcx = pytest.importorskip("solcx")
+    binary = os.getenv("SOLC_BINARY")
+    if not binary and SOLC_VERSION not in {
+        str(v) for v in solcx.get_installed_solc_versions()
+    }:
+        pytest.skip(f"solc {SOLC_VERSION} is not installed")
+    return binary
+
+
+def test_committed_abi_matches_source():
+    abi, bytecode = compile_contract(solc_binary=solc_binary())
+    with open(ABI_PATH) as f:
+        committed = json.load(f)
+    assert bytecode
+    assert interface(committed) == interface(abi)
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_database, route_queries
+from models import db, User, Land, Transaction
+from queryplan import check_query_plans
+
+"""
+Query Plan Tests
+----------------
+Seeds a small SQLite database and checks with EXPLAIN QUERY PLAN that the
+queries of the hot routes, built by the functions the routes run, use an
+index instead of scanning a whole table.
+"""
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    path = tmp_path_factory.mktemp("queryplan") / "landregistry.db"
+    app = create_app(
+        {
+            "SECRET_KEY": "test",
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+            "CONFIRMATION_WORKER_ENABLED": False,
+            "INDEXER_ENABLED": False,
+        }
+    )
+    with app.app_context():
+        init_database()
+        seed()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def seed(users=5, lands=200):
+    db.session.add_all(
+        User(
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            password_hash="x",
+            blockchain_address=f"0x{i:040x}",
+        )
+        for i in range(1, users + 1)
+    )
+    db.session.flush()
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(1, lands + 1):
+        land = Land(
+            blockchain_id=i,
+            owner_id=i % users + 1,
+            title=f"Plot {i}",
+            location="Nairobi" if i % 2 else "Mombasa",
+            latitude=-1.29 + (i % 20) * 0.01,
+            longitude=36.82 + (i // 20) * 0.01,
+            description="Residential plot",
+            price=float(i),
+            image="default_land.png",
+            for_sale=i % 3 != 0,
+            status="confirmed",
+        )
+        db.session.add(land)
+        db.session.flush()
+        db.session.add(
+            Transaction(
+                blockchain_tx_hash=f"0x{i:064x}",
+                land_id=land.id,
+                seller_id=(i + 1) % users + 1,
+                buyer_id=land.owner_id,
+                price=land.price,
+                transaction_date=start + timedelta(days=i),
+                status="confirmed",
+            )
+        )
+    db.session.commit()
+
+
+def test_hot_routes_use_indexes(app):
+    results = check_query_plans(db.engine, route_queries())
+    scans = {name: plan for name, (plan, full) in results.items() if full}
+    assert scans == {}
+
+
+def test_search_uses_full_text_index(app):
+    (plan, _), = check_query_plans(
+        db.engine, {"seacrhLands": route_queries()["seacrhLands"]}
+    ).values()
+    assert any("land_fts VIRTUAL TABLE" in step for step in plan)
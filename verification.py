@@ -0,0 +1,161 @@
+from hexbytes import HexBytes
+from web3 import Web3
+
+from cache import LRUCache
+from chain import rpc_batch, to_ether
+
+"""
+Transaction Verification
+------------------------
+Verifies land transfer transactions against the blockchain by fetching their
+receipts and decoding the LandTransferred event emitted by the landRegistry
+contract.
+
+Results are kept in a bounded LRU cache. Receipts buried under enough
+confirmations are final and never expire; pending or unknown transactions
+are cached for a short TTL only, so they are re-checked soon after.
+"""
+
+
+def _to_int(value):
+    return value if isinstance(value, int) else int(value, 16)
+
+
+class TransactionVerifier:
+    """
+    Verifies transactions on chain, caching receipts.
+
+    Args:
+        w3: Web3 instance used to query the chain
+        contract: landRegistry contract object
+        cache: LRUCache storing verification results
+        confirmations: Confirmations after which a receipt is final
+        pending_ttl: Seconds a non-final result stays cached
+        batch_size: Maximum number of requests per JSON-RPC batch; hosted
+            nodes often reject larger batches
+    """
+
+    def __init__(
+        self, w3, contract, cache=None, confirmations=12, pending_ttl=15, batch_size=100
+    ):
+        self.w3 = w3
+        self.contract = contract
+        self.cache = cache if cache is not None else LRUCache()
+        self.confirmations = confirmations
+        self.pending_ttl = pending_ttl
+        self.batch_size = batch_size
+        self._transfer_event = contract.events.LandTransferred()
+        self._transfer_topic = contract.events.LandTransferred.topic
+
+    def _decode_transfer(self, receipt):
+        """Return the LandTransferred arguments from a raw receipt, if any."""
+        for log in receipt.get("logs", []):
+            topics = [HexBytes(topic) for topic in log["topics"]]
+            if (
+                log["address"].lower() != self.contract.address.lower()
+                or not topics
+                or Web3.to_hex(topics[0]) != self._transfer_topic
+            ):
+                continue
+            decoded = self._transfer_event.process_log(
+                {
+                    "address": Web3.to_checksum_address(log["address"]),
+                    "topics": topics,
+                    "data": HexBytes(log["data"]),
+                    "blockNumber": _to_int(log["blockNumber"]),
+                    "blockHash": HexBytes(log["blockHash"]),
+                    "transactionHash": HexBytes(log["transactionHash"]),
+                    "transactionIndex": _to_int(log["transactionIndex"]),
+                    "logIndex": _to_int(log["logIndex"]),
+                }
+            )
+            args = decoded["args"]
+            return {
+                "land_id": args["landId"],
+                "from": args["from"],
+                "to": args["to"],
+                "price": to_ether(args["price"]),
+                "timestamp": args["timestamp"],
+            }
+        return None
+
+    def _result(self, receipt, head):
+        if receipt is None:
+            return {"status": "not_found", "final": False}
+        block_number = _to_int(receipt["blockNumber"])
+        confirmations = max(head - block_number + 1, 0)
+        succeeded = _to_int(receipt["status"]) == 1
+        return {
+            "status": "confirmed" if succeeded else "failed",
+            "final": confirmations >= self.confirmations,
+            "block_number": block_number,
+            "confirmations": confirmations,
+            "event": self._decode_transfer(receipt) if succeeded else None,
+        }
+
+    def verify_many(self, tx_hashes):
+        """
+        Verify many transactions with JSON-RPC batches of at most
+        `batch_size` requests.
+
+        Args:
+            tx_hashes: Transaction hashes to verify
+
+        Returns:
+            dict: Verification result per lower-cased hash. Each result has a
+                status (confirmed, failed, not_found or error), a `final` flag
+                and, for mined transactions, the block, confirmations and
+                decoded LandTransferred event. A hash the node returned an
+                error for has status error and the error message, and is not
+                cached.
+
+        Raises:
+            ValueError: If the node cannot return the head block
+        """
+        results = {}
+        missing = []
+        for tx_hash in dict.fromkeys(h.lower() for h in tx_hashes):
+            cached = self.cache.get(tx_hash)
+            if cached is None:
+                missing.append(tx_hash)
+            else:
+                results[tx_hash] = cached
+
+        if not missing:
+            return results
+
+        # The head block rides in the first batch of receipts
+        responses = rpc_batch(
+            self.w3,
+            [("eth_blockNumber", [])]
+            + [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in missing],
+            batch_size=self.batch_size,
+        )
+        if "error" in responses[0]:
+            raise ValueError(f"RPC error while fetching the head block: {responses[0]['error']}")
+
+        head = _to_int(responses[0]["result"])
+        for tx_hash, response in zip(missing, responses[1:]):
+            if "error" in response:
+                # e.g. a malformed hash; the other receipts are still valid
+                error = response["error"]
+                message = error.get("message", error) if isinstance(error, dict) else error
+                results[tx_hash] = {"status": "error", "final": False, "error": str(message)}
+                continue
+            result = self._result(response["result"], head)
+            ttl = None if result["final"] else self.pending_ttl
+            self.cache.set(tx_hash, result, ttl)
+            results[tx_hash] = result
+        return results
+
+    def verify(self, tx_hash):
+        """
+        Verify a single transaction. See `verify_many`.
+
+        Raises:
+            ValueError: If the node returns an error
+        """
+        result = self.verify_many([tx_hash])[tx_hash.lower()]
+        if result["status"] == "error":
+            raise ValueError(f"RPC error while fetching the receipt: {result['error']}")
+        return result
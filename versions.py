@@ -0,0 +1,179 @@
+from collections import namedtuple
+from datetime import timezone
+from sqlalchemy import DateTime, Integer, text
+from sqlalchemy.exc import OperationalError
+
+"""
+Row Versions
+------------
+Version numbers of the lands, for conditional requests (ETag and
+Last-Modified) and delta sync of the land API.
+
+Every write of a land takes the next number of a registry-wide sequence, the
+`land_registry_version` table, as the land's `version`, and sets its
+`updated_at`. The sequence value is the registry's high-water mark: a
+client that saw version N gets everything that changed since with
+`version > N`. Deleted lands leave a row in `land_tombstone` with the
+version of their deletion.
+
+Like the search, R*Tree and listing indexes, versions are maintained by
+triggers on `land`, so every writer (web routes, confirmation worker,
+indexer, import) is covered. Only the columns a land is served with count as
+a change. Without trigger support (another database backend) versions stay
+at 0 and responses are sent without validators.
+"""
+
+# Columns whose change gives a land a new version
+VERSIONED_COLUMNS = (
+    "blockchain_id",
+    "owner_id",
+    "title",
+    "location",
+    "latitude",
+    "longitude",
+    "boundary",
+    "description",
+    "price",
+    "image",
+    "for_sale",
+    "status",
+)
+
+_CHANGED = " OR ".join(f"new.{column} IS NOT old.{column}" for column in VERSIONED_COLUMNS)
+
+_NEXT_VERSION = """
+        UPDATE land_registry_version
+        SET version = version + 1, updated_at = CURRENT_TIMESTAMP;
+"""
+
+_SET_VERSION = """
+        UPDATE land
+        SET version = (SELECT version FROM land_registry_version),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = new.id;
+"""
+
+VERSIONS_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS land_registry_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL,
+        updated_at TIMESTAMP NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS land_tombstone (
+        land_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_land_tombstone_version ON land_tombstone (version)",
+    # A new land may reuse the ID of a deleted one
+    f"""
+    CREATE TRIGGER IF NOT EXISTS land_version_insert AFTER INSERT ON land BEGIN
+        {_NEXT_VERSION}
+        {_SET_VERSION}
+        DELETE FROM land_tombstone WHERE land_id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS land_version_update AFTER UPDATE ON land
+    WHEN {_CHANGED} BEGIN
+        {_NEXT_VERSION}
+        {_SET_VERSION}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS land_version_delete AFTER DELETE ON land BEGIN
+        {_NEXT_VERSION}
+        INSERT OR REPLACE INTO land_tombstone (land_id, version)
+        SELECT old.id, version FROM land_registry_version;
+    END
+    """,
+)
+
+# High-water mark of the registry: last version and time of the last change
+RegistryVersion = namedtuple("RegistryVersion", ["version", "updated_at"])
+
+
+def setup_land_versions(engine):
+    """
+    Create the version sequence, the tombstones and their triggers if they
+    do not exist yet.
+
+    A newly created sequence starts after the highest version of the
+    existing lands.
+
+    Args:
+        engine: SQLAlchemy engine of the application database
+
+    Returns:
+        bool: True if versions are maintained, False if unsupported
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as conn:
+            for statement in VERSIONS_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(
+                text(
+                    """
+                    INSERT OR IGNORE INTO land_registry_version (id, version, updated_at)
+                    SELECT 1, COALESCE(MAX(version), 0), CURRENT_TIMESTAMP FROM land
+                    """
+                )
+            )
+    except OperationalError:
+        return False
+    return True
+
+
+def utc(value):
+    """Mark a naive UTC timestamp read from the database as UTC."""
+    if value is None or value.tzinfo:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+def registry_version(session):
+    """
+    Read the registry's high-water mark.
+
+    Args:
+        session: SQLAlchemy session
+
+    Returns:
+        RegistryVersion: Last version and time of the last change (UTC)
+    """
+    row = session.execute(
+        text("SELECT version, updated_at FROM land_registry_version WHERE id = 1").columns(
+            version=Integer, updated_at=DateTime
+        )
+    ).one()
+    return RegistryVersion(row.version, utc(row.updated_at))
+
+
+def deleted_lands(session, since, until):
+    """
+    List the lands deleted between two versions.
+
+    Args:
+        session: SQLAlchemy session
+        since: Exclusive lower version
+        until: Inclusive upper version
+
+    Returns:
+        list: IDs of the deleted lands, in the order they were deleted
+    """
+    return list(
+        session.scalars(
+            text(
+                """
+                SELECT land_id FROM land_tombstone
+                WHERE version > :since AND version <= :until ORDER BY version
+                """
+            ),
+            {"since": since, "until": until},
+        )
+    )
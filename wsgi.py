@@ -0,0 +1,21 @@
+from app import create_app
+
+"""
+WSGI Entry Point
+----------------
+Application object for production WSGI servers, which can create it in the
+master process before forking the workers:
+
+    flask --app app init-db
+    gunicorn --preload --workers 4 wsgi:app
+
+The modules the app loads on first use are imported here up front, so with
+--preload they are imported once and shared copy-on-write by the workers.
+Every worker still builds its own Web3 provider and database connections.
+"""
+
+# Loaded lazily by the app; no sockets or threads are created by importing
+import providers
+import verification
+
+app = create_app()